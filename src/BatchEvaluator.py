@@ -0,0 +1,172 @@
+'''
+This module evaluates the HARM for many sets of vulnerability values at once (what-if analysis).
+The values are given as a matrix with one row per scenario and one column per vulnerability name. The compiled
+lower layer attack trees are evaluated once, each stack item holding the values of all scenarios, so the cost of
+a scenario is a few array operations instead of a pass over the trees.
+'''
+
+import numpy as np
+from attackTree import at, LEAF, AND, OR, OTHER, STORE, LOAD
+
+#Combine the values of the children of a gate, one row per child and one column per scenario
+def maxVector(vals):
+    if len(vals) == 0:
+        return np.zeros(vals.shape[1])
+    return np.maximum(np.max(vals, axis=0), 0.0)
+
+def sumVector(vals):
+    return np.sum(vals, axis=0)
+
+def minVector(vals):
+    return np.min(vals, axis=0)
+
+def productVector(vals):
+    return np.prod(vals, axis=0)
+
+def orProbabilityVector(vals):
+    return 1.0 - np.prod(np.where(vals > 0, 1.0 - vals, 1.0), axis=0)
+
+def proLeafVector(vals):
+    return np.where(vals > 0, vals, 1.0)
+
+#Same metrics as attackTree.METRICS: (leaf value, AND gate, OR gate, value of other children)
+VECTOR_METRICS = {"impact": (None, sumVector, maxVector, 0.0),
+                  "cost": (None, sumVector, minVector, 0.0),
+                  "pro": (proLeafVector, productVector, orProbabilityVector, 1.0),
+                  "risk": (None, sumVector, maxVector, 0.0),
+                  "roa": (None, sumVector, maxVector, 0.0),
+                  "mttc": (None, sumVector, maxVector, 0.0)}
+
+#Path value of a metric from the values of its nodes: success probabilities are multiplied, other metrics added
+PATH_PRODUCT = ["pro"]
+
+#Vulnerability name of a leaf, None for the start and end of the vulnerability network and for other nodes
+def vulName(leaf):
+    if leaf.command == 1:
+        return None
+    return getattr(leaf, 'vulname', None)
+
+def evaluateVector(compiled, leaves, metric, scenarios):
+    """
+    Evaluate a metric on a compiled attack tree for all scenarios.
+    @param leaves: values of the leaves of the compiled tree, each an array with one value per scenario
+    @param scenarios: number of scenarios
+    @return: array with the value of the tree for each scenario
+    """
+    leafValue, andValue, orValue, otherValue = VECTOR_METRICS[metric]
+    if leafValue is not None:
+        leaves = [leafValue(vals) for vals in leaves]
+    stack = []
+    slots = [None] * compiled.slots
+    for op, arg in zip(compiled.ops, compiled.args):
+        if op == LEAF:
+            stack.append(leaves[arg])
+        elif op == OTHER:
+            stack.append(np.full(scenarios, otherValue))
+        elif op == STORE:
+            slots[arg] = stack[-1]
+        elif op == LOAD:
+            stack.append(slots[arg])
+        else:
+            k = len(stack) - arg
+            temp = np.array(stack[k:]).reshape(arg, scenarios)
+            del stack[k:]
+            stack.append(andValue(temp) if op == AND else orValue(temp))
+    return stack[-1]
+
+class batchEvaluator(object):
+    """
+    What-if evaluation of a HARM (attack graph with attack trees in the lower layer) over a matrix of
+    vulnerability values. The trees are not changed.
+    """
+    def __init__(self, harm, columns=None):
+        """
+        @param columns: vulnerability names of the columns of the value matrix (all names in the HARM, sorted, by
+        default); vulnerabilities without a column keep their value
+        """
+        self.model = harm.model
+        #Compiled lower layer tree of each node with vulnerabilities
+        self.trees = []
+        names = set()
+        for u in self.model.table:
+            if u.child is None:
+                continue
+            if not isinstance(u.child, at):
+                raise TypeError("lower layer of " + str(u.name) + " is not an attack tree")
+            compiled = u.child.compiled if u.child.compiled is not None else u.child.compile()
+            self.trees.append((u.index, compiled))
+            for leaf in compiled.leaves:
+                if vulName(leaf) is not None:
+                    names.add(vulName(leaf))
+        self.columns = sorted(names) if columns is None else list(columns)
+        self.paths = None
+
+    #Column of each leaf of a compiled tree (-1 for leaves keeping their value)
+    def leafColumns(self, compiled):
+        position = dict([(name, i) for i, name in enumerate(self.columns)])
+        return [position.get(vulName(leaf), -1) for leaf in compiled.leaves]
+
+    #Current values of the vulnerabilities, as one row of the value matrix
+    def currentValues(self):
+        row = np.zeros(len(self.columns))
+        position = dict([(name, i) for i, name in enumerate(self.columns)])
+        for index, compiled in self.trees:
+            for leaf, val in zip(compiled.leaves, compiled.vals):
+                if vulName(leaf) in position:
+                    row[position[vulName(leaf)]] = val
+        return row
+
+    def nodeValues(self, values, metrics=["pro", "cost", "mttc"]):
+        """
+        Compute node metrics for every scenario.
+        @param values: matrix of vulnerability values, one row per scenario and one column per name of columns
+        @return: dictionary {metric: matrix (scenario, node index)}; nodes without child keep their value
+        """
+        values = np.atleast_2d(np.asarray(values, dtype=float))
+        scenarios = values.shape[0]
+        result = {}
+        for metric in metrics:
+            result[metric] = np.tile(np.array([u.val for u in self.model.table], dtype=float), (scenarios, 1))
+        #Trees shared by several nodes are evaluated once
+        done = {}
+        for index, compiled in self.trees:
+            if id(compiled) not in done:
+                leaves = []
+                for column, val in zip(self.leafColumns(compiled), compiled.vals):
+                    leaves.append(values[:, column] if column >= 0 else np.full(scenarios, float(val)))
+                done[id(compiled)] = [evaluateVector(compiled, leaves, metric, scenarios) for metric in metrics]
+            for metric, vals in zip(metrics, done[id(compiled)]):
+                result[metric][:, index] = vals
+        return result
+
+    #Node indexes of each attack path padded with a neutral column, nodes without child are left out
+    def pathIndexes(self):
+        if self.paths is None:
+            neutral = len(self.model.table)
+            children = set([index for index, compiled in self.trees])
+            paths = [[u.index for u in path if u.index in children] for path in self.model.allpath]
+            length = max([len(path) for path in paths], default=0)
+            self.paths = np.full((len(paths), length), neutral, dtype=np.intp)
+            for i, path in enumerate(paths):
+                self.paths[i, :len(path)] = path
+        return self.paths
+
+    def pathValues(self, values, metrics=["pro", "cost", "mttc"], nodes=None):
+        """
+        Compute path metrics for every scenario from the metrics of the nodes with vulnerabilities.
+        @param nodes: result of nodeValues for the same values, computed if not given
+        @return: dictionary {metric: matrix (scenario, path in allpath order)}
+        """
+        if nodes is None:
+            nodes = self.nodeValues(values, metrics)
+        paths = self.pathIndexes()
+        result = {}
+        for metric in metrics:
+            vals = nodes[metric]
+            neutral = 1.0 if metric in PATH_PRODUCT else 0.0
+            vals = np.hstack([vals, np.full((vals.shape[0], 1), neutral)])
+            if metric in PATH_PRODUCT:
+                result[metric] = np.prod(vals[:, paths], axis=2)
+            else:
+                result[metric] = np.sum(vals[:, paths], axis=2)
+        return result
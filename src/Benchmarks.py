@@ -0,0 +1,937 @@
+'''
+This module provides benchmarks for the performance-critical parts of the simulations.
+The caches and incremental structures timed here are checked against a recomputation in test_Checks.py (pytest).
+'''
+
+import sys
+import io
+import copy
+import pickle
+import multiprocessing
+import timeit
+import contextlib
+from SDIoTGen import *
+from SimulationBasic import beforeShuffle, beforeShuffleScale
+from RandomShufflingOptimization import randomAddReal, randomShuffling
+from HeuristicAlgo import travelPath, travelNetAll, getDecoyServer
+from PathCount import isAcyclicBetween, reachIndex, hopTable
+from BatchEvaluator import batchEvaluator, vulName
+from SecurityEvaluator import computeMTTSF, computeMTTSFLoop, computeMTTSFBatch, attackEngine, mttsfPolicy, sslPolicy, sslTracker, checkNeighbors, randomPaths
+from random import seed, getstate, setstate, uniform
+
+node_vlan_list = [['mri', 'ct'], ['thermostat', 'meter', 'camera'], ['tv', 'laptop'], ['server']]
+
+decoy_num = {"ct":1, "camera":1, "tv":1, "server":1}
+decoy_num_scale = {"ct":2, "camera":2, "tv":2, "server":1}
+intelligence = {'emulated': 0.9, 'real': 1.0}
+
+#=================================================================================================
+# Shared setup and timing
+#=================================================================================================
+
+def quiet():
+    """
+    Discard what the network generators and shufflers print, in a with statement.
+    """
+    return contextlib.redirect_stdout(io.StringIO())
+
+@contextlib.contextmanager
+def seeded(randomSeed=1):
+    """
+    Seed the random module in a with statement, the previous random state is restored afterwards.
+    """
+    seed_state = getstate()
+    seed(randomSeed)
+    try:
+        yield
+    finally:
+        setstate(seed_state)
+
+def scaleLabel(scale):
+    return "Example network" if scale is None else "Scale %d" % scale
+
+def createScaledNet(scale):
+    """
+    Create the scaled example network without printing it.
+    """
+    with quiet():
+        net = createRealSDIoTScale(node_vlan_list, scale)
+    return net
+
+def createNets(scale=None):
+    """
+    Create the example network (or the scaled one) and the same network with the initial decoy deployment.
+    """
+    with quiet():
+        if scale is None:
+            net, decoy_net, decoy_list, info = beforeShuffle(node_vlan_list, decoy_num, intelligence, 0.1, 0.01)
+        else:
+            net, decoy_net, decoy_list, info = beforeShuffleScale(node_vlan_list, decoy_num_scale, intelligence, 0.1, 0.01, scale)
+    return net, decoy_net
+
+def createDecoyNet(scale=None):
+    """
+    Create the example network (or the scaled one) with the initial decoy deployment.
+    """
+    return createNets(scale)[1]
+
+def createShuffledNet(scale, pro=0.9, out_degree=2.0, maxLength=4, randomSeed=1):
+    """
+    Create the scaled network with decoys and random connections between real nodes, with the attacker added.
+    """
+    decoy_net = createDecoyNet(scale)
+    with seeded(randomSeed), quiet():
+        decoy_net = randomAddReal(decoy_net, pro, out_degree, maxLength, len(decoy_net.nodes))
+    return add_attacker(decoy_net)
+
+def createHARM(scale=None):
+    """
+    Create the real network, the decoy network and the HARM of a copy of the decoy network with the attacker.
+    """
+    net, decoy_net = createNets(scale)
+    with quiet():
+        h = constructHARM(add_attacker(copyNet(decoy_net)))
+    return net, decoy_net, h
+
+def timeCall(func, number):
+    """
+    Return the average time of one call in milliseconds.
+    """
+    return 1000.0 * timeit.timeit(func, number=number) / number
+
+def timeOnce(func):
+    """
+    Call func once.
+    @return: result of the call and time in milliseconds
+    """
+    start = timeit.default_timer()
+    result = func()
+    return result, 1000.0 * (timeit.default_timer() - start)
+
+def pathNames(paths):
+    return [[n.name for n in path] for path in paths]
+
+#=================================================================================================
+# Memory used by node objects
+#=================================================================================================
+
+class dictNode(object):
+    """
+    Node with the same attributes stored in an instance dictionary (layout before slots).
+    """
+    pass
+
+def collectNodes(net):
+    """
+    Collect the node objects of the network, the vulnerability networks and the HARM.
+    """
+    temp = []
+    for n in net.nodes:
+        temp.append(n)
+        if n.vul is not None:
+            temp.extend([n.vul.s, n.vul.e] + n.vul.nodes)
+
+    model = ag(net, 1)
+    addToGraph(model, "attacktree", 1, 1)
+    for u in model.nodes:
+        temp.append(u)
+        if u.child is not None:
+            temp.extend(collectTreeNodes(u.child.topGate))
+
+    return [n for n in temp if n is not None]
+
+def collectTreeNodes(gate):
+    temp = [gate]
+    for u in gate.con:
+        if u.t in ['andGate', 'orGate']:
+            temp.extend(collectTreeNodes(u))
+        else:
+            temp.append(u)
+    return temp
+
+def nodeSize(n):
+    """
+    Return the size of the node with slots and the size of the same node using an instance dictionary.
+    """
+    d = dictNode()
+    for slot in slotNames(type(n)):
+        if hasattr(n, slot):
+            setattr(d, slot, getattr(n, slot))
+    return sys.getsizeof(n), sys.getsizeof(d) + sys.getsizeof(d.__dict__)
+
+def benchmarkNodeMemory(scales=[10, 50, 100]):
+    """
+    Compare bytes per node between the slots-based and dictionary-based layouts.
+    """
+    results = []
+    for scale in scales:
+        net = add_attacker(createScaledNet(scale))
+        nodes = collectNodes(net)
+        slotBytes = 0
+        dictBytes = 0
+        for n in nodes:
+            s, d = nodeSize(n)
+            slotBytes += s
+            dictBytes += d
+
+        slotPerNode = float(slotBytes)/len(nodes)
+        dictPerNode = float(dictBytes)/len(nodes)
+        print("Scale %d: %d nodes, %.1f bytes/node with slots, %.1f bytes/node with __dict__ (%.1f%% less)" %
+              (scale, len(nodes), slotPerNode, dictPerNode, 100.0 * (1.0 - slotPerNode/dictPerNode)))
+        results.append((scale, len(nodes), slotPerNode, dictPerNode))
+
+    return results
+
+
+#=================================================================================================
+# Network copy
+#=================================================================================================
+
+def benchmarkCopyNet(scales=[None, 20], number=50):
+    """
+    Compare copyNet with copy.deepcopy for the baseline network (None) and scaled networks.
+    """
+    results = []
+    for scale in scales:
+        decoy_net = createDecoyNet(scale)
+        t1 = timeCall(lambda: copy.deepcopy(decoy_net), number)
+        t2 = timeCall(lambda: copyNet(decoy_net), number)
+        label = "baseline" if scale is None else "scale %d" % scale
+        print("%s (%d nodes): deepcopy %.3f ms, copyNet %.3f ms (%.1fx faster)" % (label, len(decoy_net.nodes), t1, t2, t1/t2))
+        results.append((scale, t1, t2))
+
+    return results
+
+#=================================================================================================
+# Shuffle steps
+#=================================================================================================
+
+def benchmarkShuffleStep(scales=[None, 20, 50], pro=0.9, shuffles=20):
+    """
+    Time the network work around a shuffle in the scheme loops, without the shuffler and the HARM: copying the
+    network for the shuffler and again to add the attacker, against committing the nodes changed by an in place
+    shuffle and bringing one attack network to that snapshot.
+    """
+    results = []
+    for scale in scales:
+        net = copyNet(createDecoyNet(scale))
+        topology = snapshot(net)
+        attack_net = add_attacker(topology.materialise())
+        t1 = 0.0
+        t2 = 0.0
+        changed = 0
+        with seeded(), quiet():
+            for i in range(0, shuffles):
+                randomShuffling(net, pro, inplace=True)
+                changed += len(net.touched)
+                t1 += timeOnce(lambda: add_attacker(copyNet(copyNet(net))))[1]
+                topology, t = timeOnce(lambda: updateAttackNet(attack_net, topology, net))
+                t2 += t
+        print("%s (%d nodes, %.1f nodes changed per shuffle): copies %.3f ms, snapshot update %.3f ms per shuffle" %
+              (scaleLabel(scale), len(net.nodes), float(changed)/shuffles, t1/shuffles, t2/shuffles))
+        results.append((scale, t1/shuffles, t2/shuffles))
+
+    return results
+
+#=================================================================================================
+# Attack path enumeration
+#=================================================================================================
+
+def createChainNet(length):
+    """
+    Create a network where the attacker reaches the server through a chain of nodes.
+    """
+    net = network()
+    for i in range(0, length):
+        iot = realNode("tv" + str(i+1))
+        iot.id = i+1
+        net.addNode(iot)
+    iot = realNode("server")
+    iot.id = length+1
+    net.addNode(iot)
+    add_vul(net)
+    for i in range(0, length):
+        connectOneWay(net.nodes[i], net.nodes[i+1], net)
+
+    A = device('attacker')
+    A.setStart()
+    A.con.append(net.nodes[0])
+    net.nodes[-1].setEnd()
+    net.addNode(A)
+    constructSE(net)
+    return net
+
+def benchmarkPathEnumeration(scales=[2, 5, 10], number=3, chain=3000):
+    """
+    Compare the recursive and the iterative attack path enumeration on scaled topologies.
+    """
+    results = []
+    for scale in scales:
+        h = constructHARM(createShuffledNet(scale))
+        model = h.model
+        t1 = timeCall(model.travelAg, number)
+        paths = model.allpath
+        t2 = timeCall(model.travelAgIterative, number)
+        print("Scale %d (%d paths): recursive %.2f ms, iterative %.2f ms, same paths: %s" %
+              (scale, len(paths), t1, t2, pathNames(paths) == pathNames(model.allpath)))
+        results.append((scale, len(paths), t1, t2))
+
+    #A path longer than the recursion limit
+    model = constructHARM(createChainNet(chain)).model
+    try:
+        model.travelAg()
+        print("Chain of %d nodes: recursive found %d path" % (chain, len(model.allpath)))
+    except RecursionError:
+        print("Chain of %d nodes: recursive exceeds the recursion limit" % chain)
+    model.travelAgIterative()
+    print("Chain of %d nodes: iterative found %d path" % (chain, len(model.allpath)))
+
+    return results
+
+#=================================================================================================
+# Attack path counting
+#=================================================================================================
+
+def constructHARMWithoutPaths(net):
+    h = harm()
+    h.constructHarm(net, "attackgraph", 1, "attacktree", 1, 1, calcPaths=False)
+    return h
+
+def enumerateTargetCounts(model):
+    counts = {}
+    for path in model.iterPaths():
+        counts[path[-2]] = counts.get(path[-2], 0) + 1
+    return counts
+
+def enumerateDecoyPaths(net, dserver):
+    for node1 in net.nodes:
+        if node1.type == True and node1.name.startswith("server") == False:
+            node1.num = 0
+            node1.inPath = 1
+            travelPath(node1, dserver, [], [], node1)
+            node1.inPath = 0
+    return [n.num for n in net.nodes]
+
+def benchmarkPathCount(scales=[2, 5, 10, 20, 50], number=3):
+    """
+    Compare counting attack paths by enumeration and by dynamic programming, for the VLAN topology
+    with decoys (acyclic) and for the shuffled topology (with cycles, counted by enumeration).
+    """
+    results = []
+    for scale in scales:
+        for label, net in [("decoy", add_attacker(createDecoyNet(scale))), ("shuffled", createShuffledNet(scale))]:
+            model = constructHARMWithoutPaths(net).model
+            t1 = timeCall(lambda: enumerateTargetCounts(model), number)
+            t2 = timeCall(model.countPaths, number)
+            same = enumerateTargetCounts(model) == model.countPaths()
+            print("Scale %d %s (%d paths, acyclic: %s): enumeration %.2f ms, counting %.2f ms, same counts: %s" %
+                  (scale, label, sum(model.countPaths().values()), isAcyclicBetween(model.s, model.e, model.pathCon), t1, t2, same))
+            results.append((scale, label, t1, t2))
+
+        #Paths from each real node to the decoy server used by the heuristic shuffling
+        net = createDecoyNet(scale)
+        dserver = getDecoyServer(net.nodes)
+        t1 = timeCall(lambda: enumerateDecoyPaths(net, dserver), number)
+        nums = enumerateDecoyPaths(net, dserver)
+        t2 = timeCall(lambda: travelNetAll(net, dserver), number)
+        print("Scale %d decoy paths per real node: enumeration %.2f ms, counting %.2f ms, same counts: %s" %
+              (scale, t1, t2, nums == [n.num for n in net.nodes]))
+
+    return results
+
+#=================================================================================================
+# Attack path storage
+#=================================================================================================
+
+def pathListSize(paths):
+    return sys.getsizeof(paths) + sum(sys.getsizeof(path) for path in paths)
+
+def benchmarkPathStore(scales=[5, 10, 20, 50], number=3):
+    """
+    Compare attack paths stored as lists of nodes and as a prefix trie (memory, iteration, pickling).
+    The trie is iterated directly (streamed) and through the list returned by materialise.
+    """
+    results = []
+    for scale in scales:
+        model = constructHARM(add_attacker(createDecoyNet(scale))).model
+        store = model.allpath
+        paths = list(model.iterPaths())
+        size1 = pathListSize(paths)
+        size2 = store.sizeInBytes()
+        t1 = timeCall(lambda: [len(path) for path in paths], number)
+        t2 = timeCall(lambda: [len(path) for path in store], number)
+        t5 = timeCall(store.materialise, number)
+        model.allpath = paths
+        t3 = timeCall(lambda: pickle.dumps(model), number)
+        model.allpath = store
+        t4 = timeCall(lambda: pickle.dumps(model), number)
+        print("Scale %d (%d paths): lists %d KB, trie %d KB (%.1fx less); iteration %.2f ms vs %.2f ms streamed (materialise %.2f ms); pickling the attack graph %.2f ms vs %.2f ms" %
+              (scale, len(paths), size1/1024, size2/1024, float(size1)/size2, t1, t2, t5, t3, t4))
+        results.append((scale, size1, size2, t3, t4))
+
+    return results
+
+#=================================================================================================
+# Pruning with the reachability index
+#=================================================================================================
+
+def benchmarkReachIndex(scales=[5, 10, 20], number=3):
+    """
+    Compare path enumeration with and without the reachability index when the real server has no
+    lower layer (e.g. patched), so branches that can only end at the real server are dead ends.
+    Also compare calcNodeHopsToTarget on the network with random connections between real nodes.
+    """
+    results = []
+    for scale in scales:
+        h = constructHARM(createShuffledNet(scale))
+        removeAT(h, [n for n in h.model.nodes if n.name.startswith("ag_server")])
+        model = h.model
+        model.buildReachIndex()
+        t2 = timeCall(model.travelAgIterative, number)
+        paths = pathNames(model.allpath)
+        #An index where every node reaches every target does not cut any branch
+        model.reach = [-1] * len(model.table)
+        t1 = timeCall(model.travelAgIterative, number)
+        same = paths == pathNames(model.allpath)
+        print("Scale %d (%d paths): enumeration without index %.2f ms, with index %.2f ms, same paths: %s" %
+              (scale, len(paths), t1, t2, same))
+
+        net = createShuffledNet(scale)
+        reach = reachIndex(net.nodes, [n for n in net.nodes if n.name.startswith("server")], lambda v: v.con)
+        t3 = timeCall(lambda: [n.calcNodeHopsToTarget(0, 0) for n in net.nodes], number)
+        t4 = timeCall(lambda: [n.calcNodeHopsToTarget(0, 0, reach) for n in net.nodes], number)
+        same = [n.calcNodeHopsToTarget(0, 0) for n in net.nodes] == [n.calcNodeHopsToTarget(0, 0, reach) for n in net.nodes]
+        print("Scale %d hops to the server for all nodes: without index %.2f ms, with index %.2f ms, same values: %s" %
+              (scale, t3, t4, same))
+        results.append((scale, t1, t2, t3, t4))
+
+    return results
+
+#=================================================================================================
+# Hop table for edge admission
+#=================================================================================================
+
+def addRealConnections(net, hops, addEdge, pro, out_degree, maxLength, randomSeed=1):
+    """
+    Add random connections between real nodes of different VLANs when the new successor has at most
+    maxLength hops to the server (the admission check of randomAddReal).
+    @return: number of connections added
+    """
+    added = 0
+    with seeded(randomSeed):
+        for node1 in net.nodes:
+            if node1.name.startswith("server") == False:
+                for node2 in net.nodes:
+                    if node2.name.startswith("server") == False and node1.subnet != node2.subnet:
+                        if uniform(0, 1) > pro and node2 not in node1.con and len(node1.con) <= out_degree:
+                            if hops(node2) <= maxLength:
+                                connectOneWay(node1, node2)
+                                addEdge(node1, node2)
+                                added += 1
+    return added
+
+def benchmarkHopTable(scales=[5, 10, 20, 50], pro=0.9, out_degree=3, maxLength=4):
+    """
+    Compare the admission of random connections on the scaled network when the hops to the server are
+    searched for each candidate connection and when they are looked up in the hop table.
+    """
+    results = []
+    for scale in scales:
+        net1 = createScaledNet(scale)
+        added1, t1 = timeOnce(lambda: addRealConnections(net1, lambda v: v.calcNodeHopsToTarget(0, 0), lambda u, v: None,
+                                                         pro, out_degree, maxLength))
+
+        net2 = createScaledNet(scale)
+        def lookup():
+            table = hopTable(net2.nodes, [n for n in net2.nodes if n.name.startswith("server")], lambda v: v.con, maxLength)
+            return addRealConnections(net2, table.__getitem__, table.addEdge, pro, out_degree, maxLength)
+        added2, t2 = timeOnce(lookup)
+
+        same = [sorted(n.name for n in v.con) for v in net1.nodes] == [sorted(n.name for n in v.con) for v in net2.nodes]
+        print("Scale %d (%d nodes, %d connections added): search %.2f ms, hop table %.2f ms, same connections: %s" %
+              (scale, len(net1.nodes), added1, t1, t2, same and added1 == added2))
+        results.append((scale, t1, t2))
+
+    return results
+
+#=================================================================================================
+# Compiled attack trees
+#=================================================================================================
+
+def benchmarkCompiledTree(scales=[10, 50], number=20):
+    """
+    Compare the recursive evaluation of the lower layer attack trees (all metrics) with the compiled trees:
+    compiling and evaluating each metric once, then evaluating again (as computeMTTSF does for each simulation).
+    """
+    metrics = [("impact", "calcImpactRecursive"), ("cost", "calcCostRecursive"), ("pro", "calcProRecursive"),
+               ("risk", "calcRiskRecursive"), ("mttc", "calcMTTCRecursive")]
+    results = []
+    for scale in scales:
+        h = constructHARMWithoutPaths(add_attacker(createDecoyNet(scale)))
+        trees = [u.child for u in h.model.nodes if u.child is not None]
+        t1 = timeCall(lambda: [getattr(t, name)(t.topGate) for t in trees for metric, name in metrics], number)
+        t2 = timeCall(lambda: [c.evaluate(*METRICS[metric]) for c in [t.compile() for t in trees] for metric, name in metrics], number)
+        t3 = timeCall(lambda: [t.evaluate(metric) for t in trees for metric, name in metrics], number)
+        same = [getattr(t, name)(t.topGate) for t in trees for metric, name in metrics] == \
+               [t.evaluate(metric) for t in trees for metric, name in metrics]
+        print("Scale %d (%d trees, %d items): recursive %.2f ms, compiled first evaluation %.2f ms, "
+              "compiled next evaluations %.2f ms, same values: %s" %
+              (scale, len(trees), sum([len(t.compiled.ops) for t in trees]), t1, t2, t3, same))
+        results.append((scale, t1, t2, t3))
+
+    return results
+
+def recursiveMetrics(model):
+    """
+    Metrics of all nodes with one recursive walk of the lower layer per metric (values stored in u.val).
+    """
+    values = {}
+    for metric, name in [("impact", "calcImpactRecursive"), ("cost", "calcCostRecursive"), ("pro", "calcProRecursive"),
+                         ("risk", "calcRiskRecursive"), ("roa", "calcReturnOnAttackRecursive"), ("mttc", "calcMTTCRecursive")]:
+        for u in model.nodes:
+            if u.child is not None:
+                u.val = getattr(u.child, name)(u.child.topGate)
+        values[metric] = [u.val for u in model.table]
+    return values
+
+def clearCompiled(model):
+    for u in model.nodes:
+        if u.child is not None:
+            u.child.compiled = None
+
+def benchmarkCalcAll(scales=[10, 50], number=20):
+    """
+    Compare one recursive walk per metric with ag.calcAll (one pass over each compiled tree for all metrics),
+    compiling the trees first and with the trees already compiled.
+    """
+    results = []
+    for scale in scales:
+        model = constructHARMWithoutPaths(add_attacker(createDecoyNet(scale))).model
+        t1 = timeCall(lambda: recursiveMetrics(model), number)
+        t2 = timeCall(lambda: (clearCompiled(model), model.calcAll()), number)
+        t3 = timeCall(model.calcAll, number)
+        values = model.calcAll()
+        same = all([list(values[m]) == v for m, v in recursiveMetrics(model).items()])
+        print("Scale %d (%d nodes): recursive per metric %.2f ms, calcAll with compile %.2f ms, "
+              "calcAll %.2f ms, same values: %s" % (scale, len(model.nodes), t1, t2, t3, same))
+        results.append((scale, t1, t2, t3))
+
+    return results
+
+#=================================================================================================
+# Parallel attack path enumeration
+#=================================================================================================
+
+def benchmarkParallelPaths(scales=[10, 20, 50], processes=[2, 4], number=3):
+    """
+    Compare sequential path enumeration with enumeration split by first hop across worker processes.
+    Pools are started before timing; the speed-up depends on the number of CPUs.
+    """
+    print("%d CPUs" % multiprocessing.cpu_count())
+    results = []
+    for scale in scales:
+        model = constructHARMWithoutPaths(add_attacker(createDecoyNet(scale))).model
+        t1 = timeCall(model.travelAgIterative, number)
+        paths = pathNames(model.allpath)
+        for p in processes:
+            pool = multiprocessing.Pool(processes=p)
+            t2 = timeCall(lambda: model.travelAgParallel(p, 1, pool), number)
+            pool.close()
+            pool.join()
+            same = paths == pathNames(model.allpath)
+            print("Scale %d (%d paths): sequential %.2f ms, %d processes %.2f ms, same paths: %s" %
+                  (scale, len(paths), t1, p, t2, same))
+            results.append((scale, p, t1, t2))
+
+    return results
+
+#=================================================================================================
+# HARM construction
+#=================================================================================================
+
+def benchmarkMakeHARM(scales=[10, 50], number=3):
+    """
+    Time makeHARM without path enumeration (construction of both layers only) and with path enumeration.
+    """
+    results = []
+    for scale in scales:
+        net = add_attacker(createDecoyNet(scale))
+        t1 = timeCall(lambda: makeHARM(net, "attackgraph", 1, "attacktree", 1, 1, False), number)
+        t2 = timeCall(lambda: makeHARM(net, "attackgraph", 1, "attacktree", 1, 1), number)
+        print("Scale %d (%d nodes): makeHARM %.2f ms without paths, %.2f ms with paths" % (scale, len(net.nodes), t1, t2))
+        results.append((scale, t1, t2))
+
+    return results
+
+#=================================================================================================
+# Lower layer attack tree cache
+#=================================================================================================
+
+def benchmarkTreeCache(scales=[10, 50], shuffles=5):
+    """
+    Construct the HARMs of several shuffled networks (without paths) and compute the node metrics, building the
+    lower layer trees for each node or sharing them through a tree cache.
+    """
+    results = []
+    for scale in scales:
+        nets = [createShuffledNet(scale, randomSeed=i) for i in range(1, shuffles+1)]
+        values1, t1 = timeOnce(lambda: [makeHARM(net, "attackgraph", 1, "attacktree", 1, 1, False, cache=None).calcAll() for net in nets])
+        cache = treeCache()
+        values2, t2 = timeOnce(lambda: [makeHARM(net, "attackgraph", 1, "attacktree", 1, 1, False, cache=cache).calcAll() for net in nets])
+        same = values1 == values2
+        print("Scale %d (%d shuffles): without cache %.2f ms, with cache %.2f ms (%d trees, %d hits, %d misses), "
+              "same values: %s" % (scale, shuffles, t1, t2, len(cache.trees), cache.hits, cache.misses, same))
+        results.append((scale, t1, t2, cache.hits, cache.misses))
+
+    return results
+
+#=================================================================================================
+# Budgeted and sampled path enumeration
+#=================================================================================================
+
+def benchmarkPathSampling(cases=[(5, 2.0), (20, 2.0), (5, 6.0)], samples=1000, deadline=2.0):
+    """
+    Compare the number of attack paths, decoy paths and the mean path length from enumeration within a time
+    budget and from sampling (Knuth's estimator), for (scale, out_degree) cases.
+    With out_degree 6 the number of paths is too large to enumerate within the budget.
+    """
+    results = []
+    for scale, out_degree in cases:
+        with quiet():
+            h = constructHARMWithoutPaths(createShuffledNet(scale, 0.5, out_degree, 10))
+        model = h.model
+        t1 = timeOnce(lambda: model.travelAgBudget(deadline=deadline))[1]
+        exact = [model.exact, NP_metric(h), decoyPath(h), MPL_metric(h)]
+        t2 = timeOnce(lambda: model.samplePaths(samples))[1]
+        sampled = [model.exact, NP_metric(h), decoyPath(h), MPL_metric(h)]
+        print("Scale %d, out-degree %.0f: enumeration (exact: %s) %d paths, %d decoy paths, MPL %.2f in %.1f ms; sampling (exact: %s) %.0f paths, %.0f decoy paths, MPL %.2f in %.1f ms" %
+              tuple([scale, out_degree] + exact + [t1] + sampled + [t2]))
+        results.append((scale, out_degree, exact, t1, sampled, t2))
+
+    return results
+
+#=================================================================================================
+# Upper layer attack tree with shared sub-trees
+#=================================================================================================
+
+def countGates(gate, done=None):
+    """
+    Count the distinct gates of an attack tree (shared gates are counted once).
+    """
+    if done is None:
+        done = set()
+    for u in gate.con:
+        if u.t in ['andGate', 'orGate'] and id(u) not in done:
+            done.add(id(u))
+            countGates(u, done)
+    return len(done)
+
+def benchmarkSharedTree(cases=[(None, 0.5), (3, 0.9)], number=3):
+    """
+    Construct the upper layer attack tree of a randomly shuffled decoy network, for (scale, pro) cases (scale None
+    is the example network), as a tree or with shared sub-trees, and compute the attack tree metrics.
+    """
+    results = []
+    for scale, pro in cases:
+        with seeded(), quiet():
+            net = add_attacker(randomShuffling(createDecoyNet(scale), pro)[0])
+        trees = []
+        def construct(shared):
+            trees.append(at(net, 1, shared=shared))
+            t = trees[-1]
+            return [t.calcPro(), t.calcCost(), t.calcImpact(), t.calcRisk(), t.calcReturnOnAttack(), t.calcMTTC()]
+        t1 = timeCall(lambda: construct(False), number)
+        t2 = timeCall(lambda: construct(True), number)
+        same = construct(False) == construct(True)
+        gates1 = sum(trees[0].getGateRecursive(trees[0].topGate, 0, 0))
+        gates2 = countGates(trees[-1].topGate)
+        print("%s (pro %.1f): tree %.2f ms (%d gates), shared %.2f ms (%d gates), same values: %s" %
+              (scaleLabel(scale), pro, t1, gates1, t2, gates2, same))
+        results.append((scale, pro, t1, t2, gates1, gates2))
+
+    return results
+
+#=================================================================================================
+# Batched what-if evaluation
+#=================================================================================================
+
+def assignVulValues(h, columns, row):
+    """
+    Set the values of the vulnerabilities in the lower layer trees of the HARM (one row of a value matrix).
+    """
+    position = dict([(name, i) for i, name in enumerate(columns)])
+    for u in h.model.table:
+        if u.child is not None:
+            for leaf in u.child.compile().leaves:
+                if vulName(leaf) in position:
+                    leaf.val = row[position[vulName(leaf)]]
+            u.child.compiled = None
+
+def sequentialWhatIf(h, columns, values):
+    """
+    Evaluate the node metrics and the path metrics for each row of the value matrix, one row after the other.
+    """
+    results = []
+    for row in values:
+        assignVulValues(h, columns, row)
+        nodes = h.model.calcAll(["pro", "cost", "mttc"])
+        paths = []
+        for path in h.model.allpath:
+            temp = [u.index for u in path if u.child is not None]
+            paths.append((productValue([nodes["pro"][i] for i in temp]), sum([nodes["cost"][i] for i in temp]),
+                           sum([nodes["mttc"][i] for i in temp])))
+        results.append((nodes, paths))
+    return results
+
+def benchmarkBatchEvaluation(scales=[10, 20], scenarios=200):
+    """
+    Evaluate the node and path metrics of a HARM for random vulnerability values (one row per scenario), one
+    scenario after the other or all scenarios at once with the batch evaluator.
+    """
+    results = []
+    for scale in scales:
+        with quiet():
+            h = harm()
+            h.model = makeHARM(createShuffledNet(scale), "attackgraph", 1, "attacktree", 1, 1, cache=None)
+        evaluator = batchEvaluator(h)
+        with seeded():
+            values = [[uniform(0.001, 0.1) for name in evaluator.columns] for i in range(scenarios)]
+        sequential, t1 = timeOnce(lambda: sequentialWhatIf(h, evaluator.columns, values))
+        def batch():
+            nodes = evaluator.nodeValues(values)
+            return nodes, evaluator.pathValues(values, nodes=nodes)
+        (nodes, paths), t2 = timeOnce(batch)
+        same = True
+        for i in range(scenarios):
+            for metric in ["pro", "cost", "mttc"]:
+                same = same and all([abs(a - b) < 1e-9 for a, b in zip(sequential[i][0][metric], nodes[metric][i])])
+            for j, temp in enumerate(sequential[i][1]):
+                same = same and all([abs(a - paths[metric][i, j]) < 1e-9 for a, metric in zip(temp, ["pro", "cost", "mttc"])])
+        print("Scale %d (%d scenarios, %d nodes, %d paths): sequential %.2f ms, batch %.2f ms, same values: %s" %
+              (scale, scenarios, len(h.model.table), len(h.model.allpath), t1, t2, same))
+        results.append((scale, scenarios, t1, t2))
+
+    return results
+
+#=================================================================================================
+# Batched MTTSF for the GA
+#=================================================================================================
+
+def resetCompromised(h):
+    """
+    Mark the nodes of the HARM as not compromised.
+    """
+    for u in h.model.table:
+        if u.comp == True:
+            u.comp = False
+
+def benchmarkMTTSFBatch(scales=[None, 5, 10], sim_num=100, number=10):
+    """
+    Compute the MTTSF objective of the GA (average of sim_num replications) with computeMTTSFLoop or with
+    computeMTTSFBatch, in evaluations per second, and compare the means of the two estimators.
+    """
+    results = []
+    for scale in scales:
+        with quiet():
+            if scale is None:
+                net = add_attacker(copyNet(createDecoyNet()))
+            else:
+                net = createShuffledNet(scale, 0.5)
+            h = constructHARM(net)
+        realNet = network()
+        realNet.nodes = [u for u in net.nodes if u.type == True]
+        def loop():
+            resetCompromised(h)
+            return sum(computeMTTSFLoop(h, realNet, 1.0/3.0, sim_num)) / sim_num
+        def batch():
+            resetCompromised(h)
+            return computeMTTSFBatch(h, realNet, 1.0/3.0, sim_num).mean()
+        t1 = timeCall(loop, number)
+        t2 = timeCall(batch, number)
+        resetCompromised(h)
+        values1 = computeMTTSFLoop(h, realNet, 1.0/3.0, number * sim_num)
+        values2 = computeMTTSFBatch(h, realNet, 1.0/3.0, number * sim_num)
+        print("%s (%d paths): loop %.1f evaluations/s, batch %.1f evaluations/s (%d replications each), "
+              "mean MTTSF %.1f and %.1f" % (scaleLabel(scale),
+              len(h.model.allpath), 1000.0 / t1, 1000.0 / t2, sim_num, sum(values1) / len(values1), values2.mean()))
+        results.append((scale, 1000.0 / t1, 1000.0 / t2))
+
+    return results
+
+#=================================================================================================
+# Discrete-event attack simulation
+#=================================================================================================
+
+def benchmarkAttackEngine(scales=[None, 5], runs=200):
+    """
+    Run the attacker simulation of each shuffling scheme (event policy) and measure the time per event, without
+    the setup of each run (node metrics and path order).
+    """
+    policies = [("adaptive SSL", lambda net, dnet: sslPolicy(net, dnet, 0.01, 1.0/3.0, 0.5, 0.5, 0, [])),
+                ("hybrid SSL", lambda net, dnet: sslPolicy(net, dnet, 0.01, 1.0/3.0, 0.5, 0.5, 0, [], 120.0)),
+                ("baseline MTTSF", lambda net, dnet: mttsfPolicy(net, dnet, 1.0/3.0, [])),
+                ("fixed interval MTTSF", lambda net, dnet: mttsfPolicy(net, dnet, 1.0/3.0, [], False, 24.0)),
+                ("random interval MTTSF", lambda net, dnet: mttsfPolicy(net, dnet, 1.0/3.0, [], False, uniform(0, 48.0)))]
+    results = []
+    for scale in scales:
+        realNet, decoy_net, h = createHARM(scale)
+        attackNet = copyNet(decoy_net)
+        for name, makePolicy in policies:
+            events = 0
+            elapsed = 0.0
+            for i in range(0, runs):
+                resetCompromised(h)
+                engine = attackEngine(h, 1.0)
+                policy = makePolicy(realNet, attackNet)
+                elapsed += timeOnce(lambda: engine.run(policy))[1]
+                events += engine.events
+            print("%s, %s: %.1f events per run, %.2f us per event" % (scaleLabel(scale), name,
+                  float(events) / runs, 1000.0 * elapsed / events))
+            results.append((scale, name, float(events) / runs, 1000.0 * elapsed / events))
+
+    return results
+
+#=================================================================================================
+# Incremental SSL bookkeeping
+#=================================================================================================
+
+def benchmarkSSLTracker(scales=[10, 50], rounds=10):
+    """
+    Count the compromised neighbors of the critical nodes after each compromised node of a campaign (all real
+    nodes of the network, over several shuffling rounds), by scanning the neighbor list computed at each round or
+    with an SSL tracker.
+    """
+    results = []
+    for scale in scales:
+        net, decoy_net, h = createHARM(scale)
+        targets = [u for u in h.model.table if u.type == True]
+        with seeded():
+            shuffle(targets)
+        size = (len(targets) + rounds - 1) // rounds
+        def scan():
+            compNodes = []
+            counts = []
+            for i in range(0, len(targets), size):
+                neighbor_list = computeNeighbors(net)
+                for node in targets[i:i+size]:
+                    compNodes.append(node)
+                    counts.append(checkNeighbors(compNodes, neighbor_list))
+            return counts
+        def track():
+            compNodes = []
+            counts = []
+            for i in range(0, len(targets), size):
+                tracker = sslTracker(net, compNodes)
+                for node in targets[i:i+size]:
+                    tracker.add(node)
+                    counts.append(tracker.compNeighborNo)
+            return counts
+        counts1, t1 = timeOnce(scan)
+        counts2, t2 = timeOnce(track)
+        print("Scale %d (%d compromised nodes, %d rounds): neighbor list scan %.2f ms, tracker %.2f ms, same counts: %s" %
+              (scale, len(targets), rounds, t1, t2, counts1 == counts2))
+        results.append((scale, t1, t2))
+
+    return results
+
+#=================================================================================================
+# Lazy random order of attack paths
+#=================================================================================================
+
+def benchmarkPathOrder(scales=[5, 10, 20], runs=50):
+    """
+    Run the attacker simulation until the security failure and compare the time to order the attack paths for
+    one run: shuffling all paths, or drawing the paths visited by the attacker from a lazy random permutation.
+    """
+    results = []
+    for scale in scales:
+        realNet = createNets(scale)[0]
+        with quiet():
+            net = createShuffledNet(scale)
+            h = constructHARM(net)
+        attackNet = copyNet(net)
+        def attack():
+            resetCompromised(h)
+            engine = attackEngine(h, 1.0)
+            engine.run(mttsfPolicy(realNet, attackNet, 1.0/3.0, []))
+            return engine.paths
+        visited, t0 = timeOnce(lambda: sum([attack() for i in range(0, runs)]))
+        t0 = t0 / runs
+        k = max(1, visited // runs)
+        def full():
+            shuffle(h.model.allpath)
+            return [list(h.model.allpath[i]) for i in range(0, k)]
+        def lazy():
+            temp = randomPaths(h.model.allpath)
+            return [list(next(temp)) for i in range(0, k)]
+        t1 = timeCall(full, runs)
+        t2 = timeCall(lazy, runs)
+        print("Scale %d (%d paths, %.1f visited per run, %.2f ms per run): full shuffle %.3f ms, lazy order %.3f ms" %
+              (scale, len(h.model.allpath), float(visited) / runs, t0, t1, t2))
+        results.append((scale, len(h.model.allpath), float(visited) / runs, t1, t2))
+
+    return results
+
+#=================================================================================================
+# Node vectors of the attack loops
+#=================================================================================================
+
+def benchmarkNodeVectors(scales=[None, 5, 10], runs=200):
+    """
+    Run computeMTTSF (GA) and the baseline attacker simulation on one HARM, building the node vectors for each
+    run (node metrics of the lower layer and node properties) or keeping the node metrics of the lower layer
+    for the HARM (node properties are read at each run), in ms per run.
+    """
+    results = []
+    for scale in scales:
+        realNet, decoy_net, h = createHARM(scale)
+        attackNet = copyNet(decoy_net)
+        def ga(rebuild):
+            def run():
+                resetCompromised(h)
+                if rebuild:
+                    h.model.vectors = None
+                return computeMTTSF(h, realNet, 1.0/3.0)
+            return run
+        def engine(rebuild):
+            def run():
+                resetCompromised(h)
+                if rebuild:
+                    h.model.vectors = None
+                return attackEngine(h, 1.0).run(mttsfPolicy(realNet, attackNet, 1.0/3.0, []))
+            return run
+        t1 = timeCall(ga(True), runs)
+        t2 = timeCall(ga(False), runs)
+        t3 = timeCall(engine(True), runs)
+        t4 = timeCall(engine(False), runs)
+        print("%s (%d nodes): computeMTTSF %.3f ms per run rebuilt, %.3f ms cached; attack engine %.3f ms rebuilt, "
+              "%.3f ms cached" % (scaleLabel(scale), len(h.model.table),
+              t1, t2, t3, t4))
+        results.append((scale, t1, t2, t3, t4))
+
+    return results
+
+
+if __name__ == '__main__':
+
+    benchmarkNodeMemory()
+    benchmarkCopyNet()
+    benchmarkShuffleStep()
+    benchmarkPathEnumeration()
+    benchmarkPathCount()
+    benchmarkPathStore()
+    benchmarkReachIndex()
+    benchmarkHopTable()
+    benchmarkCompiledTree()
+    benchmarkCalcAll()
+    benchmarkParallelPaths()
+    benchmarkMakeHARM()
+    benchmarkTreeCache()
+    benchmarkPathSampling()
+    benchmarkSharedTree()
+    benchmarkBatchEvaluation()
+    benchmarkMTTSFBatch()
+    benchmarkAttackEngine()
+    benchmarkSSLTracker()
+    benchmarkPathOrder()
+    benchmarkNodeVectors()
@@ -8,6 +8,7 @@ import copy
 import math
 from SDIoTGen import *
 from SecurityEvaluator import *
+from PathCount import pathCountsTo, hopTable
 from random import *
 from sortedcontainers.sortedlist import SortedList
 
@@ -33,21 +34,16 @@ def travelPath(conNode, dserver, path, allpath, oriNode):
                
     return None
 
-def travelNetAll(net, dserver): 
-    allpath = []
-
-    for node1 in net.nodes:
-        if node1.type == True and node1.name.startswith("server") == False:
-             #node1.current_hop = 0
-             node1.num = 0
-             node1.inPath = 1
-             path = [node1.name]
-             travelPath(node1, dserver, path, allpath, node1) 
-             node1.inPath = 0
-             del path
-             #print(node1.name, node1.num)
+def travelNetAll(net, dserver, reach=None): 
+    """
+    Assign to each real node the number of paths to the decoy server (counted without enumeration).
+    reach is the reachIndex of the decoy server, built if not given.
+    """
+    sources = [node1 for node1 in net.nodes if node1.type == True and node1.name.startswith("server") == False]
+    counts = pathCountsTo(dserver, lambda v: v.con, net.nodes, sources, reach)
+    for node1 in sources:
+        node1.num = counts[node1]
     
-    #print(allpath)
     return None
 
 def getNameList(path):
@@ -57,9 +53,7 @@ def getNameList(path):
     return temp
 
 def returnNode(net, name):
-    for n in net.nodes:
-        if n.name == name:
-            return n
+    return net.getNode(name)
 
 def returnMax(sortedList):
     val = 0
@@ -86,9 +80,8 @@ def checkNodeNotInPath(con, newCon, allpath):
     return True
 
 def checkConnection(iot, decoy):
-    for node in iot.con:
-        if node.name == decoy.name:
-            return 1
+    if decoy in iot.con:
+        return 1
     return 0
 
 def getDecoys(nodes, threshold_pro):
@@ -107,13 +100,16 @@ def getDecoys(nodes, threshold_pro):
     
     return sample(nameList, k=num)
 
+def getServers(nodes):
+    return [node for node in nodes if node.name.startswith("server") == True]
+
 def getDecoyServer(nodes):
     for node in nodes:
         if node.name.startswith("decoy_server") == True:
             #print(node.name)
             return node
 
-def removeNodeWithMinAP(node):
+def removeNodeWithMinAP(node, hops=None, net=None):
     val = 0
     name = ""
     flag = False
@@ -133,7 +129,9 @@ def removeNodeWithMinAP(node):
     
     for conNode in node.con:
         if conNode.name == name:
-            disconnectOneWay(node, conNode)
+            disconnectOneWay(node, conNode, net)
+            if hops is not None:
+                hops.removeEdge(node, conNode)
             break
     """ 
     for conNode in node.con:
@@ -151,12 +149,16 @@ def getRealCon(node):
     #print(num)
     return num
 
-def heuristicShuffling(decoy_net, threshold_pro, out_degree, maxLength):
+def heuristicShuffling(decoy_net, threshold_pro, out_degree, maxLength, inplace=False):
     """
     Real node type: True
     Decoy node type: emulated or real
+    @param inplace: shuffle decoy_net itself instead of a copy, the changed nodes are recorded in decoy_net.touched
     """
-    shuffled_net = copyNet(decoy_net)
+    if inplace:
+        shuffled_net = decoy_net
+    else:
+        shuffled_net = copyNet(decoy_net)
     cost = 0
     
     # Change connection towards decoy nodes
@@ -167,12 +169,18 @@ def heuristicShuffling(decoy_net, threshold_pro, out_degree, maxLength):
             #print("current cons: ", getNameList(node1.con))
             for node2 in shuffled_net.nodes:
                 if node2.name in decoys and checkConnection(node1, node2) == 0:
-                    connectOneWay(node1, node2)
+                    connectOneWay(node1, node2, shuffled_net)
                     cost += 1
-            for node3 in node1.con:
+            #Removing a connection skips the next one, as when the connections were a list changed in the loop
+            skip = False
+            for node3 in list(node1.con):
+                if skip == True:
+                    skip = False
+                    continue
                 if node3.name.find("decoy") > -1 and node3.name not in decoys:
-                    disconnectOneWay(node1, node3)
+                    disconnectOneWay(node1, node3, shuffled_net)
                     cost += 1
+                    skip = True
             #print("new cons: ", getNameList(node1.con))
             del decoys
     
@@ -198,6 +206,10 @@ def heuristicShuffling(decoy_net, threshold_pro, out_degree, maxLength):
     del sortedList
     del reverseList
     
+    #Longest hops from each node to the servers, updated when connections are added or removed
+    #A connection to node2 gives node1 up to maxLength + 1 hops, no other node may get more through it
+    hops = hopTable(shuffled_net.nodes, getServers(shuffled_net.nodes), lambda v: v.con, maxLength + 1)
+    
     #flag = False
     for node1 in shuffled_net.nodes:
         if node1.name in minList:
@@ -209,20 +221,24 @@ def heuristicShuffling(decoy_net, threshold_pro, out_degree, maxLength):
                     #Check out_degree for real IoT nodes
                     if getRealCon(node1) > out_degree:
                         #print("Remove connection for node1")
-                        removeNodeWithMinAP(node1)
+                        removeNodeWithMinAP(node1, hops, shuffled_net)
                         cost += 1
                     
                     #print("node2 in maxList:", node1.name, node2.name)
                     if getRealCon(node1) <= out_degree:
                         if len(decoy_net.nodes) < 50:
                             print("Add connection for node1")
-                            connectOneWay(node1, node2)
+                            connectOneWay(node1, node2, shuffled_net)
+                            hops.addEdge(node1, node2)
                             cost += 1
                         else:
-                            if node2.calcNodeHopsToTarget(0, 0) <= maxLength:
-                                print("Add connection for node1")
-                                connectOneWay(node1, node2)
-                                cost += 1
+                            if hops[node2] <= maxLength:
+                                connectOneWay(node1, node2, shuffled_net)
+                                if hops.addEdgeWithin(node1, node2, maxLength + 1):
+                                    print("Add connection for node1")
+                                    cost += 1
+                                else:
+                                    disconnectOneWay(node1, node2, shuffled_net)
                 
         
     del maxList
@@ -11,6 +11,9 @@ import math
 #------------------------------------
 def NP_metric(harm):
     
+    #Count the paths when they are not stored, or use the estimate when paths are sampled
+    if len(harm.model.allpath) == 0 or harm.model.exact == False:
+        return sum(harm.model.targetCounts().values())
     value = len(harm.model.allpath)
     return value
 
@@ -77,11 +80,12 @@ def decoyPath(h):
     """
     dsum = 0
     rsum = 0
-    for path in h.model.allpath:
-        if 'decoy_server' in path[len(path)-2].name:
-            dsum += 1
-        elif 'server' in path[len(path)-2].name:
-            rsum += 1
+    #Paths are counted per target, without enumeration (estimated when paths are sampled)
+    for target, num in h.model.targetCounts().items():
+        if 'decoy_server' in target.name:
+            dsum += num
+        elif 'server' in target.name:
+            rsum += num
     #print(dsum, float(dsum)/float(dsum+rsum))
     return dsum
 
@@ -133,6 +137,41 @@ def decoyProceedPro(harm):
         return 1.0
     return float(pro/dsum)
 
+#===================================================================================
+#Compute path-based metrics in one pass over streamed attack paths
+#===================================================================================
+def pathMetricsStream(h):
+    """
+    Compute NP, MPL, MoPL, SDPL, SP and the number of decoy attack paths from h.model.iterPaths().
+    Paths are not stored, so memory does not grow with the number of paths.
+    @return: dictionary of metric values (None for length metrics when there is no path)
+    """
+    num = 0
+    mean = 0.0
+    m2 = 0.0
+    shortest = None
+    lengths = {} #Number of paths of each length, in order of first appearance
+    dsum = 0
+    for path in h.model.iterPaths():
+        length = int(len(path)-3)
+        num += 1
+        #Running mean and sum of squared deviations
+        delta = length - mean
+        mean += delta/num
+        m2 += delta * (length - mean)
+        if shortest is None or length < shortest:
+            shortest = length
+        lengths[length] = lengths.get(length, 0) + 1
+        if 'decoy_server' in path[len(path)-2].name:
+            dsum += 1
+
+    values = {"NP": num, "MPL": None, "MoPL": None, "SDPL": None, "SP": shortest, "decoyPath": dsum}
+    if num > 0:
+        values["MPL"] = mean
+        values["MoPL"] = max(lengths, key=lengths.get)
+        values["SDPL"] = math.sqrt(m2/num)
+    return values
+
 #====================================================================================
 #Compute the cost of solutions
 #====================================================================================
@@ -6,13 +6,72 @@ This module contains network object and relevant functions.
 from Node import *
 import copy
 
+class nodeList(list):
+    """
+    Node list of a network.
+    Counts the changes made to the list, so that the network can tell that its index is stale when the list was
+    changed without addNode and removeNode.
+    """
+    #Number of changes, also the starting value of lists rebuilt by pickle and deepcopy before their state is set
+    edits = 0
+
+    def append(self, node):
+        list.append(self, node)
+        self.edits += 1
+
+    def extend(self, nodes):
+        list.extend(self, nodes)
+        self.edits += 1
+
+    def insert(self, i, node):
+        list.insert(self, i, node)
+        self.edits += 1
+
+    def remove(self, node):
+        list.remove(self, node)
+        self.edits += 1
+
+    def pop(self, i=-1):
+        self.edits += 1
+        return list.pop(self, i)
+
+    def clear(self):
+        list.clear(self)
+        self.edits += 1
+
+    def sort(self, *args, **kwargs):
+        list.sort(self, *args, **kwargs)
+        self.edits += 1
+
+    def reverse(self):
+        list.reverse(self)
+        self.edits += 1
+
+    def __setitem__(self, i, node):
+        list.__setitem__(self, i, node)
+        self.edits += 1
+
+    def __delitem__(self, i):
+        list.__delitem__(self, i)
+        self.edits += 1
+
+    def __iadd__(self, nodes):
+        self.extend(nodes)
+        return self
+
+    def __imul__(self, n):
+        list.__imul__(self, n)
+        self.edits += 1
+        return self
+
+
 class network(object):
     """
     Create network object.
     """
     def __init__(self):
         #Initialize node list
-        self.nodes = []
+        self.nodes = nodeList()
         #Initialize start and end points
         self.s = None
         self.e = None
@@ -24,18 +83,347 @@ class network(object):
         self.max_depth = 0
         #Store the maximum hop
         self.max_hop = 0
+        #Index nodes by name and id for constant time lookups: the first node with a name or id, and all nodes with
+        #it in list order; the index matches the node list indexedList after indexedEdits changes (see checkIndex)
+        self.nameIndex = {}
+        self.idIndex = {}
+        self.nameNodes = {}
+        self.idNodes = {}
+        self.indexedList = None
+        self.indexedEdits = 0
+        #Topology version, increased when nodes are added or removed or marked as changed
+        self.version = 0
+        #Connection version, increased by the edge helpers when they change a connection of the network
+        self.edges = 0
+        #Neighbor counts of the critical nodes for a topology and connection version (see neighborCounts)
+        self.neighbors = None
+        #Names of the nodes whose connections or compromise state changed since the last snapshot commit
+        self.touched = set()
+
+    def addNode(self, node):
+        """
+        Append node to the network and index it.
+        """
+        self.checkIndex()
+        self.nodes.append(node)
+        self.indexNode(node)
+        self.indexedEdits = self.nodes.edits
+        self.version += 1
+        return None
+
+    def removeNode(self, node):
+        """
+        Remove node from the network and the index.
+        """
+        self.checkIndex()
+        self.nodes.remove(node)
+        self.unindexNode(node)
+        self.indexedEdits = self.nodes.edits
+        self.version += 1
+        return None
+
+    def indexNode(self, node):
+        #The first node with a given name or id is found, same as a linear scan
+        self.nameNodes.setdefault(node.name, []).append(node)
+        self.nameIndex.setdefault(node.name, node)
+        id = getattr(node, 'id', None)
+        if id is not None:
+            self.idNodes.setdefault(id, []).append(node)
+            self.idIndex.setdefault(id, node)
+
+    def unindexNode(self, node):
+        #The next node with the name or id of the removed node takes over its entry
+        for key, nodes, index in [(node.name, self.nameNodes, self.nameIndex), (getattr(node, 'id', None), self.idNodes, self.idIndex)]:
+            if key is None:
+                continue
+            temp = nodes[key]
+            del temp[[n is node for n in temp].index(True)]
+            if len(temp) > 0:
+                index[key] = temp[0]
+            else:
+                del nodes[key]
+                del index[key]
+
+    def reindex(self):
+        """
+        Rebuild the index from the node list.
+        """
+        if type(self.nodes) is not nodeList:
+            self.nodes = nodeList(self.nodes)
+        self.nameIndex = {}
+        self.idIndex = {}
+        self.nameNodes = {}
+        self.idNodes = {}
+        for node in self.nodes:
+            self.indexNode(node)
+        self.indexedList = self.nodes
+        self.indexedEdits = self.nodes.edits
+        return None
+
+    def changed(self):
+        """
+        Mark the topology as changed, when connections are changed in place.
+        """
+        self.version += 1
+
+    def touch(self, node):
+        """
+        Record that the connections or compromise state of node changed (see snapshot.commit).
+        """
+        self.touched.add(node.name)
+
+    def connectionChanged(self, node):
+        """
+        Record that a connection of node was added or removed (see the edge helpers).
+        """
+        self.edges += 1
+        self.touch(node)
+
+    def checkIndex(self):
+        #Changes made to the node list directly, or a new list assigned to nodes, are picked up here
+        if self.nodes is not self.indexedList or self.nodes.edits != self.indexedEdits:
+            self.reindex()
+
+    def getNode(self, name):
+        """
+        Return the node with the given name (None if not in the network).
+        """
+        self.checkIndex()
+        return self.nameIndex.get(name)
+
+    def getNodeById(self, id):
+        """
+        Return the node with the given id (None if not in the network).
+        """
+        self.checkIndex()
+        return self.idIndex.get(id)
+
+    def getNodeByAgName(self, name):
+        """
+        Return the network node of an attack graph node name, i.e. "ag_" + node name.
+        """
+        if not name.startswith("ag_"):
+            return None
+        return self.getNode(name[3:])
 
 
 def copyNet(net):
     """
     Copy the network to a network.
+    Node state is copied and connections are rebuilt between the copied nodes.
+    Vulnerability networks are not changed after construction, so they are shared between copies.
     """
-    
+    if type(net) is not network:
+        return copy.deepcopy(net)
+
     temp = network()
-    temp = copy.deepcopy(net)
+    #Map each original node to its copy
+    memo = {}
+    queue = []
+    for n in [net.s, net.e] + net.nodes:
+        if n is not None and n not in memo:
+            memo[n] = copyNode(n)
+            queue.append(n)
+
+    #Nodes only reachable through connections are copied as well
+    i = 0
+    while i < len(queue):
+        n = queue[i]
+        for conNode in n.con:
+            if conNode not in memo:
+                memo[conNode] = copyNode(conNode)
+                queue.append(conNode)
+        i += 1
+
+    for n in queue:
+        memo[n].con = conSet([memo[conNode] for conNode in n.con])
+    
+    for n in net.nodes:
+        temp.addNode(memo[n])
+    if net.s is not None:
+        temp.s = memo[net.s]
+    if net.e is not None:
+        temp.e = memo[net.e]
+    temp.subnets = list(net.subnets)
+    temp.vuls = list(net.vuls)
+    temp.max_depth = net.max_depth
+    temp.max_hop = net.max_hop
     
     return temp
 
+#---------------------------------------------------------------------------------------------------
+#Copy-on-write topology snapshots used between shuffles
+#---------------------------------------------------------------------------------------------------
+
+def readNodeState(n):
+    """
+    Return the part of a node that changes between shuffles: connections (by name, in order) and compromise state.
+    """
+    return (tuple([conNode.name for conNode in n.con]), n.comp, n.prev_comp)
+
+def writeNodeState(net, n, state):
+    """
+    Set the connections and compromise state of node n in net.
+    Connected nodes which are not in net (e.g. a removed decoy) are left out.
+    """
+    net.changed()
+    net.checkIndex()
+    temp = list(map(net.nameIndex.get, state[0]))
+    if None in temp:
+        #Start and end are not in the node list
+        ends = dict([(u.name, u) for u in [net.s, net.e] if u is not None])
+        temp = [conNode if conNode is not None else ends.get(name) for conNode, name in zip(temp, state[0])]
+        temp = [conNode for conNode in temp if conNode is not None]
+    n.con = conSet(temp)
+    n.comp = state[1]
+    n.prev_comp = state[2]
+
+class snapshot(object):
+    """
+    Create an immutable version of the network topology.
+    All versions share one base network; each version stores the states of the nodes changed since its parent,
+    and every flatten versions the states of all nodes changed since the base, so that a node state is found in
+    at most flatten steps. Only the last history versions (at least) can be rolled back to.
+    """
+    def __init__(self, net, parent=None, changes=None, flatten=16, history=64):
+        if parent is None:
+            #Private copy that is never changed
+            self.base = copyNet(net)
+            self.changes = {}
+            self.version = 0
+            self.flatten = flatten
+            self.history = history
+            self.flat = {}
+        else:
+            self.base = parent.base
+            self.changes = changes
+            self.version = parent.version + 1
+            self.flatten = parent.flatten
+            self.history = parent.history
+            self.flat = None
+            if self.version % self.flatten == 0:
+                self.flat = parent.states()
+                self.flat.update(changes)
+        self.parent = parent
+        if self.flat is not None:
+            self.dropVersions()
+
+    #Cut the chain at the first flat version at least history versions back
+    def dropVersions(self):
+        temp = self.parent
+        while temp is not None:
+            if temp.flat is not None and temp.version <= self.version - self.history:
+                temp.parent = None
+                break
+            temp = temp.parent
+
+    #State of a node in this version, None if the node is not in the snapshot
+    def lookup(self, name):
+        temp = self
+        while temp.flat is None:
+            if name in temp.changes:
+                return temp.changes[name]
+            temp = temp.parent
+        if name in temp.flat:
+            return temp.flat[name]
+        n = self.base.getNode(name)
+        if n is None:
+            return None
+        return readNodeState(n)
+
+    def nodeState(self, name):
+        """
+        Return the state of the node in this version.
+        """
+        state = self.lookup(name)
+        if state is None:
+            raise ValueError("node is not in the snapshot: " + name)
+        return state
+
+    def states(self):
+        """
+        Return the states of all nodes changed since the base, as a dictionary {name: state}.
+        """
+        chain = []
+        temp = self
+        while temp.flat is None:
+            chain.append(temp)
+            temp = temp.parent
+        result = dict(temp.flat)
+        for temp in reversed(chain):
+            result.update(temp.changes)
+        return result
+
+    def commit(self, net, names=None):
+        """
+        Record the network as the next version, storing only the nodes that changed.
+        @param names: names of the nodes which may have changed (e.g. net.touched, see network.touch), all nodes of net by default
+        """
+        if names is None:
+            nodes = net.nodes
+        else:
+            nodes = [n for n in [net.getNode(name) for name in names] if n is not None]
+        changes = {}
+        for n in nodes:
+            state = readNodeState(n)
+            if state != self.lookup(n.name):
+                changes[n.name] = state
+        return snapshot(net, self, changes)
+
+    def rollback(self, steps=1):
+        """
+        Return the version steps before this one (or the oldest version kept).
+        """
+        temp = self
+        for i in range(0, steps):
+            if temp.parent is None:
+                break
+            temp = temp.parent
+        return temp
+
+    def changedNames(self, other):
+        """
+        Names of the nodes changed between this version and other (possibly a few more).
+        """
+        names = set()
+        a = self
+        b = other
+        while a is not b:
+            if a.version < b.version:
+                a, b = b, a
+            if a.flat is not None and a.parent is not b:
+                #Both versions are compared through their changes since the base
+                names.update(a.flat)
+                names.update(b.states())
+                break
+            names.update(a.changes)
+            a = a.parent
+        return names
+
+    def update(self, net, current):
+        """
+        Bring a network materialised at version current to this version.
+        Only the nodes changed between the two versions are touched, nodes which are not in net are skipped.
+        """
+        for name in self.changedNames(current):
+            n = net.getNode(name)
+            state = self.lookup(name)
+            if n is not None and state is not None:
+                writeNodeState(net, n, state)
+        return net
+
+    def materialise(self):
+        """
+        Create a network for this version.
+        """
+        net = copyNet(self.base)
+        for name, state in self.states().items():
+            n = net.getNode(name)
+            if n is not None:
+                writeNodeState(net, n, state)
+        return net
+
+
 def constructSE(net):
     """
     Set the start and end in the network.
@@ -51,20 +439,24 @@ def constructSE(net):
             n.con.append(net.e)
 
           
-def connectOneWay(node1, node2):
+def connectOneWay(node1, node2, net=None):
     """
     Connect node1 to node2 in the network.
+    Connections do not change the nodes of the network, so the name and id index stays valid.
+    @param net: network of the nodes, told about the change (see network.connectionChanged)
     """
     #no self connection
     if node1 is node2:
         return None
     #connect node1 to node2
-    if (node2 not in node1.con):
-        node1.con.append(node2)    
-        #print(node1.name, node2.name)
+    if node2 not in node1.con:
+        node1.con.add(node2)
+        if net is not None:
+            net.connectionChanged(node1)
+    #print(node1.name, node2.name)
 
 
-def connectTwoWays(node1, node2):
+def connectTwoWays(node1, node2, net=None):
     """
     Connect node1 with node2 in the network.
     """
@@ -72,10 +464,8 @@ def connectTwoWays(node1, node2):
     if node1 is node2:
         return None
     #create connections
-    if (node2 not in node1.con):
-        node1.con.append(node2)
-    if (node1 not in node2.con):
-        node2.con.append(node1)
+    connectOneWay(node1, node2, net)
+    connectOneWay(node2, node1, net)
     return None
 
 def removeNodeFromList(node, con_list):
@@ -88,24 +478,23 @@ def removeNodeFromList(node, con_list):
             break
     return None
 
-def disconnectOneWay(node1, node2):
+def disconnectOneWay(node1, node2, net=None):
     """
     Disconnect node1 with node2 in the network
+    @param net: network of the nodes, told about the change (see network.connectionChanged)
     """
-    names = [i.name for i in node1.con]
-    if node2.name in names:
-        #print(node2.name, names)
-        removeNodeFromList(node2, node1.con)
+    if node2 in node1.con:
+        node1.con.discard(node2)
+        if net is not None:
+            net.connectionChanged(node1)
     return None
 
-def disconnectTwoWays(node1, node2):
+def disconnectTwoWays(node1, node2, net=None):
     """
     Disconnect node1 and node2 in the network.
     """
-    if node2 in node1.con:
-        node1.con.remove(node2)   
-    if node1 in node2.con:
-        node2.con.remove(node1)  
+    disconnectOneWay(node1, node2, net)
+    disconnectOneWay(node2, node1, net)
     return None
 
 def printNet(net):
@@ -150,3 +539,20 @@ def computeNeighbors(net):
             if conNode.critical == True:
                 neighbor_list.append(node)
     return neighbor_list
+
+def neighborCounts(net):
+    """
+    Count how many times each node appears in computeNeighbors, by attack graph name ("ag_" + node name).
+    The counts are kept until nodes are added or removed, an edge helper given the network changes a connection
+    or net.changed() is called (needed after changing node.con directly).
+    :returns: dictionary {attack graph name: count} and length of the neighbor list
+    """
+    version = (net.version, net.edges)
+    if net.neighbors is None or net.neighbors[0] != version:
+        counts = {}
+        neighbor_list = computeNeighbors(net)
+        for neighbor in neighbor_list:
+            name = "ag_"+neighbor.name
+            counts[name] = counts.get(name, 0) + 1
+        net.neighbors = (version, counts, len(neighbor_list))
+    return net.neighbors[1], net.neighbors[2]
@@ -9,15 +9,96 @@ from random import *
 from math import *
 
 
+slotCache = {}
+
+def slotNames(cls):
+    """
+    Return all slot names declared along the class hierarchy of cls.
+    """
+    if cls in slotCache:
+        return slotCache[cls]
+    names = []
+    for c in reversed(cls.__mro__):
+        for slot in c.__dict__.get('__slots__', ()):
+            if slot not in names:
+                names.append(slot)
+    slotCache[cls] = names
+    return names
+
+def copyNode(n):
+    """
+    Create a node of the same type with the same state.
+    Lists are copied, other values (including connections and vulnerability networks) are shared.
+    """
+    temp = object.__new__(type(n))
+    for slot in slotNames(type(n)):
+        try:
+            value = getattr(n, slot)
+        except AttributeError:
+            continue
+        if type(value) is list:
+            value = list(value)
+        setattr(temp, slot, value)
+    return temp
+
+
+class conSet(object):
+    """
+    Ordered set of connected nodes.
+    Keeps insertion order so that path enumeration stays deterministic;
+    membership, add and remove take constant time.
+    """
+    __slots__ = ('items',)
+
+    def __init__(self, nodes=()):
+        self.items = dict.fromkeys(nodes)
+
+    def __contains__(self, node):
+        return node in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+    #Connections must not be added or removed while iterating, loops which change them iterate over a copy
+    def __iter__(self):
+        return iter(self.items)
+
+    def __repr__(self):
+        return "conSet(%r)" % list(self.items)
+
+    def add(self, node):
+        self.items[node] = None
+
+    def append(self, node):
+        self.items[node] = None
+
+    def extend(self, nodes):
+        for node in nodes:
+            self.items[node] = None
+
+    def remove(self, node):
+        if node not in self.items:
+            raise ValueError("node not in connections")
+        del self.items[node]
+
+    def discard(self, node):
+        self.items.pop(node, None)
+
+    def clear(self):
+        self.items.clear()
+
+
 class node(object):
     """
     Create basic node object.
     """
+    #Nodes are created in large numbers by copyNet and constructHARM, keep them compact
+    __slots__ = ('name', 'con', 'child', 'isStart', 'isEnd', 'subnet', 'inPath', 'num', 'hop', 'current_hop')
     
     def __init__(self, name):
         self.name = name
         #Set connections        
-        self.con = []
+        self.con = conSet()
         #Store lower layer info     
         self.child = None
         #Set default value of start/end
@@ -44,29 +125,29 @@ class node(object):
     def isLeaf(self):
         return (len(self.con) is 1)
     
-    def calcNodeHopsToTarget(self, hop, maxHop):
+    def calcNodeHopsToTarget(self, hop, maxHop, reach=None):
         """
         Calculate the maximum number of hops from the node to the target.
+        Connections to nodes which are not in the reachIndex of the servers (reach) are skipped.
         """
+        inPath = self.inPath
+        self.inPath = 1
         for con in self.con:
-            if con.inPath == 0:
-                con.inPath = 1
+            if con.inPath == 0 and (reach is None or con in reach):
                 if con.name.startswith("server") == False:
-                    hop = con.calcNodeHopsToTarget(hop, maxHop)
-                else:
-                    hop += 1
-                
-                con.inPath = 0
-                if hop > maxHop:
-                    maxHop = hop
-                    
-        return hop
+                    maxHop = con.calcNodeHopsToTarget(hop + 1, maxHop, reach)
+                elif hop + 1 > maxHop:
+                    maxHop = hop + 1
+        self.inPath = inPath
+        return maxHop
 
 
 class device(node):
     """
     Create smart device object.
     """
+    __slots__ = ('vul', 'type', 'critical', 'comp', 'height', 'parent', 'comm', 'depth', 'pro', 'prev_comp')
+
     def __init__(self, name):
         super(device, self).__init__(name)
         #Initialize vulnerability network
@@ -78,6 +159,7 @@ class device(node):
         self.subnet = []
         #For tree topology
         self.height = None
+        self.depth = None
         self.parent = []
         self.comm = []
         self.pro = None
@@ -87,6 +169,8 @@ class device(node):
 
 class realNode(node):
     #Create a real node in the network
+    __slots__ = ('vul', 'type', 'id', 'val', 'critical', 'comp', 'pro', 'prev_comp')
+
     def __init__(self, name):
         super(realNode, self).__init__(name)
         self.vul = None
@@ -108,6 +192,8 @@ class realNode(node):
 
 class decoyNode(node):
     #Create a decoy node in the network
+    __slots__ = ('vul', 'type', 'id', 'val', 'critical', 'comp', 'pro', 'prev_comp')
+
     def __init__(self, name):
         super(decoyNode, self).__init__(name)
         self.vul = None
@@ -0,0 +1,132 @@
+'''
+This module enumerates attack paths in worker processes.
+The search is split by the first hops after the attacker: each prefix is expanded by a worker and the paths
+are merged in the order of the sequential search, so the result is the same as ag.travelAgIterative.
+Workers receive the attack graph as lists of node indexes and send the paths back as integer arrays.
+'''
+
+import multiprocessing
+from array import array
+
+#Successor indexes of each node and targets reachable from each node (same pruning as ag.iterPaths)
+def graphTables(model):
+    reach = model.reach if model.reach is not None else model.reachIndex()
+    e = model.e
+    succ = []
+    for u in model.table:
+        succ.append([v.index for v in model.pathCon(u) if v is e or reach[v.index]])
+    return succ, reach
+
+def expandPrefix(succ, reach, e, path, visited, limit):
+    """
+    Yield the paths (node indexes) extending the prefix to the end point e, with at most limit nodes before e.
+    """
+    if path[-1] == e:
+        yield path
+        return
+    path = list(path)
+    masks = []
+    stack = [iter(succ[path[-1]])]
+    while stack:
+        for v in stack[-1]:
+            bit = 1 << v
+            if not visited & bit:
+                if v == e:
+                    yield path + [v]
+                    continue
+                if not reach[v] & ~visited or len(path) >= limit:
+                    continue
+                path.append(v)
+                masks.append(visited)
+                visited |= bit
+                stack.append(iter(succ[v]))
+                break
+        else:
+            stack.pop()
+            if masks:
+                path.pop()
+                visited = masks.pop()
+
+def splitPrefixes(succ, reach, s, e, length, limit):
+    """
+    Search from s until paths have the given number of nodes.
+    @return: list of (prefix, visited nodes) in the order of the sequential search; complete paths are included as prefixes
+    """
+    prefixes = []
+    path = [s]
+    visited = 0
+    masks = []
+    stack = [iter(succ[s])]
+    while stack:
+        for v in stack[-1]:
+            bit = 1 << v
+            if not visited & bit:
+                if v == e:
+                    prefixes.append((path + [v], visited))
+                    continue
+                if not reach[v] & ~visited or len(path) >= limit:
+                    continue
+                if len(path) + 1 == length:
+                    prefixes.append((path + [v], visited | bit))
+                    continue
+                path.append(v)
+                masks.append(visited)
+                visited |= bit
+                stack.append(iter(succ[v]))
+                break
+        else:
+            stack.pop()
+            path.pop()
+            if masks:
+                visited = masks.pop()
+    return prefixes
+
+#Task run by a worker: expand consecutive prefixes
+def expandPrefixes(task):
+    succ, reach, e, limit, prefixes = task
+    flat = array('i')
+    lengths = array('i')
+    for prefix, visited in prefixes:
+        for path in expandPrefix(succ, reach, e, prefix, visited, limit):
+            flat.extend(path)
+            lengths.append(len(path))
+    return flat, lengths
+
+def parallelPaths(model, store, processes=None, splitDepth=1, pool=None, maxLength=None):
+    """
+    Enumerate the attack paths of the attack graph in worker processes and add them to the store.
+    @param processes: number of worker processes (all CPUs by default)
+    @param splitDepth: number of hops after the attacker used to split the search (1 or 2)
+    @param pool: existing multiprocessing pool to use instead of starting one
+    @param maxLength: maximum number of nodes between the attacker and the end point
+    """
+    if model.s is None or model.e is None:
+        return store
+    succ, reach = graphTables(model)
+    #Number of nodes in the path (start, attacker and nodes) before the end point
+    limit = len(model.table) if maxLength is None else maxLength + 2
+    #Prefixes: start, attacker and the first hops
+    prefixes = splitPrefixes(succ, reach, model.s.index, model.e.index, splitDepth + 2, limit)
+    if len(prefixes) == 0:
+        return store
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+
+    #Consecutive prefixes are grouped so that results come back in order
+    chunks = max(1, min(len(prefixes), 4 * processes))
+    size = (len(prefixes) + chunks - 1) // chunks
+    tasks = [(succ, reach, model.e.index, limit, prefixes[i:i+size]) for i in range(0, len(prefixes), size)]
+
+    if pool is None:
+        workers = multiprocessing.Pool(processes=processes)
+        try:
+            results = workers.map(expandPrefixes, tasks)
+        finally:
+            workers.close()
+            workers.join()
+    else:
+        results = pool.map(expandPrefixes, tasks)
+
+    for flat, lengths in results:
+        store.extendIndexes(flat, lengths)
+    return store
@@ -0,0 +1,463 @@
+'''
+This module counts simple paths without enumerating them.
+When the part of the graph between the source and the target is acyclic, every walk is a simple path and
+the counts are computed by dynamic programming in topological order. Otherwise the paths are enumerated.
+The longest number of hops to the targets is kept in a table in the same way.
+
+Successors are given by a function so that the same code works for networks (node.con) and attack graphs
+(only nodes that can be part of an attack path).
+'''
+
+#Nodes reachable from the start without expanding the stop node
+def reachableNodes(start, succ, stop=None):
+    seen = set([start])
+    stack = [start]
+    while stack:
+        u = stack.pop()
+        if u is stop:
+            continue
+        for v in succ(u):
+            if v not in seen:
+                seen.add(v)
+                stack.append(v)
+    return seen
+
+#Predecessors of each node restricted to the given nodes (the target has no successors)
+def predecessorMap(nodes, succ, target):
+    pred = {}
+    for u in nodes:
+        if u is target:
+            continue
+        for v in succ(u):
+            if v in nodes:
+                pred.setdefault(v, []).append(u)
+    return pred
+
+class reachIndex(object):
+    """
+    Nodes that can reach one of the targets, used to cut branches that cannot end at a target.
+    Adding a connection updates the index. After a connection is removed, the index may keep nodes that
+    can no longer reach a target: this only makes the pruning weaker, never wrong.
+    """
+    def __init__(self, nodes, targets, succ):
+        self.succ = succ
+        self.targets = list(targets)
+        self.pred = predecessorMap(set(nodes) | set(self.targets), succ, None)
+        self.nodes = set()
+        for t in self.targets:
+            self.addReaching(t)
+
+    #Add the node and the nodes reaching it
+    def addReaching(self, v):
+        if v in self.nodes:
+            return
+        self.nodes.add(v)
+        stack = [v]
+        while stack:
+            u = stack.pop()
+            for w in self.pred.get(u, []):
+                if w not in self.nodes:
+                    self.nodes.add(w)
+                    stack.append(w)
+
+    #Update the index when the connection u -> v is added
+    def addEdge(self, u, v):
+        self.pred.setdefault(v, []).append(u)
+        if v in self.nodes:
+            self.addReaching(u)
+
+    def __contains__(self, v):
+        return v in self.nodes
+
+class hopTable(object):
+    """
+    Longest number of hops from each node to one of the targets (a path stops at the first target it meets).
+    The table is computed once in reverse topological order of the strongly connected components and updated
+    when a connection is added or removed, so a lookup does not search the network. Only the nodes of a cycle
+    are searched, inside their component, and an update only recomputes the nodes reaching the changed
+    connection. Nodes which cannot reach a target have 0 hops.
+    """
+    def __init__(self, nodes, targets, succ, limit=None):
+        """
+        @param limit: hops that only need to be compared with the limit; the search inside a component stops
+        when a path is longer, so values above the limit are lower bounds
+        """
+        self.succ = succ
+        self.limit = limit
+        self.targets = set(targets)
+        self.nodes = set(nodes) | self.targets
+        self.pred = predecessorMap(self.nodes, self.successors, None)
+        self.compute()
+
+    #Connections followed by paths (none after a target)
+    def successors(self, u):
+        if u in self.targets:
+            return []
+        return self.succ(u)
+
+    #Strongly connected components of the region, each component comes after the components it reaches (Tarjan)
+    def components(self, region):
+        index = {}
+        low = {}
+        stack = []
+        onStack = set()
+        result = []
+        for root in region:
+            if root in index:
+                continue
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            onStack.add(root)
+            work = [(root, iter(self.successors(root)))]
+            while work:
+                u, temp = work[-1]
+                for v in temp:
+                    if v not in region:
+                        continue
+                    if v not in index:
+                        index[v] = low[v] = len(index)
+                        stack.append(v)
+                        onStack.add(v)
+                        work.append((v, iter(self.successors(v))))
+                        break
+                    elif v in onStack:
+                        low[u] = min(low[u], index[v])
+                else:
+                    work.pop()
+                    if work:
+                        low[work[-1][0]] = min(low[work[-1][0]], low[u])
+                    if low[u] == index[u]:
+                        component = []
+                        while True:
+                            w = stack.pop()
+                            onStack.discard(w)
+                            component.append(w)
+                            if w is u:
+                                break
+                        result.append(component)
+        return result
+
+    #Hops of all nodes reaching a target
+    def compute(self):
+        region = set(self.targets)
+        stack = list(self.targets)
+        while stack:
+            v = stack.pop()
+            for u in self.pred.get(v, []):
+                if u not in region:
+                    region.add(u)
+                    stack.append(u)
+
+        self.hop = {}
+        self.cyclic = False
+        for component in self.components(region):
+            if len(component) == 1:
+                u = component[0]
+                self.hop[u] = max([self.hop[v] + 1 for v in self.successors(u) if v in region], default=0)
+            else:
+                self.cyclic = True
+                members = set(component)
+                for u in component:
+                    self.hop[u] = self.search(u, members)
+
+    #Longest simple path from a node of a cycle: a path leaving the component never comes back to it
+    def search(self, source, members):
+        best = 0
+        visited = set([source])
+        path = [source]
+        stack = [iter(self.successors(source))]
+        while stack:
+            for v in stack[-1]:
+                if v in visited:
+                    continue
+                if v not in members:
+                    if v in self.hop:
+                        best = max(best, len(path) + self.hop[v])
+                        if self.limit is not None and best > self.limit:
+                            return best
+                    continue
+                if self.limit is not None and len(path) >= self.limit:
+                    #Any path through v is longer than the limit: check that one leaves the component
+                    if self.leaves(v, visited, members):
+                        return len(path) + 1
+                    continue
+                visited.add(v)
+                path.append(v)
+                stack.append(iter(self.successors(v)))
+                break
+            else:
+                stack.pop()
+                visited.discard(path.pop())
+        return best
+
+    #Whether a path from v avoiding the visited nodes leaves the component towards a target
+    def leaves(self, v, visited, members):
+        seen = set([v])
+        stack = [v]
+        while stack:
+            u = stack.pop()
+            for w in self.successors(u):
+                if w in visited or w in seen:
+                    continue
+                if w not in members:
+                    if w in self.hop:
+                        return True
+                    continue
+                seen.add(w)
+                stack.append(w)
+        return False
+
+    def __getitem__(self, v):
+        return self.hop.get(v, 0)
+
+    #Recompute the hops of u and of the nodes reaching it after a connection of u changed, other hops cannot change
+    def repair(self, u):
+        """
+        A component that reaches u lies within the nodes reaching u, so the components are recomputed in reverse
+        topological order from the hops of the other nodes. Only the component of u (where the connection may
+        have joined or split cycles) and the components with a successor whose hops changed are searched again.
+        @return: previous hops of the changed nodes (None if a node had no hops)
+        """
+        region = set([u])
+        stack = [u]
+        while stack:
+            x = stack.pop()
+            for w in self.pred.get(x, []):
+                if w not in region and w not in self.targets:
+                    region.add(w)
+                    stack.append(w)
+        old = {}
+        for x in region:
+            if x in self.hop:
+                old[x] = self.hop.pop(x)
+
+        changed = set()
+        for component in self.components(region):
+            if u not in component and not any([v in changed for x in component for v in self.successors(x)]):
+                for x in component:
+                    if x in old:
+                        self.hop[x] = old[x]
+                continue
+            if len(component) == 1:
+                x = component[0]
+                values = [self.hop[v] + 1 for v in self.successors(x) if v in self.hop]
+                if len(values) > 0:
+                    self.hop[x] = max(values)
+            else:
+                self.cyclic = True
+                members = set(component)
+                #The nodes of a cycle reach a target only through a node outside the component
+                if any([v not in members and v in self.hop for x in component for v in self.successors(x)]):
+                    for x in component:
+                        self.hop[x] = self.search(x, members)
+            for x in component:
+                if self.hop.get(x) != old.get(x):
+                    changed.add(x)
+        return dict([(x, old.get(x)) for x in changed])
+
+    #Update the table after the connection u -> v is added, return the previous hops of the changed nodes
+    def addEdge(self, u, v):
+        self.pred.setdefault(v, []).append(u)
+        if u in self.targets or v not in self.hop:
+            return {}
+        if self.cyclic:
+            return self.repair(u)
+        if self.hop[v] + 1 <= self.hop.get(u, -1):
+            return {}
+        #Raise the hops of u and of the nodes reaching it, keeping the values they replace
+        raised = {u: self.hop.get(u)}
+        self.hop[u] = self.hop[v] + 1
+        stack = [u]
+        while stack:
+            x = stack.pop()
+            for w in self.pred.get(x, []):
+                if w not in self.targets and self.hop[x] + 1 > self.hop.get(w, -1):
+                    #A simple path has fewer hops than there are nodes: the hops grow around a cycle
+                    if self.hop[x] + 1 >= len(self.nodes):
+                        for y, value in raised.items():
+                            if value is None:
+                                del self.hop[y]
+                            else:
+                                self.hop[y] = value
+                        return self.repair(u)
+                    raised.setdefault(w, self.hop.get(w))
+                    self.hop[w] = self.hop[x] + 1
+                    stack.append(w)
+        return raised
+
+    #Update the table after the connection u -> v is added, unless the connection gives a node more than limit hops
+    def addEdgeWithin(self, u, v, limit):
+        """
+        Nodes which already had more than limit hops are not checked.
+        @return: False if the connection is refused, the table is then unchanged and the caller removes the connection
+        """
+        cyclic = self.cyclic
+        changes = self.addEdge(u, v)
+        for w, value in changes.items():
+            if self.hop.get(w, 0) > limit and (value is None or value <= limit):
+                #Put back the changed entries only
+                self.pred[v].remove(u)
+                for x, value in changes.items():
+                    if value is None:
+                        self.hop.pop(x, None)
+                    else:
+                        self.hop[x] = value
+                self.cyclic = cyclic
+                return False
+        return True
+
+    #Update the table after the connection u -> v is removed
+    def removeEdge(self, u, v):
+        temp = self.pred.get(v, [])
+        if u not in temp:
+            return
+        temp.remove(u)
+        if u in self.targets or v not in self.hop:
+            return
+        if self.cyclic:
+            self.repair(u)
+            return
+        if self.hop[u] > self.hop[v] + 1:
+            return
+        #Lower the hops of u and of the nodes reaching it, each node is updated again when a successor changes
+        stack = [u]
+        while stack:
+            x = stack.pop()
+            value = max([self.hop[y] + 1 for y in self.successors(x) if y in self.hop], default=-1)
+            if value == self.hop.get(x, -1):
+                continue
+            if value < 0:
+                del self.hop[x]
+            else:
+                self.hop[x] = value
+            stack.extend([w for w in self.pred.get(x, []) if w not in self.targets and w in self.hop])
+
+#Successors of each node restricted to the given nodes (the target has no successors)
+def regionSuccessors(nodes, succ, target):
+    adj = {}
+    for u in nodes:
+        if u is target:
+            adj[u] = []
+        else:
+            adj[u] = [v for v in succ(u) if v in nodes]
+    return adj
+
+#Number of simple paths from the source to the target by the last node before the target
+def enumeratePathCounts(source, target, succ):
+    counts = {}
+    visited = set([source])
+    path = [source]
+    stack = [iter(succ(source))]
+    while stack:
+        for v in stack[-1]:
+            if v is target:
+                counts[path[-1]] = counts.get(path[-1], 0) + 1
+            elif v not in visited:
+                visited.add(v)
+                path.append(v)
+                stack.append(iter(succ(v)))
+                break
+        else:
+            stack.pop()
+            visited.discard(path.pop())
+    return counts
+
+#Number of walks from the source to each node lying on a path from the source to the target
+def forwardCounts(source, target, succ):
+    forward = reachableNodes(source, succ, target)
+    if target not in forward:
+        return {}, {}, {}, True
+    #Keep the nodes lying on some path from the source to the target
+    adj = regionSuccessors(forward, succ, target)
+    pred = predecessorMap(forward, adj.__getitem__, target)
+    region = reachableNodes(target, lambda v: pred.get(v, []))
+    adj = regionSuccessors(region, adj.__getitem__, target)
+
+    #Edges into the source are never used by a simple path from the source
+    indeg = dict.fromkeys(region, 0)
+    for u in region:
+        for v in adj[u]:
+            indeg[v] += 1
+
+    #Topological order from the source (Kahn's algorithm)
+    count = {source: 1}
+    queue = [source]
+    done = 0
+    while queue:
+        u = queue.pop()
+        done += 1
+        for v in adj[u]:
+            if v is not source:
+                count[v] = count.get(v, 0) + count[u]
+                indeg[v] -= 1
+                if indeg[v] == 0:
+                    queue.append(v)
+
+    #Nodes on a cycle or after one are never reached: walks are not all simple paths
+    return count, adj, pred, done == len(region)
+
+def pathCountsFrom(source, target, succ):
+    """
+    Count the simple paths from the source to the target, per last node before the target.
+    @param succ: function returning the successors of a node
+    @return: dictionary {node: number of paths whose last hop is node -> target}
+    """
+    count, adj, pred, acyclic = forwardCounts(source, target, succ)
+    if not acyclic:
+        return enumeratePathCounts(source, target, adj.__getitem__)
+
+    counts = {}
+    for u in pred.get(target, []):
+        counts[u] = counts.get(u, 0) + count[u]
+    return counts
+
+def isAcyclicBetween(source, target, succ):
+    """
+    Check whether the paths from the source to the target can be counted without enumeration.
+    """
+    return forwardCounts(source, target, succ)[3]
+
+def pathCountsTo(target, succ, nodes, sources=None, reach=None):
+    """
+    Count the simple paths from each source to the target.
+    @param nodes: all nodes of the graph
+    @param sources: nodes to count paths from (all nodes by default)
+    @param reach: reachIndex of the target, built if not given
+    @return: dictionary {source: number of paths to the target}
+    """
+    if sources is None:
+        sources = nodes
+    if reach is None:
+        reach = reachIndex(nodes, [target], succ)
+    region = reach.nodes
+    adj = regionSuccessors(region, succ, target)
+    pred = predecessorMap(region, adj.__getitem__, target)
+
+    outdeg = {}
+    for u in region:
+        outdeg[u] = len(adj[u])
+
+    #Reverse topological order from the target
+    count = {target: 1}
+    done = set()
+    queue = [target]
+    while queue:
+        v = queue.pop()
+        done.add(v)
+        for u in pred.get(v, []):
+            if u in outdeg:
+                count[u] = count.get(u, 0) + count[v]
+                outdeg[u] -= 1
+                if outdeg[u] == 0:
+                    queue.append(u)
+
+    counts = {}
+    for u in sources:
+        if u not in region:
+            counts[u] = 0
+        elif u in done:
+            counts[u] = count[u]
+        else:
+            #The source reaches a cycle before the target: enumerate its paths
+            counts[u] = sum(enumeratePathCounts(u, target, adj.__getitem__).values())
+    return counts
@@ -0,0 +1,241 @@
+'''
+This module stores attack paths as a trie of parent pointers so that paths share their common prefixes.
+Each trie entry keeps three integers: the index of the node in the attack graph table, the parent entry and
+the length of the path up to the entry. A path is identified by its last entry.
+The end point shared by all attack paths is not stored.
+Iterating over the store streams the paths from the trie; callers which read the paths several times can keep
+the list returned by materialise.
+'''
+
+from array import array
+from itertools import islice
+from operator import le
+import numpy as np
+
+class pathView(object):
+    """
+    Path read from the store; the nodes are only looked up when the path is used.
+    """
+    __slots__ = ('store', 'leaf', 'nodes')
+
+    def __init__(self, store, leaf):
+        self.store = store
+        self.leaf = leaf
+        self.nodes = None
+
+    def getNodes(self):
+        if self.nodes is None:
+            self.nodes = self.store.pathNodes(self.leaf)
+        return self.nodes
+
+    def __len__(self):
+        if self.store.tail is not None:
+            return self.store.depth[self.leaf] + 1
+        return self.store.depth[self.leaf]
+
+    def __iter__(self):
+        return iter(self.getNodes())
+
+    def __getitem__(self, i):
+        return self.getNodes()[i]
+
+    def __repr__(self):
+        return repr(self.getNodes())
+
+
+class pathStore(object):
+    """
+    List of attack paths (len, iteration, indexing and item assignment, so it can be shuffled in place).
+    """
+    __slots__ = ('table', 'tail', 'nodeIndex', 'parent', 'depth', 'leaves', 'last', 'lastEntries')
+
+    def __init__(self, table, paths=(), tail=None):
+        #Nodes of the attack graph, numbered by their index
+        self.table = table
+        #Node ending every path (the end point), added back when paths are read
+        self.tail = tail
+        #Node indexes and path lengths are bounded by the number of nodes
+        typecode = 'H' if len(table) < 65536 else 'i'
+        self.nodeIndex = array(typecode)
+        self.parent = array('i')
+        self.depth = array(typecode)
+        #Last entry of each path, in path order
+        self.leaves = array('i')
+        #Last inserted path and its entries: paths enumerated depth first share their prefix with the previous one
+        self.last = []
+        self.lastEntries = []
+        self.extend(paths)
+
+    #Add a path to the trie and return its last entry
+    def insert(self, path):
+        if isinstance(path, pathView) and path.store is self:
+            return path.leaf
+        return self.insertIndexes([n.index for n in path])
+
+    #Add a path given as node indexes
+    def insertIndexes(self, path):
+        if self.tail is not None:
+            if len(path) == 0 or path[-1] != self.tail.index:
+                raise ValueError("path does not end with " + str(self.tail.name))
+            path = path[:-1]
+        last = self.last
+        k = 0
+        n = min(len(path), len(last))
+        while k < n and path[k] == last[k]:
+            k += 1
+        entries = self.lastEntries[:k]
+        entry = entries[-1] if k > 0 else -1
+        for i in range(k, len(path)):
+            self.nodeIndex.append(path[i])
+            self.parent.append(entry)
+            self.depth.append(i+1)
+            entry = len(self.nodeIndex) - 1
+            entries.append(entry)
+        self.last = path
+        self.lastEntries = entries
+        return entry
+
+    #Add trie entries numbered from the current number of entries, and the last entry of each new path
+    def extendTrie(self, nodeIndex, parent, depth, leaves):
+        self.nodeIndex.extend(nodeIndex)
+        self.parent.extend(parent)
+        self.depth.extend(depth)
+        self.leaves.extend(leaves)
+        #The next inserted path does not share entries with these
+        self.last = []
+        self.lastEntries = []
+
+    def append(self, path):
+        self.leaves.append(self.insert(path))
+
+    def extend(self, paths):
+        for path in paths:
+            self.append(path)
+
+    #Add paths given as node indexes: the concatenated paths and the length of each path
+    def extendIndexes(self, flat, lengths):
+        i = 0
+        for l in lengths:
+            self.leaves.append(self.insertIndexes(flat[i:i+l]))
+            i += l
+
+    #Nodes of the path ending at the entry
+    def pathNodes(self, leaf):
+        table = self.table
+        nodeIndex = self.nodeIndex
+        parent = self.parent
+        temp = []
+        while leaf >= 0:
+            temp.append(table[nodeIndex[leaf]])
+            leaf = parent[leaf]
+        temp.reverse()
+        if self.tail is not None:
+            temp.append(self.tail)
+        return temp
+
+    def __len__(self):
+        return len(self.leaves)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [pathView(self, leaf) for leaf in self.leaves[i]]
+        return pathView(self, self.leaves[i])
+
+    def __setitem__(self, i, path):
+        self.leaves[i] = self.insert(path)
+
+    def __iter__(self):
+        """
+        Iterate over the paths as tuples of nodes, streamed from the trie with the nodes of the current path kept
+        on one stack.
+        Paths in entry order (as enumerated) are read in one pass over the entries. Otherwise (e.g. after a
+        shuffle) each path walks up from its last entry only to the first entry it shares with the previous path.
+        """
+        table = self.table
+        nodeIndex = self.nodeIndex
+        parent = self.parent
+        depth = self.depth
+        leaves = self.leaves
+        #The tail is added after the nodes
+        tail = () if self.tail is None else (self.tail,)
+        path = []
+        #An empty path (last entry -1) is read by walking up
+        if (len(leaves) == 0 or leaves[0] >= 0) and all(map(le, leaves, islice(leaves, 1, None))):
+            i = 0
+            n = len(leaves)
+            entry = 0
+            for node, k in zip(map(table.__getitem__, nodeIndex), depth):
+                if i == n:
+                    break
+                del path[k-1:]
+                path.append(node)
+                while i < n and leaves[i] == entry:
+                    yield tuple(path) + tail
+                    i += 1
+                entry += 1
+            return
+        entries = []
+        new = []
+        for leaf in leaves:
+            entry = leaf
+            while entry >= 0:
+                k = depth[entry]
+                if k <= len(entries) and entries[k-1] == entry:
+                    break
+                new.append(entry)
+                entry = parent[entry]
+            k = depth[entry] if entry >= 0 else 0
+            del entries[k:]
+            del path[k:]
+            while new:
+                entry = new.pop()
+                entries.append(entry)
+                path.append(table[nodeIndex[entry]])
+            yield tuple(path) + tail
+
+    def indexMatrix(self, rows, pad):
+        """
+        Node indexes of the paths numbered rows (without the tail), as a matrix with one row for each path padded
+        at the end with pad. The paths are read from the trie for all rows at once, one level at a time.
+        """
+        nodeIndex = np.frombuffer(self.nodeIndex, dtype=self.nodeIndex.typecode)
+        parent = np.frombuffer(self.parent, dtype=np.int32)
+        depth = np.frombuffer(self.depth, dtype=self.depth.typecode)
+        entry = np.frombuffer(self.leaves, dtype=np.int32)[rows]
+        valid = entry >= 0
+        length = np.zeros(len(entry), dtype=np.intp)
+        length[valid] = depth[entry[valid]]
+        temp = np.full((len(entry), length.max(initial=0)), pad, dtype=np.intp)
+        items = np.nonzero(valid)[0]
+        entry = entry[items]
+        position = length[items] - 1
+        while len(items) > 0:
+            temp[items, position] = nodeIndex[entry]
+            entry = parent[entry]
+            keep = entry >= 0
+            items = items[keep]
+            entry = entry[keep]
+            position = position[keep] - 1
+        return temp
+
+    def materialise(self):
+        """
+        Return the nodes of every path as a list of tuples, in path order.
+        The list belongs to the caller, the store does not keep it.
+        """
+        return list(self)
+
+    def __getstate__(self):
+        return (self.table, self.tail, self.nodeIndex, self.parent, self.depth, self.leaves)
+
+    def __setstate__(self, state):
+        self.table, self.tail, self.nodeIndex, self.parent, self.depth, self.leaves = state
+        self.last = []
+        self.lastEntries = []
+
+    #Bytes used by the store, without the attack graph nodes
+    def sizeInBytes(self):
+        temp = 0
+        for a in [self.nodeIndex, self.parent, self.depth, self.leaves]:
+            temp += a.itemsize * len(a)
+        return temp
@@ -36,6 +36,11 @@ class problem(object):
         self.real_bounder = None
         self.decoy_list = None
         self.sim_num = None
+        #"batch": computeMTTSFBatch, all replications at once; "loop": computeMTTSFLoop, one replication after the other.
+        #Both run independent replications from the current node states.
+        self.mttsf_method = "batch"
+        #Lower layer attack trees shared by the HARMs of the evaluated solutions
+        self.trees = treeCache()
         
     def generator(self, random, args):
         """The generator function for the problem."""
@@ -99,10 +104,15 @@ class problemBinary(problem):
             newnet = add_attacker(net)
             #print("Add attacker:")
             #printNet(newnet)
-            harm = constructHARM(newnet)
+            harm = constructHARM(newnet, cache=self.trees)
 
             f1 = decoyPath(harm) 
-            f2 = float(sum([computeMTTSF(harm, self.net, self.info["threshold"]) for i in range(0, self.sim_num)])/self.sim_num)
+            if self.mttsf_method == "batch":
+                f2 = float(computeMTTSFBatch(harm, self.net, self.info["threshold"], self.sim_num).mean())
+            elif self.mttsf_method == "loop":
+                f2 = float(sum(computeMTTSFLoop(harm, self.net, self.info["threshold"], self.sim_num))/self.sim_num)
+            else:
+                raise ValueError("unknown MTTSF method: %s" % self.mttsf_method)
             f3 = solutionCost(c_binary, self.info)
             
             #print(f1, f2, f3)
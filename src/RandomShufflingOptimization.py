@@ -9,22 +9,26 @@ import copy
 import math
 from SDIoTGen import *
 from SecurityEvaluator import *
+from PathCount import hopTable
 from random import uniform
 
 def checkConnection(iot, decoy):
-    for node in iot.con:
-        if node.name == decoy.name:
-            return 1
+    if decoy in iot.con:
+        return 1
     return 0
 
-def randomShuffling(decoy_net, threshold_pro):
+def randomShuffling(decoy_net, threshold_pro, inplace=False):
     """
     The comparison between the randomly generated probability and threshold:
     As long as it is larger, add if no connection or remove if connection exists.
     Real node type: True
     Decoy node type: emulated or real
+    @param inplace: shuffle decoy_net itself instead of a copy, the changed nodes are recorded in decoy_net.touched
     """
-    shuffled_net = copyNet(decoy_net)
+    if inplace:
+        shuffled_net = decoy_net
+    else:
+        shuffled_net = copyNet(decoy_net)
     cost = 0
     
     #Change connections from real IoT nodes to decoy nodes
@@ -38,9 +42,9 @@ def randomShuffling(decoy_net, threshold_pro):
                         #print(node1.name, node2.name)
                         #print("Add or remove connection based probability: ", random_pro, node1.name, node2.name)
                         if checkConnection(node1, node2) == 0:
-                            connectOneWay(node1, node2)
+                            connectOneWay(node1, node2, shuffled_net)
                         else:
-                            disconnectOneWay(node1, node2)
+                            disconnectOneWay(node1, node2, shuffled_net)
                         cost += 1
     
     #Change connections between real IoT nodes
@@ -54,9 +58,9 @@ def randomShuffling(decoy_net, threshold_pro):
                         #print(node1.name, node2.name)
                         #print("Add or remove connection based probability: ", random_pro, node1.name, node2.name)
                         if checkConnection(node1, node2) == 0:
-                            connectOneWay(node1, node2)
+                            connectOneWay(node1, node2, shuffled_net)
                         else:
-                            disconnectOneWay(node1, node2)
+                            disconnectOneWay(node1, node2, shuffled_net)
                         cost += 1  
     #print(cost)
     return shuffled_net, cost
@@ -76,7 +80,12 @@ def randomAddReal(decoy_net, threshold_pro, out_degree, maxLength, totalNodes):
                         #print(node1.name, node2.name)
                         #print("Add or remove connection based probability: ", random_pro, node1.name, node2.name)
                         if checkConnection(node1, node2) == 0:
-                            connectOneWay(node1, node2)
+                            connectOneWay(node1, node2, shuffled_net)
+    
+    #Longest hops from each node to the servers, updated when connections are added or removed
+    #A connection to node2 gives node1 up to maxLength + 1 hops, no other node may get more through it
+    servers = [node for node in shuffled_net.nodes if node.name.startswith("server") == True]
+    hops = hopTable(shuffled_net.nodes, servers, lambda v: v.con, maxLength + 1)
     
     #Add connections between real IoT nodes
     for node1 in shuffled_net.nodes:
@@ -90,12 +99,17 @@ def randomAddReal(decoy_net, threshold_pro, out_degree, maxLength, totalNodes):
                     if random_pro > threshold_pro:
                         if checkConnection(node1, node2) == 0 and len(node1.con) <= out_degree:
                             if totalNodes > 50:
-                                if node2.calcNodeHopsToTarget(0, 0) <= maxLength and node1.subnet != node2.subnet:
-                                    print("Connections", node1.name, node1.subnet, node2.name, node2.subnet)
-                                    connectOneWay(node1, node2)
+                                if hops[node2] <= maxLength and node1.subnet != node2.subnet:
+                                    connectOneWay(node1, node2, shuffled_net)
+                                    if hops.addEdgeWithin(node1, node2, maxLength + 1):
+                                        print("Connections", node1.name, node1.subnet, node2.name, node2.subnet)
+                                    else:
+                                        disconnectOneWay(node1, node2, shuffled_net)
                             else:
-                                connectOneWay(node1, node2)
+                                connectOneWay(node1, node2, shuffled_net)
+                                hops.addEdge(node1, node2)
                     else:
-                        disconnectOneWay(node1, node2)
+                        disconnectOneWay(node1, node2, shuffled_net)
+                        hops.removeEdge(node1, node2)
     
     return shuffled_net
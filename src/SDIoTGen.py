@@ -32,13 +32,13 @@ def add_conn(net):
     for node in nodes_vlans[3]:
         temp = nodes_vlans[0] + nodes_vlans[1] + nodes_vlans[2]
         for conNode in temp: 
-            connectOneWay(conNode, node)
+            connectOneWay(conNode, node, net)
     
     
     #Add connections from VLAN2 to VLAN3
     for node in nodes_vlans[1]:
         for conNode in nodes_vlans[2]:
-            connectOneWay(node, conNode)
+            connectOneWay(node, conNode, net)
           
     return None
 
@@ -104,7 +104,7 @@ def createRealSDIoT(node_vlan_list):
             #print(iot.subnet)
             if iot.subnet == 'vlan4':
                 iot.critical = True
-            net.nodes.append(iot)
+            net.addNode(iot)
             id += 1
         
         net.subnets.append(vlan)
@@ -140,7 +140,7 @@ def createRealSDIoTScale(node_vlan_list, scale):
                     #print(iot.subnet)
                     if iot.subnet == 'vlan4':
                         iot.critical = True
-                    net.nodes.append(iot)
+                    net.addNode(iot)
                     id += 1
             else:
                 iot = realNode(j)
@@ -149,7 +149,7 @@ def createRealSDIoTScale(node_vlan_list, scale):
                 #print(iot.subnet)
                 if iot.subnet == 'vlan4':
                     iot.critical = True
-                net.nodes.append(iot)
+                net.addNode(iot)
                 id += 1
         
         net.subnets.append(vlan)
@@ -185,7 +185,7 @@ def createRealSDIoTScale2(node_vlan_list, scale):
                     #print(iot.subnet)
                     if iot.subnet == 'vlan4':
                         iot.critical = True
-                    net.nodes.append(iot)
+                    net.addNode(iot)
                     id += 1
             elif j in ['mri', 'ct']:
                 for k in range(0, 2):
@@ -195,7 +195,7 @@ def createRealSDIoTScale2(node_vlan_list, scale):
                     #print(iot.subnet)
                     if iot.subnet == 'vlan4':
                         iot.critical = True
-                    net.nodes.append(iot)
+                    net.addNode(iot)
                     id += 1
             else:
                 iot = realNode(j)
@@ -204,7 +204,7 @@ def createRealSDIoTScale2(node_vlan_list, scale):
                 #print(iot.subnet)
                 if iot.subnet == 'vlan4':
                     iot.critical = True
-                net.nodes.append(iot)
+                net.addNode(iot)
                 id += 1
         
         net.subnets.append(vlan)
@@ -245,18 +245,38 @@ def add_attacker(net):
             #print("others", temp.name)
             A.con.append(temp)
     
-    net.nodes.append(A)
+    net.addNode(A)
     
     constructSE(net)
 
     return net
 
-def constructHARM(net):
+def updateAttackNet(net, topology, decoy_net):
+    """
+    Commit the nodes of decoy_net touched since the last commit as the version after topology, and bring the
+    attack network net (add_attacker of the network of topology) to that version.
+    Only the changed nodes are written, so the cost follows the number of changes instead of the network size.
+    @return: the new version
+    """
+    version = topology.commit(decoy_net, decoy_net.touched)
+    decoy_net.touched = set()
+    names = version.changedNames(topology)
+    version.update(net, topology)
+    #The targets keep their connection to the end point, which decoy_net does not have
+    for name in names:
+        temp = net.getNode(name)
+        if temp is not None and temp.isEnd:
+            temp.con.append(net.e)
+    return version
+
+def constructHARM(net, maxLength=None, cache=None):
     #Create security model
     h = harm()
     
     #printNet(net)
-    h.constructHarm(net, "attackgraph", 1, "attacktree", 1, 1)
+    #maxLength limits the number of nodes between the attacker and the target in attack paths
+    #cache (a treeCache owned by the caller) shares the lower layer attack trees with other HARMs
+    h.constructHarm(net, "attackgraph", 1, "attacktree", 1, 1, maxLength=maxLength, cache=cache)
     #h.model.printAG()
     #h.model.printPath()
     #print("number of attack paths:", len(h.model.allpath))
@@ -347,7 +367,7 @@ def add_decoy_conn(net):
     for node in net.nodes:
         if "decoy" in node.name and "server" not in node.name:
             for conNode in temp:
-                connectOneWay(node, conNode)
+                connectOneWay(node, conNode, net)
             
     return None
 
@@ -365,7 +385,7 @@ def add_decoy_deployment(net, info):
         add_decoy_type(dnode, info)
         add_decoy_vul(dnode)
         add_decoy_pro(dnode, info["attackerIntelligence"])
-        decoy_net.nodes.append(dnode)
+        decoy_net.addNode(dnode)
         #A name list of decoys deployed
         #Used in changing connections as binary encodings need to correspond to the decoys
         temp.append(dnode.name) 
@@ -390,11 +410,8 @@ def add_solution(net, candidate_solution, info, decoy_list):
     Interpret solution to add connections.
     """
     newNet = copyNet(net)
-    temp = decoy_list
     #Locate the decoy nodes from the newly created network
-    for node1 in newNet.nodes:
-        if node1.name in decoy_list:
-            temp[decoy_list.index(node1.name)] = node1
+    temp = [newNet.getNode(name) for name in decoy_list]
 
     #Add or remove connections from real IoT nodes to decoys
     for i in range(0, info["diot_dimension"]+info["dserver_dimension"]):    
@@ -404,13 +421,13 @@ def add_solution(net, candidate_solution, info, decoy_list):
         for j in range(1, info["riot_num"]+1):
             #print(candidate_solution[num+j-1])
             if candidate_solution[num+j-1] == 1 and info["previous_solution"][num+j-1] == 0:
-                for node2 in newNet.nodes:
-                    if node2.id == j:
-                        connectOneWay(node2, dnode)
+                node2 = newNet.getNodeById(j)
+                if node2 is not None:
+                    connectOneWay(node2, dnode, newNet)
             elif candidate_solution[num+j-1] == 0 and info["previous_solution"][num+j-1] == 1:
-                for node2 in newNet.nodes:
-                    if node2.id == j:
-                        disconnectOneWay(node2, dnode)
+                node2 = newNet.getNodeById(j)
+                if node2 is not None:
+                    disconnectOneWay(node2, dnode, newNet)
                         
     #print("Connection changes:")
     #printNetWithVul(newNet)
@@ -425,11 +442,8 @@ def add_solution_real_decoy(net, candidate_solution, info, decoy_list):
     - from real IoT nodes to real IoT nodes
     """
     newNet = copyNet(net)
-    temp = decoy_list
     #Locate the decoy nodes from the newly created network
-    for node1 in newNet.nodes:
-        if node1.name in decoy_list:
-            temp[decoy_list.index(node1.name)] = node1
+    temp = [newNet.getNode(name) for name in decoy_list]
 
     #Add or remove connections from real IoT nodes to decoys
     for i in range(0, info["diot_dimension"]+info["dserver_dimension"]):    
@@ -439,42 +453,36 @@ def add_solution_real_decoy(net, candidate_solution, info, decoy_list):
         for j in range(1, info["riot_num"]+1):
             #print(candidate_solution[num+j-1])
             if candidate_solution[num+j-1] == 1 and info["previous_solution"][num+j-1] == 0:
-                for node2 in newNet.nodes:
-                    if node2.id == j:
-                        #print("Add connection: ", node2.name, dnode.name)
-                        connectOneWay(node2, dnode)
+                node2 = newNet.getNodeById(j)
+                if node2 is not None:
+                    #print("Add connection: ", node2.name, dnode.name)
+                    connectOneWay(node2, dnode, newNet)
             elif candidate_solution[num+j-1] == 0 and info["previous_solution"][num+j-1] == 1:
-                for node2 in newNet.nodes:
-                    if node2.id == j:
-                        #print("Remove connection: ", node2.name, dnode.name)
-                        disconnectOneWay(node2, dnode)
+                node2 = newNet.getNodeById(j)
+                if node2 is not None:
+                    #print("Remove connection: ", node2.name, dnode.name)
+                    disconnectOneWay(node2, dnode, newNet)
     
     solution1 = (info["diot_dimension"]+info["dserver_dimension"]) * info["riot_num"]
     id_list = range(1, info["riot_num"]+1)
     #Add or remove connections from real IoT nodes to real IoT nodes
     for i in range(0, info["riot_num"]):
         num = i * (info["riot_num"]-1)
+        temp_list = []
+        for k in id_list:    
+            if k != (i+1):
+                temp_list.append(k) 
+        node3 = newNet.getNodeById(i+1)
         for j in range(0, info["riot_num"]-1): #index of the id_list
+            node4 = newNet.getNodeById(temp_list[j])
+            if node3 is None or node4 is None:
+                continue
             if candidate_solution[solution1+num+j-1] == 1 and info["previous_solution"][solution1+num+j-1] == 0:
-                for node3 in newNet.nodes:
-                    for node4 in newNet.nodes:
-                        temp_list = []
-                        for k in id_list:    
-                            if k != (i+1):
-                                temp_list.append(k) 
-                        if node3.id == (i+1) and node4.id == temp_list[j]:
-                            #print("Add connection: ", node3.name, node4.name)
-                            connectOneWay(node3, node4)
+                #print("Add connection: ", node3.name, node4.name)
+                connectOneWay(node3, node4, newNet)
             elif candidate_solution[solution1+num+j-1] == 0 and info["previous_solution"][solution1+num+j-1] == 1:
-                for node3 in newNet.nodes:
-                    for node4 in newNet.nodes:
-                        temp_list = []
-                        for k in id_list:    
-                            if k != (i+1):
-                                temp_list.append(k) 
-                        if node3.id == (i+1) and node4.id == temp_list[j]:
-                            #print("Remove connection: ", node3.name, node4.name)
-                            disconnectOneWay(node3, node4)              
+                #print("Remove connection: ", node3.name, node4.name)
+                disconnectOneWay(node3, node4, newNet)              
     
     #print("Connection changes:")
     #printNetWithVul(newNet)
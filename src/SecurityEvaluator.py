@@ -8,11 +8,14 @@ from attackGraph import *
 from attackTree import *
 from harm import *
 from SDIoTGen import *
+from PathStore import pathStore
 import subprocess
 import os
 import re
 import math
-from random import shuffle, uniform, expovariate
+from random import shuffle, uniform, expovariate, getrandbits, randrange
+from heapq import heappush, heappop
+from array import array
 import numpy as np
 
 
@@ -24,62 +27,146 @@ import numpy as np
 #   only ADN or OR, which means the attacker need to use all vulnerabilities or any one of them
 #---------------------------------------------------------------------------------------------------
 
-def computeNodeMTTC(node):
+class nodeVectors(object):
+    """
+    Properties of the upper layer nodes of a HARM in arrays indexed by node index, read by the attack loops
+    instead of the node attributes. The arrays have one more item, the padding index len(table), set to zero.
+    Only the MTTC of the lower layers is kept between calls of refresh, which reads the other properties from the
+    nodes. Decoy error terms are drawn in blocks from a NumPy random generator.
+    """
+    def __init__(self, harm, rng=None, block=256):
+        """
+        @param rng: NumPy random generator for the decoy errors (seeded from the random module at the first draw by default)
+        @param block: number of decoy errors drawn at once
+        """
+        model = harm.model
+        #MTTC of the lower layer of each node, None for the nodes without lower layer
+        values = model.calcAll()["mttc"]
+        self.lower = [values[u.index] if u.child is not None else None for u in model.table]
+        self.mttc = values
+        size = len(model.table) + 1
+        #Nodes the attacker attacks: not the start or end and with a positive MTTC
+        self.target = array('b', [0]) * size
+        self.real = array('b', [0]) * size
+        self.decoy = array('b', [0]) * size
+        self.critical = array('b', [0]) * size
+        #Base MTTC (inverse of the MTTC of the lower layer), success probability and previous compromise time
+        self.base = array('d', [0.0]) * size
+        self.pro = array('d', [0.0]) * size
+        self.prevComp = array('d', [0.0]) * size
+        self.rng = rng
+        self.block = block
+        self.errors = []
+        self.refresh(harm)
+
+    def refresh(self, harm):
+        """
+        Read the value (MTTC) of the nodes without lower layer, and the type, critical flag, success probability and
+        previous compromise time of every node.
+        """
+        model = harm.model
+        for node in model.table:
+            i = node.index
+            mttc = self.lower[i]
+            if mttc is None:
+                mttc = self.mttc[i] = node.val
+            if node is model.s or node is model.e:
+                continue
+            self.target[i] = mttc > 0
+            self.base[i] = 1.0/mttc if mttc > 0 else 0.0
+            #Decoy nodes have the decoy type instead of True
+            self.real[i] = node.type == True
+            self.decoy[i] = node.type != True
+            self.critical[i] = node.type == True and node.critical == True
+            self.pro[i] = node.pro if node.pro is not None else 0.0
+            self.prevComp[i] = node.prev_comp
+
+    #Error range of the success probability of a decoy node
+    def error(self):
+        if len(self.errors) == 0:
+            if self.rng is None:
+                self.rng = np.random.default_rng(getrandbits(64))
+            self.errors = self.rng.uniform(-0.05, 0.05, self.block).tolist()
+        return self.errors.pop()
+
+#Node vectors of a HARM: the MTTC of the lower layers is kept by the attack graph until it is changed (see ag.changed),
+#the node properties are read again at each call
+def harmVectors(harm):
+    if harm.model.vectors is None:
+        harm.model.vectors = nodeVectors(harm)
+    else:
+        harm.model.vectors.refresh(harm)
+    return harm.model.vectors
+
+def computeNodeMTTC(node, vectors):
     count = 0
     MTTC = 0
     flag = False
+    i = node.index
 
-    if node.type == True:
+    if vectors.real[i]:
         node.comp = True
         count += 1
-        if node.critical == True:
+        if vectors.critical[i]:
             flag = True
-        MTTC = 1.0/node.val
+        MTTC = vectors.base[i]
     else:
         #node.comp = True
         #Introduce error range for decoy node
-        error_value = uniform(-0.05, 0.05)
-        pro = node.pro + error_value
+        pro = vectors.pro[i] + vectors.error()
         if pro > 1.0:
             pro = 1.0 
-        MTTC = (1.0/node.val) * pro
-    #print(node.name, node.type, node.val, MTTC, flag)
+        MTTC = vectors.base[i] * pro
+    #print(node.name, node.type, val, MTTC, flag)
     return MTTC, count, flag
 
+def randomPaths(paths):
+    """
+    Yield the paths in random order (Fisher-Yates shuffle drawn one position at a time).
+    Only the positions that have been swapped are stored, so drawing k paths takes O(k) time and memory.
+    """
+    n = len(paths)
+    swapped = {}
+    for i in range(0, n):
+        j = randrange(i, n)
+        k = swapped.get(j, j)
+        swapped[j] = swapped.pop(i, i)
+        yield paths[k]
+
 #---------------------------------------------------------------------------------------------------
 #Compute MTTSF used in GA
 #---------------------------------------------------------------------------------------------------
 
-def computeMTTSF(harm, net, cflag):
+def computeMTTSF(harm, net, cflag, vectors=None):
     """
     Compute MTTSF based on the attacker's intelligence.
     Used for computing optimal topology via GA.
     Assume IDS has 100% accuracy.
+    @param vectors: node vectors of the HARM read from the current node properties (harmVectors by default)
     """
     totalNo = len(net.nodes)
     #print(totalNo)
-    #Calculate the MTTC for each node on the attack path
-    harm.model.calcMTTC()
-    shuffle(harm.model.allpath) #Attacker randomly picks one entry point at a time
+    #MTTC and properties of each node on the attack path
+    if vectors is None:
+        vectors = harmVectors(harm)
     #harm.model.printPath()
     #print("number of attack paths:", len(harm.model.allpath))
     MTTSF = 0
     break_flag = False
     
     totalCount = 0
-    for path in harm.model.allpath:
+    #Attacker randomly picks one entry point at a time
+    for path in randomPaths(harm.model.allpath):
         for node in path:
-            if node is not harm.model.s and node is not harm.model.e:
-                if node.val > 0 and node.comp == False:
-                    MTTC, count, flag = computeNodeMTTC(node) 
-                    MTTSF += MTTC
-                    if node.type == True:
-                        totalCount += count
-                    #print(float(totalCount/totalNo))
-                    
-                    if float(totalCount/totalNo) >= cflag or flag == True:
-                        break_flag = True
-                        break
+            if vectors.target[node.index] and node.comp == False:
+                MTTC, count, flag = computeNodeMTTC(node, vectors) 
+                MTTSF += MTTC
+                totalCount += count
+                #print(float(totalCount/totalNo))
+                
+                if float(totalCount/totalNo) >= cflag or flag == True:
+                    break_flag = True
+                    break
                     
         #Exit outer loop
         if break_flag == True:
@@ -87,58 +174,188 @@ def computeMTTSF(harm, net, cflag):
     
     return MTTSF 
 
+def computeMTTSFLoop(harm, net, cflag, sim_num):
+    """
+    Compute MTTSF for sim_num replications of computeMTTSF, one after the other.
+    The nodes compromised by a replication are marked as not compromised again before the next one, so that every
+    replication starts from the same node states (as in computeMTTSFBatch).
+    @return: list of the MTTSF of each replication
+    """
+    nodes = [node for node in harm.model.table if node.comp == False]
+    #The replications do not change the node properties read into the vectors
+    vectors = harmVectors(harm)
+    values = []
+    for i in range(0, sim_num):
+        values.append(computeMTTSF(harm, net, cflag, vectors))
+        for node in nodes:
+            node.comp = False
+    return values
+
+def mttsfPathRows(harm, target, pad, index):
+    """
+    Nodes of the attack paths numbered by each row of index that computeMTTSF attacks, as a matrix of node indexes
+    where the padding and the other nodes are the index pad. Paths kept in a pathStore are read from its trie.
+    """
+    allpath = harm.model.allpath
+    rows = index.ravel()
+    if isinstance(allpath, pathStore):
+        temp = allpath.indexMatrix(rows, pad)
+    else:
+        paths = [[node.index for node in allpath[i]] for i in rows.tolist()]
+        temp = np.full((len(paths), max([len(path) for path in paths], default=0)), pad, dtype=np.intp)
+        for i in range(0, len(paths)):
+            temp[i, :len(paths[i])] = paths[i]
+    temp = np.where(target[temp], temp, pad)
+    return temp.reshape(index.shape[0], -1)
+
+#Whether each item of the rows is the first occurrence of its value in the row
+def firstInRow(seq):
+    order = np.argsort(seq, axis=1, kind='stable')
+    ordered = np.take_along_axis(seq, order, axis=1)
+    first = np.ones(seq.shape, dtype=bool)
+    first[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+    temp = np.empty(seq.shape, dtype=bool)
+    np.put_along_axis(temp, order, first, axis=1)
+    return temp
+
+def computeMTTSFBatch(harm, net, cflag, sim_num, rng=None, block=4):
+    """
+    Compute MTTSF for sim_num independent replications of computeMTTSF at once (same estimator as computeMTTSFLoop).
+    Each replication picks its own order of the attack paths, drawn block by block; paths are processed by blocks
+    (doubling in size) for the replications which have not failed yet. Node states are not changed: every replication
+    starts from the current states.
+    @param rng: NumPy random generator (seeded from the random module by default)
+    @param block: number of paths in the first block
+    @return: array of the MTTSF of each replication
+    """
+    if rng is None:
+        rng = np.random.default_rng(getrandbits(64))
+    totalNo = len(net.nodes)
+    #Node properties indexed by node index, the last index is the padding
+    vectors = harmVectors(harm)
+    pad = len(harm.model.table)
+    inv = np.asarray(vectors.base)
+    pro = np.asarray(vectors.pro)
+    real = np.asarray(vectors.real, dtype=bool)
+    decoy = np.asarray(vectors.decoy, dtype=bool)
+    critical = np.asarray(vectors.critical, dtype=bool)
+    target = np.asarray(vectors.target, dtype=bool)
+    pathNo = len(harm.model.allpath)
+    #Nodes compromised before the replications are skipped
+    initial = np.zeros(pad + 1, dtype=bool)
+    initial[[node.index for node in harm.model.table if node.comp == True]] = True
+
+    MTTSF = np.zeros(sim_num)
+    count = np.zeros(sim_num)
+    comp = np.tile(initial, (sim_num, 1))
+    active = np.arange(sim_num)
+    #Attacker randomly picks one entry point at a time: the order of each replication is shuffled (Fisher-Yates)
+    #only up to the paths read, most replications fail after a few paths. Orders of a few paths are shuffled at once.
+    order = np.tile(np.arange(pathNo, dtype=np.int32), (sim_num, 1))
+    lazy = pathNo > 4 * block
+    if not lazy:
+        order = rng.permuted(order, axis=1)
+    start = 0
+    while start < pathNo and len(active) > 0:
+        end = min(start + block, pathNo)
+        for i in range(start, end if lazy else start):
+            j = rng.integers(i, pathNo, len(active))
+            temp = order[active, j]
+            order[active, j] = order[active, i]
+            order[active, i] = temp
+        seq = mttsfPathRows(harm, target, pad, order[active, start:end])
+        #Real nodes are compromised once, decoy nodes are attacked each time they are met
+        newReal = real[seq] & ~comp[active[:, None], seq] & firstInRow(seq)
+        isDecoy = decoy[seq] & ~initial[seq]
+        error_value = rng.uniform(-0.05, 0.05, seq.shape)
+        MTTC = np.where(newReal, inv[seq], 0.0) + np.where(isDecoy, inv[seq] * np.minimum(pro[seq] + error_value, 1.0), 0.0)
+        total = MTTSF[active, None] + np.cumsum(MTTC, axis=1)
+        totalCount = count[active, None] + np.cumsum(newReal, axis=1)
+        stop = (newReal | isDecoy) & ((totalCount / totalNo >= cflag) | (newReal & critical[seq]))
+        failed = stop.any(axis=1)
+        last = np.where(failed, np.argmax(stop, axis=1), seq.shape[1] - 1)
+        MTTSF[active] = total[np.arange(len(active)), last]
+        count[active] = totalCount[:, -1]
+        rows, cols = np.nonzero(newReal)
+        comp[active[rows], seq[rows, cols]] = True
+        active = active[~failed]
+        start += block
+        block *= 2
+    
+    return MTTSF
+
 #---------------------------------------------------------------------------------------------------
 #Compute MTTSF in shuffling
 #----------------------------------------------------------------------------------------------------
 
-def computeCompNodes(node, detect_pro):
+def computeCompNodes(node, detect_pro, vectors):
     """
     Simulate attacker's behavior.
     Generate the compromised nodes
     """
     flag = False #SF2
     detect_pro = 1.0 #Reflect real compromised nodes by the attacker
-    #print("Compromised node: ", node.name, node.type, node.val)
+    i = node.index
+    #print("Compromised node: ", node.name, node.type, val)
     #Critical node can be always detected
-    if node.type == True:
+    if vectors.real[i]:
         node.comp = True
-        if node.critical == True:
+        if vectors.critical[i]:
             flag = True
-        MTTC = (1.0/node.val) * node.pro - node.prev_comp
+        MTTC = vectors.base[i] * vectors.pro[i] - vectors.prevComp[i]
     else:
         #node.comp = True
         #Introduce error range for decoy node
-        error_value = uniform(-0.05, 0.05)
-        pro = node.pro + error_value
-        MTTC = (1.0/node.val) * pro * detect_pro
+        pro = vectors.pro[i] + vectors.error()
+        MTTC = vectors.base[i] * pro * detect_pro
     #print("MTTC: ", MTTC)  
     return MTTC, flag 
 
 def checkNeighbors(compNodes, neighbor_list):
+    #Count how many times each neighbor appears in the list
+    counts = {}
+    for neighbor in neighbor_list:
+        name = "ag_"+neighbor.name
+        counts[name] = counts.get(name, 0) + 1
     compNo = 0
     for node in compNodes:
-        for neighbor in neighbor_list:
-            if node.name == "ag_"+neighbor.name:
-                compNo += 1
+        compNo += counts.get(node.name, 0)
     #print("Number of compromised neighbors: ", compNo)
     return compNo
 
 def assignCompNodeInNet(decoy_net, attack_node):
-    for node in decoy_net.nodes:
-        if attack_node.name == "ag_"+node.name:
-            #print("Assign compromised node in original net: ", node.name, attack_node.name)
-            node.comp = True
+    node = decoy_net.getNodeByAgName(attack_node.name)
+    if node is not None:
+        #print("Assign compromised node in original net: ", node.name, attack_node.name)
+        node.comp = True
+        decoy_net.touch(node)
     return None
 
 def modifyCompNodeInNet(decoy_net, attack_node, left_time):
-    
-    for node in decoy_net.nodes:
-        if attack_node.name == "ag_"+node.name:
-            #print("Assign compromised node in original net: ", node.name, attack_node.name)
-            
-            node.prev_comp = node.prev_comp + left_time
+    node = decoy_net.getNodeByAgName(attack_node.name)
+    if node is not None:
+        #print("Assign compromised node in original net: ", node.name, attack_node.name)
+        node.prev_comp = node.prev_comp + left_time
+        decoy_net.touch(node)
     return None
 
+class sslTracker(object):
+    """
+    Compromised real nodes and their number of occurrences in the neighbor list of the critical nodes, updated
+    in constant time for each compromised node.
+    """
+    def __init__(self, net, compNodes):
+        self.totalNo = len(net.nodes)
+        self.counts, self.neighborNo = neighborCounts(net)
+        self.compNodes = compNodes
+        self.compNeighborNo = 0
+        for node in compNodes:
+            self.compNeighborNo += self.counts.get(node.name, 0)
+
+    def add(self, node):
+        self.compNodes.append(node)
+        self.compNeighborNo += self.counts.get(node.name, 0)
+
 def computeIDSRateSSL(detect_pro, compNodes, totalNo, compNeighborNo, neighborNo):
     """
     Zero false positive and false negative by IDS.
@@ -159,327 +376,226 @@ def computeIDSRateMTTSF(detect_pro, compNodes, totalNo):
     value = dividend/divisor   
     return value 
 
+#---------------------------------------------------------------------------------------------------
+#Discrete-event simulation of the attacker used by the shuffling schemes
+#---------------------------------------------------------------------------------------------------
+
+#Event types, events at the same time are handled in this order
+COMPROMISE = 0
+SSL_CHECK = 1
+SHUFFLE = 2
+NEXT_ATTACK = 3
+
+class attackEngine(object):
+    """
+    The attacker picks the attack paths in random order and attacks their nodes one after the other.
+    Events (time, type) are kept in a priority queue and handled by a policy, which stops the run; the run also
+    ends when the attacker has no node left to attack.
+    """
+    def __init__(self, harm, detect_pro):
+        self.harm = harm
+        self.detect_pro = detect_pro
+        #MTTC and properties of each node on the attack path, read at the start of the run
+        self.vectors = harmVectors(harm)
+        self.mttc = self.vectors.mttc
+        self.queue = []
+        self.sequence = 0
+        #Time of the last handled event
+        self.time = 0
+        #Node under attack, start time of the attack and whether it is a critical node
+        self.node = None
+        self.start = 0
+        self.flag = False
+        self.stopped = False
+        #Number of handled events and of attack paths drawn
+        self.events = 0
+        self.paths = 0
+        self.targets = self.iterTargets()
+
+    #Nodes attacked in turn, a node is skipped if it has been compromised when the attacker reaches it
+    def iterTargets(self):
+        #The attacker picks the paths in random order
+        for path in randomPaths(self.harm.model.allpath):
+            self.paths += 1
+            for node in path:
+                if self.vectors.target[node.index] and node.comp == False:
+                    yield node
+
+    def schedule(self, time, event):
+        heappush(self.queue, (time, event, self.sequence))
+        self.sequence += 1
+
+    def stop(self):
+        self.stopped = True
+
+    #Start the attack on the next node, the compromise time is drawn when the attack starts
+    def nextAttack(self, policy):
+        node = next(self.targets, None)
+        if node is None:
+            return False
+        policy.attack(self, node)
+        MTTC, flag = computeCompNodes(node, self.detect_pro, self.vectors)
+        self.node = node
+        self.start = self.time
+        self.flag = flag
+        self.schedule(self.time + MTTC, COMPROMISE)
+        return True
+
+    def run(self, policy):
+        policy.begin(self)
+        self.schedule(0, NEXT_ATTACK)
+        while self.queue and not self.stopped:
+            time, event, sequence = heappop(self.queue)
+            self.events += 1
+            if event == NEXT_ATTACK:
+                if not self.nextAttack(policy):
+                    break
+            elif event == COMPROMISE:
+                self.time = time
+                node = self.node
+                self.node = None
+                policy.compromise(self, node)
+                self.schedule(time, NEXT_ATTACK)
+            elif event == SSL_CHECK:
+                policy.check(self)
+            else:
+                policy.shuffle(self, time)
+        return policy
+
+class mttsfPolicy(object):
+    """
+    Stop at the security failure: ratio of compromised real nodes reaching cflag or critical node compromised.
+    With an interval, the network is shuffled at that time: a real node under attack keeps the time spent on it.
+    """
+    def __init__(self, net, attack_net, cflag, compNodes, security_failure=False, interval=None, verbose=False):
+        self.totalNo = len(net.nodes)
+        self.attack_net = attack_net
+        self.cflag = cflag
+        self.compNodes = compNodes
+        self.security_failure = security_failure
+        self.interval = interval
+        self.verbose = verbose
+
+    def begin(self, engine):
+        if self.interval is not None:
+            engine.schedule(self.interval, SHUFFLE)
+
+    def attack(self, engine, node):
+        if self.verbose:
+            print(node.name, engine.mttc[node.index], node.type)
+
+    def compromise(self, engine, node):
+        if self.verbose:
+            print("Accumulated MTTC:", engine.time)
+        if engine.vectors.real[node.index]:
+            self.compNodes.append(node)
+            assignCompNodeInNet(self.attack_net, node)
+        ratioIDS = computeIDSRateMTTSF(engine.detect_pro, self.compNodes, self.totalNo)
+        if ratioIDS >= self.cflag or engine.flag == True:
+            if self.verbose:
+                print("Failure condition: ", ratioIDS, engine.flag)
+            self.security_failure = True
+            engine.stop()
+
+    def check(self, engine):
+        return None
+
+    def shuffle(self, engine, time):
+        if engine.node is not None and engine.vectors.real[engine.node.index]:
+            #Change the previous compromise time
+            modifyCompNodeInNet(self.attack_net, engine.node, self.interval - engine.start)
+        engine.time = time
+        engine.stop()
+
+class sslPolicy(object):
+    """
+    Compute the system security level after each compromise and stop at the security failure (SSL is 1) or when
+    it increased by more than thre_check. With a delay, the network is shuffled at that time.
+    """
+    def __init__(self, net, decoy_net, thre_check, cflag, w1, w2, previous_ssl, compNodes, delay=None):
+        self.decoy_net = decoy_net
+        self.thre_check = thre_check
+        self.cflag = cflag
+        self.w1 = w1
+        self.w2 = w2
+        self.previous_ssl = previous_ssl
+        self.delay = delay
+        self.tracker = sslTracker(net, compNodes)
+        self.SSL = 0.0
+
+    def begin(self, engine):
+        if self.delay is not None:
+            engine.schedule(self.delay, SHUFFLE)
+
+    def attack(self, engine, node):
+        return None
+
+    #SSL from the compromised nodes, 1 at the security failure
+    def computeSSL(self, engine):
+        tracker = self.tracker
+        #Incorporate IDS accuracy
+        value1, value2 = computeIDSRateSSL(engine.detect_pro, tracker.compNodes, tracker.totalNo, tracker.compNeighborNo, tracker.neighborNo)
+        self.SSL = self.w1 * value1 + self.w2 * value2
+        if value1 >= self.cflag or engine.flag == True:
+            self.SSL = 1.0
+            return True
+        return False
+
+    def compromise(self, engine, node):
+        if engine.vectors.real[node.index]:
+            self.tracker.add(node)
+            assignCompNodeInNet(self.decoy_net, node)
+        engine.schedule(engine.time, SSL_CHECK)
+
+    def check(self, engine):
+        if self.computeSSL(engine) or (self.SSL - self.previous_ssl) > self.thre_check:
+            engine.stop()
+
+    def shuffle(self, engine, time):
+        if engine.node is not None and engine.vectors.real[engine.node.index]:
+            #Shuffle when under attack: change the previous compromise time
+            modifyCompNodeInNet(self.decoy_net, engine.node, self.delay - engine.start)
+        engine.time = time
+        self.computeSSL(engine)
+        engine.stop()
+
 def computeSSL_Interval(harm, net, decoy_net, thre_check, cflag, detect_pro, w1, w2, previous_ssl, compNodes):
     """
     Compute system security level for adaptive shuffling.
     """
-    
-    totalNo = len(net.nodes)
-    #print(totalNo)
-    #Calculate the MTTC for each node on the attack path
-    harm.model.calcMTTC()
-    shuffle(harm.model.allpath)  
-    #harm.model.printPath()
-    #print("number of attack paths:",)) 
-
-    totalTime = 0 #Total time between each shuffling
-    neighbor_list = computeNeighbors(net)
-    neighborNo = len(neighbor_list)
-    #print("Neighbor list: ", [i.name for i in neighbor_list])
-    break_flag = False
-    for path in harm.model.allpath:
-        for node in path:
-            if node is not harm.model.s and node is not harm.model.e:
-                if node.val > 0 and node.comp == False:
-                    #Simulate attacker's behavior
-                    MTTC, flag = computeCompNodes(node, detect_pro) 
-                    if node.type == True:
-                        compNodes.append(node)
-                        assignCompNodeInNet(decoy_net, node)
-                        
-                    totalTime += MTTC
-                    
-                    #print("SF1: ", float(len(compNodes)/totalNo))
-                    #print("SF2: ", flag)
-                    compNeighborNo = checkNeighbors(compNodes, neighbor_list)
-                    #Incorporate IDS accuracy
-                    value1, value2 = computeIDSRateSSL(detect_pro, compNodes, totalNo, compNeighborNo, neighborNo)
-                    #SSL = w1 * (len(compNodes)/totalNo) + w2 * (compNeighborNo/neighborNo)
-                    SSL =  w1 * value1 + w2 * value2
-                    #print("SSL: ", SSL)
-                    #Exit inner loop
-                    if value1 >= cflag or flag == True:
-                        SSL = 1.0
-                        break_flag = True
-                        break
-                    elif (SSL - previous_ssl) > thre_check:
-                        break_flag = True
-                        break
-                        
-        #Exit outer loop
-        if break_flag == True:
-            break
-    #print("MTTC:", totalTime)
-    return SSL, totalTime, compNodes, decoy_net
+    engine = attackEngine(harm, detect_pro)
+    policy = engine.run(sslPolicy(net, decoy_net, thre_check, cflag, w1, w2, previous_ssl, compNodes))
+    return policy.SSL, engine.time, compNodes, decoy_net
 
 def computeSSL_FixedInterval(harm, net, decoy_net, thre_check, cflag, detect_pro, w1, w2, previous_ssl, compNodes, delay):
     """
     Compute system security level for hybrid shuffling: mix of adaptive and fixed interval.
     """
-    
-    totalNo = len(net.nodes)
-    #print(totalNo)
-    #Calculate the MTTC for each node on the attack path
-    harm.model.calcMTTC()
-    shuffle(harm.model.allpath)  
-    #harm.model.printPath()
-    #print("number of attack paths:",)) 
-    
-    #print("==============================================================================")
-    totalTime = 0
-    SSL = 0.0
-    neighbor_list = computeNeighbors(net)
-    neighborNo = len(neighbor_list)
-    #print("Neighbor list: ", [i.name for i in neighbor_list])
-    break_flag = False
-    for path in harm.model.allpath:
-        for node in path:
-            if node is not harm.model.s and node is not harm.model.e:
-                if node.val > 0 and node.comp == False:
-                    #print(node.name, node.val)
-                    MTTC, flag = computeCompNodes(node, detect_pro) 
-                    totalTime += MTTC
-                    
-                    #Calculate the previous total compromise time
-                    previousTotalTime = totalTime - MTTC
-                    interval_left = delay - previousTotalTime
-                    #print("Accumulated MTTC:", totalTime)
-                    
-                    if totalTime < delay:
-                        if node.type == True:
-                            compNodes.append(node)
-                            assignCompNodeInNet(decoy_net, node)
-                    
-                        #print("SF1: ", float(len(compNodes)/totalNo))
-                        #print("SF2: ", flag)
-                        compNeighborNo = checkNeighbors(compNodes, neighbor_list)
-                        value1, value2 = computeIDSRateSSL(detect_pro, compNodes, totalNo, compNeighborNo, neighborNo)
-                        #SSL = w1 * (len(compNodes)/totalNo) + w2 * (compNeighborNo/neighborNo)
-                        SSL =  w1 * value1 + w2 * value2
-                        #print("SSL when compromise time smaller than interval: ", SSL)
-                        #Exit inner loop
-                        if value1 >= cflag or flag == True:
-                            SSL = 1.0
-                            break_flag = True
-                            break
-                        elif (SSL - previous_ssl) > thre_check:
-                            break_flag = True
-                            break
-                    elif totalTime == delay:
-                        if node.type == True:
-                            compNodes.append(node)
-                            assignCompNodeInNet(decoy_net, node)
-                        break_flag = True
-                        
-                        #print("SF1: ", float(len(compNodes)/totalNo))
-                        #print("SF2: ", flag)
-                        compNeighborNo = checkNeighbors(compNodes, neighbor_list)
-                        value1, value2 = computeIDSRateSSL(detect_pro, compNodes, totalNo, compNeighborNo, neighborNo)
-                        #SSL = w1 * (len(compNodes)/totalNo) + w2 * (compNeighborNo/neighborNo)
-                        SSL =  w1 * value1 + w2 * value2
-                        #print("SSL when compromise time equals to interval: ", SSL)
-                        if value1 >= cflag or flag == True:
-                            SSL = 1.0
-                        break
-                    else:
-                        #Shuffle when under attack
-                        if node.type == True:
-                            #Change the previous compromise time
-                            modifyCompNodeInNet(decoy_net, node, interval_left)
-                        totalTime = delay
-                        break_flag = True
-                        
-                        #print("SF1: ", float(len(compNodes)/totalNo))
-                        #print("SF2: ", flag)
-                        compNeighborNo = checkNeighbors(compNodes, neighbor_list)
-                        value1, value2 = computeIDSRateSSL(detect_pro, compNodes, totalNo, compNeighborNo, neighborNo)
-                        #SSL = w1 * (len(compNodes)/totalNo) + w2 * (compNeighborNo/neighborNo)
-                        SSL =  w1 * value1 + w2 * value2
-                        #print("SSL when compromise time larger than interval: ", SSL)
-                        if value1 >= cflag or flag == True:
-                            SSL = 1.0
-                        break    
-                        
-        #Exit outer loop
-        if break_flag == True:
-            break
-    #print("MTTC:", totalTime)
-    #print("SSL:", SSL)
-    return SSL, totalTime, compNodes, decoy_net
+    engine = attackEngine(harm, detect_pro)
+    policy = engine.run(sslPolicy(net, decoy_net, thre_check, cflag, w1, w2, previous_ssl, compNodes, delay))
+    return policy.SSL, engine.time, compNodes, decoy_net
 
 def computeMTTSF_Baseline(harm, net, attack_net, cflag, detect_pro, compNodes):
     """
     Compute system security level for baseline scheme.
     """
-    totalNo = len(net.nodes)
-    totalCount = 0
-    #print(totalNo)
-    #Calculate the MTTC for each node on the attack path
-    harm.model.calcMTTC()
-    shuffle(harm.model.allpath)  
-    #harm.model.printPath()
-    #print("number of attack paths:", ) 
-    
-    totalTime = 0
-    security_failure = False
-    break_flag = False
-    for path in harm.model.allpath:
-        for node in path:
-            if node is not harm.model.s and node is not harm.model.e:
-                if node.val > 0 and node.comp == False:
-                    print(node.name, node.val, node.type)
-                    MTTC, flag = computeCompNodes(node, detect_pro) 
-                    totalTime += MTTC
-                    totalCount += 1
-                    
-                    print("Accumulated MTTC:", totalTime)
-                    if node.type == True:
-                        compNodes.append(node)
-                        assignCompNodeInNet(attack_net, node)
-                    ratioIDS = computeIDSRateMTTSF(detect_pro, compNodes, totalNo)
-
-                    #Exit inner loop 
-                    if ratioIDS >= cflag or flag == True:
-                        print("Failure condition: ", ratioIDS, flag)
-                        security_failure = True
-                        break_flag = True
-                        break
-
-        #Exit outer loop
-        if break_flag == True:
-            break
-       
-    return totalTime, compNodes, attack_net, security_failure
+    engine = attackEngine(harm, detect_pro)
+    policy = engine.run(mttsfPolicy(net, attack_net, cflag, compNodes, verbose=True))
+    return engine.time, compNodes, attack_net, policy.security_failure
 
 def computeMTTSF_Interval(harm, net, decoy_net, interval_check, cflag, detect_pro, compNodes, security_failure):
     """
     Compute system security level for fixed interval shuffling.
     """
-    totalNo = len(net.nodes)
-
-    #print(totalNo)
-    #Calculate the MTTC for each node on the attack path
-    harm.model.calcMTTC()
-    shuffle(harm.model.allpath)  
-    #harm.model.printPath()
-    #print("number of attack paths:", ) 
-    
-    
-    totalTime = 0
-    previousTotalTime = 0
-    
-    break_flag = False
-    for path in harm.model.allpath:
-        for node in path:
-            if node is not harm.model.s and node is not harm.model.e:
-                if node.val > 0 and node.comp == False:
-                    MTTC, flag = computeCompNodes(node, detect_pro) 
-                    totalTime += MTTC
-                    
-                    #Calculate the previous total compromise time
-                    previousTotalTime = totalTime - MTTC
-                    interval_left = interval_check - previousTotalTime
-                    #print("Accumulated MTTC:", totalTime)
-                    
-                    if totalTime < interval_check:
-                        if node.type == True:
-                            compNodes.append(node)
-                            assignCompNodeInNet(decoy_net, node)
-                        ratioIDS = computeIDSRateMTTSF(detect_pro, compNodes, totalNo)
-                        #Exit inner loop 
-                        if ratioIDS >= cflag or flag == True:
-                            security_failure = True
-                            break_flag = True
-                            break
-                    elif totalTime == interval_check:
-                        #Shuffle
-                        if node.type == True:
-                            compNodes.append(node)
-                            assignCompNodeInNet(decoy_net, node)
-                        break_flag = True
-                        ratioIDS = computeIDSRateMTTSF(detect_pro, compNodes, totalNo)
-                        #End
-                        if ratioIDS >= cflag or flag == True:
-                            security_failure = True
-                        break
-                    else:
-                        #Shuffle when under attack
-                        if node.type == True:
-                            #Change the previous compromise time
-                            modifyCompNodeInNet(decoy_net, node, interval_left)
-                        totalTime = interval_check
-                        break_flag = True
-                        break
-                    
-        #Exit outer loop
-        if break_flag == True:
-            break
-       
-    return totalTime, compNodes, decoy_net, security_failure
+    engine = attackEngine(harm, detect_pro)
+    policy = engine.run(mttsfPolicy(net, decoy_net, cflag, compNodes, security_failure, interval_check))
+    return engine.time, compNodes, decoy_net, policy.security_failure
 
 def computeMTTSF_RandomInterval(harm, net, decoy_net, interval_mean, cflag, detect_pro, compNodes, security_failure):
     """
     Compute system security level for random interval shuffling.
     """
-    totalNo = len(net.nodes)
-
-    #print(totalNo)
-    #Calculate the MTTC for each node on the attack path
-    harm.model.calcMTTC()
-    shuffle(harm.model.allpath)  
-    #harm.model.printPath()
-    #print("number of attack paths:", ) 
-    
-    
-    totalTime = 0
-    previousTotalTime = 0
-    
+    engine = attackEngine(harm, detect_pro)
     interval_check = expovariate(1.0/interval_mean)
-    #print(interval_check)
-    
-    break_flag = False
-    for path in harm.model.allpath:
-        for node in path:
-            if node is not harm.model.s and node is not harm.model.e:
-                if node.val > 0 and node.comp == False:
-                    MTTC, flag = computeCompNodes(node, detect_pro) 
-                    totalTime += MTTC
-                    
-                    previousTotalTime = totalTime - MTTC
-                    interval_left = interval_check - previousTotalTime
-                    #print("Accumulated MTTC:", totalTime)
-                    if totalTime < interval_check:
-                        if node.type == True:
-                            compNodes.append(node)
-                            assignCompNodeInNet(decoy_net, node)
-                        ratioIDS = computeIDSRateMTTSF(detect_pro, compNodes, totalNo)
-                        #Exit inner loop
-                        if ratioIDS >= cflag or flag == True:
-                            security_failure = True
-                            break_flag = True
-                            break
-                    elif totalTime == interval_check:
-                        #Shuffle
-                        if node.type == True:
-                            compNodes.append(node)
-                            assignCompNodeInNet(decoy_net, node)
-                        break_flag = True
-                        ratioIDS = computeIDSRateMTTSF(detect_pro, compNodes, totalNo)
-                        #End
-                        if ratioIDS >= cflag or flag == True:
-                            security_failure = True
-                        break
-                    else:
-                        #Shuffle when under attack
-                        if node.type == True:
-                            #Change the previous compromise time
-                            modifyCompNodeInNet(decoy_net, node, interval_left)
-                        totalTime = interval_check
-                        break_flag = True
-                        break
-                    
-        #Exit outer loop
-        if break_flag == True:
-            break
-       
-    return totalTime, compNodes, decoy_net, security_failure
+    policy = engine.run(mttsfPolicy(net, decoy_net, cflag, compNodes, security_failure, interval_check))
+    return engine.time, compNodes, decoy_net, policy.security_failure
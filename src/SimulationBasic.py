@@ -101,13 +101,15 @@ def problemGen(solution_set, node_vlan_list, shuffled_net, previous_solution, in
     prob_bi.info = {"diot_dimension": decoy_iot_num, "dserver_dimension": server_num, "decoy_list": ["decoy_ct", "decoy_camera", "decoy_tv", "decoy_server"], 
                     "decoy_num": [ct_num, camera_num, tv_num, server_num], "riot_num": iot_num, "attackerIntelligence": intelligence,
                     "threshold": float(1.0/3.0), "server_decoy_type": "real", "parameters": {"size": 100, "generation": 1},
-                    "normalized_range": [0.0, 0.0], "previous_solution": previous_solution, "simulation": 100}
+                    "normalized_range": [0.0, 0.0], "previous_solution": previous_solution, "simulation": 100,
+                    "mttsf_method": "batch"}
 
     # Assign bits for each dimension
     prob_bi.assign_dimensions_bits_list([1] * ((decoy_iot_num + server_num + iot_num - 1) * iot_num))
     prob_bi.add_real_bounder([1] * ((decoy_iot_num + server_num + iot_num - 1) * iot_num))
     prob_bi.calc_bit_length()
     prob_bi.sim_num = prob_bi.info["simulation"] #For calculation of average expected MTTSF
+    prob_bi.mttsf_method = prob_bi.info["mttsf_method"] #"batch" or "loop", see problem
     #print(prob_bi.dimension_bits, prob_bi.dimensions, prob_bi.dimensions_bits_list, prob_bi.real_bounder)
     
     prob_bi.add_initial_decoy_deployment()
@@ -314,6 +316,9 @@ def fixIntervalGA(node_vlan_list, initial_net, decoy_net, decoy_list, initial_in
     dropThresh = packet["drop"]
     modifyThresh = packet["modify"]
     
+    #Lower layer attack trees shared by the HARMs of the run
+    trees = treeCache()
+    
     while security_failure == False:
         #Calculate optimal topology
         solution, info = runCasePAES(node_vlan_list, decoy_net, previous_solution, solution_set, intelligence)
@@ -325,7 +330,7 @@ def fixIntervalGA(node_vlan_list, initial_net, decoy_net, decoy_list, initial_in
         
         newnet = copyNet(shuffled_net)
         newnet = add_attacker(newnet)
-        h = constructHARM(newnet) 
+        h = constructHARM(newnet, cache=trees) 
         totalAP = decoyPath(h)
         delivery_ratio += calcMessageDelivery(h, dropThresh, modifyThresh)
         
@@ -342,7 +347,7 @@ def fixIntervalGA(node_vlan_list, initial_net, decoy_net, decoy_list, initial_in
         print("MTTSF:", mttsf)
         print("Cost:", cost)
         print("Accumulated delivery ratio:", delivery_ratio)
-        decoy_net = copyNet(comp_decoy_net)
+        decoy_net = comp_decoy_net
         previous_solution = solution.candidate
         i += 1
     
@@ -368,14 +373,21 @@ def fixIntervalRS(initial_net, decoy_net, initial_info, interval, pro, packet):
     dropThresh = packet["drop"]
     modifyThresh = packet["modify"]
     
+    #The network is shuffled in place and recorded as snapshots, the attack network follows the snapshots
+    decoy_net = copyNet(decoy_net)
+    topology = snapshot(decoy_net)
+    attack_net = add_attacker(topology.materialise())
+    
+    #Lower layer attack trees shared by the HARMs of the run
+    trees = treeCache()
+    
     while security_failure == False:
         #print("Shuffle time:",  i+1)
-        shuffled_net, cost = randomShuffling(decoy_net, pro)
+        shuffled_net, cost = randomShuffling(decoy_net, pro, inplace=True)
         #print("Shuffled net:")
         #printNetWithVul(shuffled_net)
-        newnet = copyNet(shuffled_net)
-        newnet = add_attacker(newnet)
-        h = constructHARM(newnet) 
+        topology = updateAttackNet(attack_net, topology, shuffled_net)
+        h = constructHARM(attack_net, cache=trees) 
         totalAP = decoyPath(h)
         
         delivery_ratio += calcMessageDelivery(h, dropThresh, modifyThresh)
@@ -393,7 +405,7 @@ def fixIntervalRS(initial_net, decoy_net, initial_info, interval, pro, packet):
         print("MTTSF:", mttsf)
         print("Cost:", cost)
         print("Accumulated delivery ratio:", delivery_ratio)
-        decoy_net = copyNet(comp_decoy_net)
+        decoy_net = comp_decoy_net
         i += 1
     
     print("Average number of attack paths:", float(sum_ap)/float(i))
@@ -405,7 +417,7 @@ def fixIntervalRS(initial_net, decoy_net, initial_info, interval, pro, packet):
     
     return mttsf, float(sum_ap)/float(i), float(defense_cost/mttsf), float(delivery_ratio/i)
 
-def fixIntervalHS(initial_net, decoy_net, initial_info, interval, pro, packet, thre, maxLength):
+def fixIntervalHS(initial_net, decoy_net, initial_info, interval, pro, packet, thre, maxLength, pathLimit=None):
     
     i = 0
     compNodes = []
@@ -423,14 +435,20 @@ def fixIntervalHS(initial_net, decoy_net, initial_info, interval, pro, packet, t
     print("Out degree threshold: ", out_degree)
     decoy_net = randomAddReal(decoy_net, pro, out_degree, maxLength-1, totalNodes)
     
+    #The network is shuffled in place and recorded as snapshots, the attack network follows the snapshots
+    topology = snapshot(decoy_net)
+    attack_net = add_attacker(topology.materialise())
+    
+    #Lower layer attack trees shared by the HARMs of the run
+    trees = treeCache()
+    
     while security_failure == False:
         #print("Shuffle time:",  i+1)
-        shuffled_net, cost = heuristicShuffling(decoy_net, pro, out_degree, maxLength-1)
+        shuffled_net, cost = heuristicShuffling(decoy_net, pro, out_degree, maxLength-1, inplace=True)
         #print("Shuffled net:")
         #printNetWithVul(shuffled_net)
-        newnet = copyNet(shuffled_net)
-        newnet = add_attacker(newnet)
-        h = constructHARM(newnet) 
+        topology = updateAttackNet(attack_net, topology, shuffled_net)
+        h = constructHARM(attack_net, pathLimit, trees) 
         totalAP = decoyPath(h)
         
         delivery_ratio += calcMessageDelivery(h, dropThresh, modifyThresh)
@@ -448,7 +466,7 @@ def fixIntervalHS(initial_net, decoy_net, initial_info, interval, pro, packet, t
         print("MTTSF:", mttsf)
         print("Cost:", cost)
         print("Accumulated delivery ratio:", delivery_ratio)
-        decoy_net = copyNet(comp_decoy_net)
+        decoy_net = comp_decoy_net
         i += 1
     
     print("Average number of attack paths:", float(sum_ap)/float(i))
@@ -479,6 +497,9 @@ def randomIntervalGA(node_vlan_list, initial_net, decoy_net, decoy_list, initial
     dropThresh = packet["drop"]
     modifyThresh = packet["modify"]
     
+    #Lower layer attack trees shared by the HARMs of the run
+    trees = treeCache()
+    
     while security_failure == False:
         #Calculate optimal topology
         solution, info = runCasePAES(node_vlan_list, decoy_net, previous_solution, solution_set, intelligence)
@@ -490,7 +511,7 @@ def randomIntervalGA(node_vlan_list, initial_net, decoy_net, decoy_list, initial
         
         newnet = copyNet(shuffled_net)
         newnet = add_attacker(newnet)
-        h = constructHARM(newnet) 
+        h = constructHARM(newnet, cache=trees) 
         totalAP = decoyPath(h)
         delivery_ratio += calcMessageDelivery(h, dropThresh, modifyThresh)
         
@@ -507,7 +528,7 @@ def randomIntervalGA(node_vlan_list, initial_net, decoy_net, decoy_list, initial
         #print("MTTSF:", mttsf)
         #print("Cost:", cost)
         #print("Accumulated delivery ratio:", delivery_ratio)
-        decoy_net = copyNet(comp_decoy_net)
+        decoy_net = comp_decoy_net
         previous_solution = solution.candidate
         i += 1
     
@@ -533,14 +554,21 @@ def randomIntervalRS(initial_net, decoy_net, initial_info, mean, pro, packet):
     dropThresh = packet["drop"]
     modifyThresh = packet["modify"]
     
+    #The network is shuffled in place and recorded as snapshots, the attack network follows the snapshots
+    decoy_net = copyNet(decoy_net)
+    topology = snapshot(decoy_net)
+    attack_net = add_attacker(topology.materialise())
+    
+    #Lower layer attack trees shared by the HARMs of the run
+    trees = treeCache()
+    
     while security_failure == False:
         #print("Shuffle time:",  i+1)
-        shuffled_net, cost = randomShuffling(decoy_net, pro)
+        shuffled_net, cost = randomShuffling(decoy_net, pro, inplace=True)
         #print("Shuffled net:")
         #printNetWithVul(shuffled_net)
-        newnet = copyNet(shuffled_net)
-        newnet = add_attacker(newnet)
-        h = constructHARM(newnet) 
+        topology = updateAttackNet(attack_net, topology, shuffled_net)
+        h = constructHARM(attack_net, cache=trees) 
         totalAP = decoyPath(h)
         delivery_ratio += calcMessageDelivery(h, dropThresh, modifyThresh)
         
@@ -558,7 +586,7 @@ def randomIntervalRS(initial_net, decoy_net, initial_info, mean, pro, packet):
         print("Cost:", cost)
         print("Accumulated delivery ratio:", delivery_ratio)
         
-        decoy_net = copyNet(comp_decoy_net)
+        decoy_net = comp_decoy_net
         i += 1
     
     print("Average number of attack paths:", float(sum_ap)/float(i))
@@ -569,7 +597,7 @@ def randomIntervalRS(initial_net, decoy_net, initial_info, mean, pro, packet):
     
     return mttsf, float(sum_ap)/float(i), float(defense_cost/mttsf), float(delivery_ratio/i) 
 
-def randomIntervalHS(initial_net, decoy_net, initial_info, mean, pro, packet, thre, maxLength):
+def randomIntervalHS(initial_net, decoy_net, initial_info, mean, pro, packet, thre, maxLength, pathLimit=None):
     
     i = 0
     compNodes = []
@@ -587,14 +615,20 @@ def randomIntervalHS(initial_net, decoy_net, initial_info, mean, pro, packet, th
     print("Out degree threshold: ", out_degree)
     decoy_net = randomAddReal(decoy_net, pro, out_degree, maxLength-1, totalNodes)
     
+    #The network is shuffled in place and recorded as snapshots, the attack network follows the snapshots
+    topology = snapshot(decoy_net)
+    attack_net = add_attacker(topology.materialise())
+    
+    #Lower layer attack trees shared by the HARMs of the run
+    trees = treeCache()
+    
     while security_failure == False:
         #print("Shuffle time:",  i+1)
-        shuffled_net, cost = heuristicShuffling(decoy_net, pro, out_degree, maxLength-1)
+        shuffled_net, cost = heuristicShuffling(decoy_net, pro, out_degree, maxLength-1, inplace=True)
         #print("Shuffled net:")
         #printNetWithVul(shuffled_net)
-        newnet = copyNet(shuffled_net)
-        newnet = add_attacker(newnet)
-        h = constructHARM(newnet) 
+        topology = updateAttackNet(attack_net, topology, shuffled_net)
+        h = constructHARM(attack_net, pathLimit, trees) 
         totalAP = decoyPath(h)
         delivery_ratio += calcMessageDelivery(h, dropThresh, modifyThresh)
         
@@ -612,7 +646,7 @@ def randomIntervalHS(initial_net, decoy_net, initial_info, mean, pro, packet, th
         print("Cost:", cost)
         print("Accumulated delivery ratio:", delivery_ratio)
         
-        decoy_net = copyNet(comp_decoy_net)
+        decoy_net = comp_decoy_net
         i += 1
     
     print("Average number of attack paths:", float(sum_ap)/float(i))
@@ -645,6 +679,9 @@ def adaptiveIntervalGA(node_vlan_list, initial_net, decoy_net, decoy_list, initi
     #Shuffle network when SSL check threshold is met 
     #Stop when either SF1 or SF2 (as SSL is set to 1) or SSL threshold is met
     
+    #Lower layer attack trees shared by the HARMs of the run
+    trees = treeCache()
+    
     while previous_ssl <= initial_info["sslThreshold"]:
         solution, info = runCasePAES(node_vlan_list, decoy_net, previous_solution, solution_set, intelligence)
         total_cost = float(info["riot_num"] * (info["diot_dimension"] + info["dserver_dimension"] + info["riot_num"] - 1))
@@ -655,7 +692,7 @@ def adaptiveIntervalGA(node_vlan_list, initial_net, decoy_net, decoy_list, initi
         
         newnet = copyNet(shuffled_net)
         newnet = add_attacker(newnet)
-        h = constructHARM(newnet) 
+        h = constructHARM(newnet, cache=trees) 
         totalAP = decoyPath(h)
         delivery_ratio += calcMessageDelivery(h, dropThresh, modifyThresh)
         
@@ -676,7 +713,7 @@ def adaptiveIntervalGA(node_vlan_list, initial_net, decoy_net, decoy_list, initi
         #print("Accumulated delivery ratio:", delivery_ratio)
                
         previous_solution = solution.candidate
-        decoy_net = copyNet(comp_decoy_net)
+        decoy_net = comp_decoy_net
         previous_ssl = ssl
         
     #print("Average number of attack paths:", float(sum_ap)/float(i))
@@ -704,12 +741,19 @@ def adaptiveIntervalRS(initial_net, decoy_net, initial_info, pro, packet):
     #Shuffle network when SSL check threshold is met 
     #Stop when either SF1 or SF2 or SSL threshold is met
     
+    #The network is shuffled in place and recorded as snapshots, the attack network follows the snapshots
+    decoy_net = copyNet(decoy_net)
+    topology = snapshot(decoy_net)
+    attack_net = add_attacker(topology.materialise())
+    
+    #Lower layer attack trees shared by the HARMs of the run
+    trees = treeCache()
+    
     while previous_ssl <= initial_info["sslThreshold"]:
-        shuffled_net, cost = randomShuffling(decoy_net, pro)
+        shuffled_net, cost = randomShuffling(decoy_net, pro, inplace=True)
         
-        newnet = copyNet(shuffled_net)
-        newnet = add_attacker(newnet)
-        h = constructHARM(newnet)     
+        topology = updateAttackNet(attack_net, topology, shuffled_net)
+        h = constructHARM(attack_net, cache=trees)     
         totalAP = decoyPath(h)
         delivery_ratio += calcMessageDelivery(h, dropThresh, modifyThresh)
         
@@ -733,7 +777,7 @@ def adaptiveIntervalRS(initial_net, decoy_net, initial_info, pro, packet):
         print("Cost:", cost)
         print("Accumulated delivery ratio:", delivery_ratio)
         
-        decoy_net = copyNet(comp_decoy_net)
+        decoy_net = comp_decoy_net
         previous_ssl = ssl
 
     print("Average number of attack paths:", float(sum_ap)/float(i))
@@ -744,7 +788,7 @@ def adaptiveIntervalRS(initial_net, decoy_net, initial_info, pro, packet):
     
     return mttsf, float(sum_ap)/float(i), float(defense_cost/mttsf), float(delivery_ratio/i)
 
-def adaptiveIntervalHS(initial_net, decoy_net, initial_info, pro, packet, thre, maxLength):
+def adaptiveIntervalHS(initial_net, decoy_net, initial_info, pro, packet, thre, maxLength, pathLimit=None):
 
     previous_ssl = 0
     compNodes = []
@@ -766,12 +810,18 @@ def adaptiveIntervalHS(initial_net, decoy_net, initial_info, pro, packet, thre,
     #Shuffle network when SSL check threshold is met 
     #Stop when either SF1 or SF2 or SSL threshold is met
 
+    #The network is shuffled in place and recorded as snapshots, the attack network follows the snapshots
+    topology = snapshot(decoy_net)
+    attack_net = add_attacker(topology.materialise())
+    
+    #Lower layer attack trees shared by the HARMs of the run
+    trees = treeCache()
+    
     while previous_ssl <= initial_info["sslThreshold"]:
-        shuffled_net, cost = heuristicShuffling(decoy_net, pro, out_degree, maxLength-1)
+        shuffled_net, cost = heuristicShuffling(decoy_net, pro, out_degree, maxLength-1, inplace=True)
         
-        newnet = copyNet(shuffled_net)
-        newnet = add_attacker(newnet)
-        h = constructHARM(newnet)     
+        topology = updateAttackNet(attack_net, topology, shuffled_net)
+        h = constructHARM(attack_net, pathLimit, trees)     
         totalAP = decoyPath(h)
         delivery_ratio += calcMessageDelivery(h, dropThresh, modifyThresh)
         
@@ -795,7 +845,7 @@ def adaptiveIntervalHS(initial_net, decoy_net, initial_info, pro, packet, thre,
         print("Cost:", cost)
         print("Accumulated delivery ratio:", delivery_ratio)
         
-        decoy_net = copyNet(comp_decoy_net)
+        decoy_net = comp_decoy_net
         previous_ssl = ssl
 
     print("Average number of attack paths:", float(sum_ap)/float(i))
@@ -827,6 +877,9 @@ def hybridIntervalGA(node_vlan_list, initial_net, decoy_net, decoy_list, initial
     #Shuffle network when SSL check threshold is met 
     #Stop when either SF1 or SF2 or SSL threshold is met
     
+    #Lower layer attack trees shared by the HARMs of the run
+    trees = treeCache()
+    
     while previous_ssl <= initial_info["sslThreshold"]:
         solution, info = runCasePAES(node_vlan_list, decoy_net, previous_solution, solution_set, intelligence)
         total_cost = float(info["riot_num"] * (info["diot_dimension"] + info["dserver_dimension"] + info["riot_num"] - 1))
@@ -837,7 +890,7 @@ def hybridIntervalGA(node_vlan_list, initial_net, decoy_net, decoy_list, initial
         
         newnet = copyNet(shuffled_net)
         newnet = add_attacker(newnet)
-        h = constructHARM(newnet) 
+        h = constructHARM(newnet, cache=trees) 
         totalAP = decoyPath(h)
         delivery_ratio += calcMessageDelivery(h, dropThresh, modifyThresh)
         
@@ -859,7 +912,7 @@ def hybridIntervalGA(node_vlan_list, initial_net, decoy_net, decoy_list, initial
         #print("Accumulated delivery ratio:", delivery_ratio)
                   
         previous_solution = solution.candidate
-        decoy_net = copyNet(comp_decoy_net)
+        decoy_net = comp_decoy_net
         previous_ssl = ssl
         
     #print("Average number of attack paths:", float(sum_ap)/float(i))
@@ -887,13 +940,20 @@ def hybridIntervalRS(initial_net, decoy_net, initial_info, pro, delay, packet):
     #Shuffle network when SSL check threshold is met 
     #Stop when either SF1 or SF2 or SSL threshold is met
     
+    #The network is shuffled in place and recorded as snapshots, the attack network follows the snapshots
+    decoy_net = copyNet(decoy_net)
+    topology = snapshot(decoy_net)
+    attack_net = add_attacker(topology.materialise())
+    
+    #Lower layer attack trees shared by the HARMs of the run
+    trees = treeCache()
+    
     while previous_ssl <= initial_info["sslThreshold"]:
-        shuffled_net, cost = randomShuffling(decoy_net, pro)
+        shuffled_net, cost = randomShuffling(decoy_net, pro, inplace=True)
         
-        newnet = copyNet(shuffled_net)
-        newnet = add_attacker(newnet)
+        topology = updateAttackNet(attack_net, topology, shuffled_net)
         print("Construct HARM")
-        h = constructHARM(newnet)     
+        h = constructHARM(attack_net, cache=trees)     
         totalAP = decoyPath(h)
         print(totalAP)
         delivery_ratio += calcMessageDelivery(h, dropThresh, modifyThresh)
@@ -919,7 +979,7 @@ def hybridIntervalRS(initial_net, decoy_net, initial_info, pro, delay, packet):
         print("Cost:", cost)
         print("Accumulated delivery ratio:", delivery_ratio)
         
-        decoy_net = copyNet(comp_decoy_net)
+        decoy_net = comp_decoy_net
         previous_ssl = ssl
 
     print("Average number of attack paths:", float(sum_ap)/float(i))
@@ -931,7 +991,7 @@ def hybridIntervalRS(initial_net, decoy_net, initial_info, pro, delay, packet):
     return mttsf, float(sum_ap)/float(i), float(defense_cost/mttsf), float(delivery_ratio/i)
 
 
-def hybridIntervalHS(initial_net, decoy_net, initial_info, pro, delay, packet, thre, maxLength):
+def hybridIntervalHS(initial_net, decoy_net, initial_info, pro, delay, packet, thre, maxLength, pathLimit=None):
 
     previous_ssl = 0
     compNodes = []
@@ -952,12 +1012,18 @@ def hybridIntervalHS(initial_net, decoy_net, initial_info, pro, delay, packet, t
     #Shuffle network when SSL check threshold is met 
     #Stop when either SF1 or SF2 or SSL threshold is met
     
+    #The network is shuffled in place and recorded as snapshots, the attack network follows the snapshots
+    topology = snapshot(decoy_net)
+    attack_net = add_attacker(topology.materialise())
+    
+    #Lower layer attack trees shared by the HARMs of the run
+    trees = treeCache()
+    
     while previous_ssl <= initial_info["sslThreshold"]:
-        shuffled_net, cost = heuristicShuffling(decoy_net, pro, out_degree, maxLength-1)
+        shuffled_net, cost = heuristicShuffling(decoy_net, pro, out_degree, maxLength-1, inplace=True)
         
-        newnet = copyNet(shuffled_net)
-        newnet = add_attacker(newnet)
-        h = constructHARM(newnet)     
+        topology = updateAttackNet(attack_net, topology, shuffled_net)
+        h = constructHARM(attack_net, pathLimit, trees)     
         totalAP = decoyPath(h)
         delivery_ratio += calcMessageDelivery(h, dropThresh, modifyThresh)
         
@@ -982,7 +1048,7 @@ def hybridIntervalHS(initial_net, decoy_net, initial_info, pro, delay, packet, t
         print("Cost:", cost)
         print("Accumulated delivery ratio:", delivery_ratio)
         
-        decoy_net = copyNet(comp_decoy_net)
+        decoy_net = comp_decoy_net
         previous_ssl = ssl
 
     print("Average number of attack paths:", float(sum_ap)/float(i))
@@ -1007,16 +1073,19 @@ def baselineScheme(initial_net, initial_info, packet):
     ratio = 0.0
     newnet = copyNet(initial_net)
     
+    #Lower layer attack trees shared by the HARMs of the run
+    trees = treeCache()
+    
     while security_failure == False:
 
         attacknet = add_attacker(newnet)
-        h = constructHARM(attacknet) 
+        h = constructHARM(attacknet, cache=trees) 
         
         mttsf, compNodes, attacknet, security_failure = computeMTTSF_Baseline(h, initial_net, attacknet, initial_info["threshold"], initial_info["detectionPro"], compNodes)
         
         tempnet = copyNet(attacknet)
         tempnet = add_attacker(tempnet)
-        h = constructHARM(tempnet) 
+        h = constructHARM(tempnet, cache=trees) 
         delivery_ratio = calcMessageDelivery(h, dropThresh, modifyThresh)
         
         totalTime += mttsf
@@ -198,7 +198,10 @@ def heuShuffling(node_vlan_list, initial_net, decoy_net, decoy_list, initial_inf
 # Impact analysis on network size
 #------------------------------------------------------------------------------------------------------
 
-def scalabilityAnalysis(node_vlan_list, interval, pro, sim, delay, out_degree_ratio, scale, maxLen):
+def scalabilityAnalysis(node_vlan_list, interval, pro, sim, delay, out_degree_ratio, scale, maxLen, pathLimit=None):
+    """
+    pathLimit: maximum number of nodes between the attacker and the target when searching attack paths (no limit by default)
+    """
     decoy_num = {"ct":2, "camera":2, "tv":2, "server":1}
     
     initial_net, decoy_net, decoy_list, initial_info = beforeShuffleScale(node_vlan_list, decoy_num, varyAttackIntelligence(), 
@@ -207,7 +210,7 @@ def scalabilityAnalysis(node_vlan_list, interval, pro, sim, delay, out_degree_ra
 
 
     for i in range(0, sim):
-        mttsf, ave_ap, cost_hour, ratio = hybridIntervalHS(initial_net, decoy_net, initial_info, pro, delay, varyPacket(), out_degree_ratio, maxLen)
+        mttsf, ave_ap, cost_hour, ratio = hybridIntervalHS(initial_net, decoy_net, initial_info, pro, delay, varyPacket(), out_degree_ratio, maxLen, pathLimit)
         if i == 0:
             saveOutput('scalability/hybrid_heu'+str(scale), 'w', [str(mttsf), str(ave_ap), str(cost_hour), str(ratio)], output_path)
         else:
@@ -216,16 +219,16 @@ def scalabilityAnalysis(node_vlan_list, interval, pro, sim, delay, out_degree_ra
     
     return None
 
-def runAndSave(initial_net, decoy_net, initial_info, pro, delay, packet, out_degree_ratio, maxLen, sim_id):
+def runAndSave(initial_net, decoy_net, initial_info, pro, delay, packet, out_degree_ratio, maxLen, sim_id, pathLimit=None):
     try:
-        obj = hybridIntervalHS(initial_net, decoy_net, initial_info, pro, delay, packet, out_degree_ratio, maxLen)
+        obj = hybridIntervalHS(initial_net, decoy_net, initial_info, pro, delay, packet, out_degree_ratio, maxLen, pathLimit)
         saveOutput2("comparison/multiprocess_hybrid_heu_sim_%s" % (sim_id), "w+", [str(i) for i in obj], output_path)
         return None
 
     except BaseException as err:
         return "ERROR: %s" % (err)
 
-def scalabilityAnalysisOnMultiprocess(node_vlan_list, interval, pro, sim, delay, out_degree_ratio, scale, maxLen):
+def scalabilityAnalysisOnMultiprocess(node_vlan_list, interval, pro, sim, delay, out_degree_ratio, scale, maxLen, pathLimit=None):
     decoy_num = {"ct":2, "camera":2, "tv":2, "server":1}
     
     initial_net, decoy_net, decoy_list, initial_info = beforeShuffleScale2(node_vlan_list, decoy_num, varyAttackIntelligence(), 
@@ -235,7 +238,7 @@ def scalabilityAnalysisOnMultiprocess(node_vlan_list, interval, pro, sim, delay,
     pool = multiprocessing.Pool(processes = processor_num)
     
     results = [pool.apply_async(runAndSave, 
-                         args=(initial_net, decoy_net, initial_info, pro, delay, varyPacket(), out_degree_ratio, maxLen, sim_id)) for sim_id in range(0, sim)]
+                         args=(initial_net, decoy_net, initial_info, pro, delay, varyPacket(), out_degree_ratio, maxLen, sim_id, pathLimit)) for sim_id in range(0, sim)]
         
 
     pool.close()
@@ -301,6 +304,7 @@ if __name__ == '__main__':
     out_degree_ratio = 1.0
     scale = 2 #Set the number for real IoT devices (thermostat, meter, camera, tv, laptop)
     maxLength = 5 #Set the maximum path length
+    pathLimit = None #Set the maximum length of attack paths searched in the HARM (None for no limit)
     
     start = time.time()
 
@@ -323,8 +327,8 @@ if __name__ == '__main__':
     """
     Scalability analysis
     """
-    #scalabilityAnalysis(node_vlan_list, interval, pro, sim, delay, out_degree_ratio, scale, maxLength)
-    #scalabilityAnalysisOnMultiprocess(node_vlan_list, interval, pro, sim, delay, out_degree_ratio, scale, maxLen)
+    #scalabilityAnalysis(node_vlan_list, interval, pro, sim, delay, out_degree_ratio, scale, maxLength, pathLimit)
+    #scalabilityAnalysisOnMultiprocess(node_vlan_list, interval, pro, sim, delay, out_degree_ratio, scale, maxLen, pathLimit)
     
     """
     Plot results
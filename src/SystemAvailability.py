@@ -47,3 +47,29 @@ def calcMessageDelivery(harm, dropThresh, modifyThresh):
     #print("delivered packets: ", delivery)
     
     return float(delivery)/float(total)
+
+def calcMessageDeliveryStream(harm, dropThresh, modifyThresh):
+    """
+    Same as calcMessageDelivery, but takes paths from harm.model.iterPaths() instead of the stored list.
+    """
+    total = 0
+    delivery = 0
+    for path in harm.model.iterPaths():
+        if checkPath(path, harm) == True:
+            total += 1
+            flag = False
+            for node in path:
+                if node is not harm.model.s and node is not harm.model.e and node.val > 0:
+                    if node.comp == True:
+                        pro_drop = uniform(0, 1)
+                        if pro_drop < dropThresh:
+                            flag = True
+                        else:
+                            pro_mod = uniform(0, 1)
+                            if pro_mod < modifyThresh:
+                                flag = True
+
+            if flag == False:
+                delivery += 1
+
+    return float(delivery)/float(total)
@@ -12,6 +12,8 @@ class vulNode(node):
     """
     Create vulnerability object.
     """
+    __slots__ = ('privilege', 'val', 'type', 'severity')
+
     def __init__(self, name):
         super(vulNode, self).__init__(name)
         
@@ -50,7 +52,7 @@ class vulNode(node):
             node.vul = network()
             
         #Add vulnerability into the vulnerability network of node
-        node.vul.nodes.append(self)
+        node.vul.addNode(self)
         
         return None
 
@@ -66,7 +68,7 @@ class vulNode(node):
         
         node.vul.s = vulNode('s')
         s = node.vul.s    
-        del s.con[:]
+        s.con.clear()
         for v in node.vul.nodes:
             if v.privilege <= t:
                 s.con.append(v)        
@@ -84,7 +86,7 @@ class vulNode(node):
         
         node.vul.e = vulNode('e')
         e = node.vul.e
-        del e.con[:]
+        e.con.clear()
         for v in node.vul.nodes:
             if v.privilege >= t:
                 v.con.append(e)
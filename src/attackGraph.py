@@ -7,12 +7,21 @@ This module constructs attack graph.
 from Node import *
 from Network import *
 from Vulnerability import *
+from PathCount import pathCountsFrom, predecessorMap, reachableNodes
+from PathStore import pathStore
+from ParallelPaths import parallelPaths
 from math import *
+from time import time
+from random import choice, choices
+from array import array
+from attackTree import NODE_METRICS
   
 class gnode(node):
     """
     Create attack graph node object.
     """
+    __slots__ = ('n', 'val', 'vuls', 'type', 'pro', 'critical', 'comp', 'prev_comp', 'index')
+
     def __init__(self, name):
         super(gnode, self).__init__(name)
         #Store the network node
@@ -22,6 +31,10 @@ class gnode(node):
         self.vuls = []
         self.type = None
         self.pro = None
+        #Copied from the network node
+        self.critical = None
+        self.comp = False
+        self.prev_comp = 0.0
         #Used to check whether the node is included in the attack path or not
         self.inPath = 0
         self.subnet = []
@@ -34,6 +47,8 @@ class gVulNode(vulNode):
     """
     Create attack graph vulnerability object.
     """
+    __slots__ = ('n', 'index')
+
     def __init__(self, name):
         super(gVulNode, self).__init__(name)
         #Store the vulnerability node
@@ -57,6 +72,14 @@ class ag(network):
         self.path = [] 
         #Store all possible paths from start to end
         self.allpath = []
+        #Targets reachable from each node, built by buildReachIndex and dropped by changed
+        self.reach = None
+        #Whether allpath holds all attack paths, and the number of paths per target when it does not
+        self.exact = True
+        self.targetEstimate = None
+        #Node properties indexed by node index, built by harmVectors in SecurityEvaluator (which keeps only the values
+        #of the lower layers between calls) and dropped by changed
+        self.vectors = None
         self.isAG = 1
         self.subnets = network.subnets  #All subnets in the network
         self.vuls = network.vuls        #All vuls in the network
@@ -95,26 +118,30 @@ class ag(network):
                 if u in [network.s, network.e]:
                     gn.val = -1    
                         
-                self.nodes.append(gn)
+                self.addNode(gn)
                 #print(gn.name)
 
 
+        #Attack graph nodes of each network node: by name for upper layer, by identity for lower layer
+        graphNodes = {}
+        for t in self.nodes:
+            key = t.n.name if len(arg) == 0 else id(t.n)
+            graphNodes.setdefault(key, []).append(t)
+        
         #Initialize connections for attack graph node   
         for u in self.nodes:       
             #print(u)
             for v in u.n.con:
                 #For upper layer
-                if len(arg) is 0:
-                    for t in self.nodes:
-                        if t.n.name == v.name:
-                            #print("connections:", t.name)
-                            u.con.append(t)
+                if len(arg) == 0:
+                    for t in graphNodes.get(v.name, []):
+                        #print("connections:", t.name)
+                        u.con.append(t)
                 #For lower layer
                 else:
                     if arg[0] >= v.privilege:
-                        for t in self.nodes:
-                            if t.n is v:
-                                u.con.append(t) 
+                        for t in graphNodes.get(id(v), []):
+                            u.con.append(t) 
         
         #Initialize start and end in attack graph   
         for u in self.nodes:
@@ -125,9 +152,17 @@ class ag(network):
         
         #Remove start and end from nodes in attack graph      
         if self.s is not None:
-            self.nodes.remove(self.s)
+            self.removeNode(self.s)
         if self.e is not None:
-            self.nodes.remove(self.e)           
+            self.removeNode(self.e)           
+
+        self.indexNodes()
+
+    #Number the nodes: position in the node list, then start and end
+    def indexNodes(self):
+        self.table = self.nodes + [u for u in [self.s, self.e] if u is not None]
+        for i in range(0, len(self.table)):
+            self.table[i].index = i
     
     
     #Traverse graph                  
@@ -151,6 +186,272 @@ class ag(network):
 
         return val
 
+    #Successors that can be part of a path (nodes with vulnerabilities, the attacker, the end point)
+    def pathCon(self, u):
+        return [v for v in u.con if v.child != None or v.name == 'ag_attacker' or v is self.e]
+
+    #Targets (nodes connected to the end point) reachable from each node, as bits of an integer by node index
+    def reachIndex(self):
+        reach = [0] * len(self.table)
+        if self.e is None:
+            return reach
+        pred = predecessorMap(set(self.table), self.pathCon, self.e)
+        for t in pred.get(self.e, []):
+            for u in reachableNodes(t, lambda v: pred.get(v, [])):
+                reach[u.index] |= 1 << t.index
+        return reach
+
+    #Build the reachability index once the lower layer is added
+    def buildReachIndex(self):
+        self.reach = self.reachIndex()
+
+    def changed(self):
+        """
+        Mark the attack graph as changed: call it after lower layers or connections of the model are changed.
+        The reachability index and the node vectors built from the model are dropped, and are built again when
+        they are next used. Node properties (val, pro, type, critical, prev_comp) are read by every harmVectors call.
+        """
+        super(ag, self).changed()
+        self.reach = None
+        self.vectors = None
+
+    #Successors that can be part of a path with their bits and the targets they reach, by node index
+    def pathSuccessors(self):
+        e = self.e
+        reach = self.reach if self.reach is not None else self.reachIndex()
+        succ = []
+        for u in self.table:
+            succ.append([(v, 1 << v.index, reach[v.index]) for v in self.pathCon(u) if v is e or reach[v.index]])
+        return succ
+
+    #Traverse graph with an explicit stack, visited nodes are kept as bits of an integer
+    def iterPaths(self, maxLength=None, deadline=None):
+        """
+        Yield attack paths one at a time without storing them.
+        The paths and their order are the same as travelAg.
+        @param maxLength: maximum number of nodes between the attacker and the end point (path length used by the metrics)
+        @param deadline: time (as returned by time.time) when the search stops; self.exact is set to False if it stops early
+        """
+        if self.s is None:
+            return
+        e = self.e
+        succ = self.pathSuccessors()
+        #Number of nodes in the path (start, attacker and nodes) before the end point
+        limit = len(self.table) if maxLength is None else maxLength + 2
+
+        path = [self.s]
+        visited = 0
+        masks = []
+        stack = [iter(succ[self.s.index])]
+        steps = 0
+        while stack:
+            for v, bit, targets in stack[-1]:
+                if not visited & bit:
+                    if v is e:
+                        yield path + [v]
+                        continue
+                    #Cut the branch when all targets reachable from v are already in the path
+                    if not targets & ~visited or len(path) >= limit:
+                        continue
+                    path.append(v)
+                    masks.append(visited)
+                    visited |= bit
+                    stack.append(iter(succ[v.index]))
+                    break
+            else:
+                stack.pop()
+                path.pop()
+                if masks:
+                    visited = masks.pop()
+                steps += 1
+                if deadline is not None and steps % 1000 == 0 and time() > deadline:
+                    self.exact = False
+                    return
+
+    #Same walk as iterPaths, writing the trie entry of each node when going down and dropping it at a dead end
+    def storePaths(self, store, maxLength=None, deadline=None, maxPaths=None):
+        """
+        Add the attack paths to a path store, in the order of travelAg.
+        @param maxPaths: maximum number of paths in the store
+        @return: False if the walk stopped at maxPaths paths or at the deadline (self.exact is then set to False)
+        """
+        if self.s is None:
+            return True
+        e = self.e
+        succ = self.pathSuccessors()
+        limit = len(self.table) if maxLength is None else maxLength + 2
+        room = None if maxPaths is None else maxPaths - len(store)
+
+        #New trie entries (node index, parent entry, depth) numbered from offset; entries of the path on a stack
+        offset = len(store.nodeIndex)
+        nodeIndex = [self.s.index]
+        parent = [-1]
+        depth = [1]
+        leaves = []
+        entries = [offset]
+        #Last entry written, and the bits of the nodes after the start to clear when going up
+        top = offset
+        visited = 0
+        bits = []
+        stack = [iter(succ[self.s.index])]
+        steps = 0
+        complete = True
+        while stack and complete:
+            for v, bit, targets in stack[-1]:
+                if not visited & bit:
+                    if v is e:
+                        if room is not None and len(leaves) >= room:
+                            complete = False
+                            break
+                        leaves.append(entries[-1])
+                        continue
+                    if not targets & ~visited or len(entries) >= limit:
+                        continue
+                    nodeIndex.append(v.index)
+                    parent.append(entries[-1])
+                    entries.append(top + 1)
+                    depth.append(len(entries))
+                    top += 1
+                    bits.append(bit)
+                    visited |= bit
+                    stack.append(iter(succ[v.index]))
+                    break
+            else:
+                stack.pop()
+                entry = entries.pop()
+                #Nothing was kept below the entry and no path ends at it
+                if entry == top and (not leaves or leaves[-1] != entry):
+                    nodeIndex.pop()
+                    parent.pop()
+                    depth.pop()
+                    top -= 1
+                if bits:
+                    visited ^= bits.pop()
+                steps += 1
+                if deadline is not None and steps % 1000 == 0 and time() > deadline:
+                    complete = False
+        if len(leaves) == 0:
+            nodeIndex = parent = depth = []
+        store.extendTrie(nodeIndex, parent, depth, leaves)
+        if not complete:
+            self.exact = False
+        return complete
+
+    #Count attack paths without storing them
+    def countPaths(self):
+        """
+        @return: dictionary {target: number of attack paths ending at target}
+        """
+        if self.s is None or self.e is None:
+            return {}
+        return pathCountsFrom(self.s, self.e, self.pathCon)
+
+    #Get attack paths without recursion, stored as a prefix trie
+    def travelAgIterative(self):
+        self.exact = True
+        self.targetEstimate = None
+        self.allpath = pathStore(self.table, (), self.e)
+        self.storePaths(self.allpath)
+        return len(self.allpath)
+
+    #Get attack paths within a budget
+    def travelAgBudget(self, maxPaths=None, maxLength=None, deadline=None):
+        """
+        Enumerate attack paths until one of the limits is reached.
+        @param maxPaths: maximum number of paths
+        @param maxLength: maximum number of nodes between the attacker and the end point
+        @param deadline: maximum time for the search in seconds
+        @return: number of paths; self.exact is False when the search stopped before finding all paths (up to maxLength)
+        """
+        self.exact = True
+        self.allpath = pathStore(self.table, (), self.e)
+        stop = None if deadline is None else time() + deadline
+        self.storePaths(self.allpath, maxLength, stop, maxPaths)
+        self.targetEstimate = self.storedTargetCounts()
+        return len(self.allpath)
+
+    #Number of stored attack paths per target
+    def storedTargetCounts(self):
+        counts = {}
+        for path in self.allpath:
+            counts[path[-2]] = counts.get(path[-2], 0) + 1
+        return counts
+
+    #Random walk from the start, weighted by the branching factors (Knuth's estimator of the size of the search tree)
+    def samplePath(self, succ, limit):
+        e = self.e
+        path = [self.s]
+        visited = 0
+        weight = 1
+        u = self.s
+        while True:
+            children = [(v, bit) for v, bit, targets in succ[u.index]
+                        if not visited & bit and (v is e or (targets & ~visited and len(path) < limit))]
+            if len(children) == 0:
+                return None, 0
+            weight *= len(children)
+            v, bit = choice(children)
+            path.append(v)
+            if v is e:
+                return path, weight
+            visited |= bit
+            u = v
+
+    #Estimate attack paths by sampling
+    def samplePaths(self, samples, walks=None, maxLength=None, deadline=None):
+        """
+        Estimate the number of attack paths with random walks and store a uniform sample of paths.
+        A walk reaching the end point after choosing among d1, d2, ... successors has weight d1*d2*...
+        and the mean weight over all walks estimates the number of paths. Drawing the walks with probability
+        proportional to their weight gives a uniform sample of attack paths.
+        @param samples: number of paths stored in allpath
+        @param walks: number of random walks (10 times samples by default)
+        @param maxLength: maximum number of nodes between the attacker and the end point
+        @param deadline: maximum time for sampling in seconds
+        @return: estimated number of paths; self.exact is False and targetEstimate holds the estimated paths per target
+        """
+        self.exact = False
+        self.allpath = pathStore(self.table, (), self.e)
+        self.targetEstimate = {}
+        if self.s is None or self.e is None:
+            return 0
+        if walks is None:
+            walks = 10 * samples
+        succ = self.pathSuccessors()
+        limit = len(self.table) if maxLength is None else maxLength + 2
+        stop = None if deadline is None else time() + deadline
+
+        paths = []
+        weights = []
+        done = 0
+        while done < walks and (stop is None or time() <= stop):
+            path, weight = self.samplePath(succ, limit)
+            done += 1
+            if path is not None:
+                paths.append(path)
+                weights.append(weight)
+        if done == 0:
+            return 0
+
+        for path, weight in zip(paths, weights):
+            self.targetEstimate[path[-2]] = self.targetEstimate.get(path[-2], 0) + float(weight)/done
+        if len(paths) > 0:
+            self.allpath.extend(choices(paths, weights, k=samples))
+        return sum(self.targetEstimate.values())
+
+    #Number of attack paths per target: counted, or taken from the last budgeted or sampled search
+    def targetCounts(self):
+        if self.targetEstimate is not None:
+            return dict(self.targetEstimate)
+        return self.countPaths()
+
+    #Get attack paths in worker processes, split by the first hops after the attacker
+    def travelAgParallel(self, processes=None, splitDepth=1, pool=None, maxLength=None):
+        self.exact = True
+        self.allpath = parallelPaths(self, pathStore(self.table, (), self.e), processes, splitDepth, pool, maxLength)
+        self.targetEstimate = None if maxLength is None else self.storedTargetCounts()
+        return len(self.allpath)
+
     #Traverse graph to get attack paths
     def travelAg(self): 
         self.allpath = []
@@ -211,15 +512,36 @@ class ag(network):
 
         return list1, list2
     
-    #Calculate attack paths
-    def calcPath(self):
-        return self.travelAg()
+    #Calculate attack paths (in worker processes when more than one process is given), up to maxLength nodes after the attacker
+    def calcPath(self, processes=None, maxLength=None):
+        if processes is not None and processes > 1:
+            return self.travelAgParallel(processes, maxLength=maxLength)
+        if maxLength is not None:
+            return self.travelAgBudget(maxLength=maxLength)
+        return self.travelAgIterative()
     
     
     
     #---------------------------------------------------------------------------------------------
     #Security analysis part: including attack impact, attack cost and attack success probability
     
+    #Compute the metrics of all nodes in one pass over each lower layer, node values are not changed
+    def calcAll(self, metrics=NODE_METRICS):
+        """
+        @return: dictionary {metric: array of values indexed by node index}; nodes without child keep their value
+        """
+        values = {}
+        for metric in metrics:
+            values[metric] = array('d', [0.0]) * len(self.table)
+        for u in self.table:
+            if u.child is not None:
+                temp = u.child.evaluateAll(metrics)
+            else:
+                temp = [u.val] * len(metrics)
+            for i in range(0, len(metrics)):
+                values[metrics[i]][u.index] = temp[i]
+        return values
+
     #In case that the node is in the upper layer and has child (not none), assign child value to node value 
     def getImpactValue(self):
         for u in self.nodes:
@@ -287,5 +609,5 @@ class ag(network):
     def getNodeValue(self):
         for u in self.nodes:
             if u.child is not None: 
-                u.val = u.child.getNodeValue(u.child.topGate)
+                u.val = u.child.calcNodeValue()
 
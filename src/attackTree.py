@@ -6,17 +6,21 @@ This module constructs attack tree.
 from Node import *
 from Network import *
 from Vulnerability import *
+from array import array
 
 
 class tNode(node):
     """
     Create attack tree node object.
     """
+    __slots__ = ('n', 't', 'val', 'command')
+
     def __init__(self, name):
         super(tNode, self).__init__(name)
         self.n = None
         self.t = "node"
         self.val = 0
+        self.command = 0
     
     def __str__(self):
         return self.name
@@ -25,34 +29,224 @@ class tVulNode(vulNode):
     """
     Create attack tree vulnerability object.
     """
+    __slots__ = ('n', 't', 'command', 'vulname')
+
     def __init__(self, name):
         super(tVulNode, self).__init__(name)
         self.n = None
         self.t = "node"
         self.val = 0
         self.command = 0
+        self.vulname = None
         
     def __str__(self):
         return self.name
       
 class andGate(node):
+    __slots__ = ('t',)
+
     def __init__(self):
         super(andGate, self).__init__("andGate")
         self.t = "andGate"
+        #Children of a gate may repeat, keep them in a list
+        self.con = []
 
 class orGate(node):
+    __slots__ = ('t',)
+
     def __init__(self):
         super(orGate, self).__init__("orGate")
         self.t = "orGate"
+        #Children of a gate may repeat, keep them in a list
+        self.con = []
+
+
+#Opcodes of the compiled attack tree
+LEAF = 0
+AND = 1
+OR = 2
+OTHER = 3
+#Keep the value of a shared gate in a slot and push it again
+STORE = 4
+LOAD = 5
+
+#Combine the values of the children of a gate
+def maxValue(vals):
+    val = 0
+    for tval in vals:
+        if tval >= val:
+            val = tval
+    return val
+
+def productValue(vals):
+    val = 1.0
+    for tval in vals:
+        val *= tval
+    return val
+
+def orProbability(vals):
+    val = 1.0
+    for tval in vals:
+        if tval > 0:
+            val *= (1.0-tval)
+    return 1.0-val
+
+def lastValue(vals):
+    if len(vals) == 0:
+        return 0
+    return vals[-1]
+
+def proLeafValue(val):
+    if val > 0:
+        return val
+    return 1.0
+
+#Metric: (leaf value, AND gate, OR gate, value of other children), a leaf value of None keeps the node value
+METRICS = {"impact": (None, sum, maxValue, 0),
+           "cost": (None, sum, min, 0),
+           "pro": (proLeafValue, productValue, orProbability, 1.0),
+           "risk": (None, sum, maxValue, 0),
+           "roa": (None, sum, maxValue, 0),
+           "mttc": (None, sum, maxValue, 0),
+           "node": (None, lastValue, lastValue, 0)}
+
+#Node-level metrics computed together by ag.calcAll
+NODE_METRICS = ["impact", "cost", "pro", "risk", "roa", "mttc"]
+
+class compiledTree(object):
+    """
+    Attack tree flattened in postfix order: an opcode and an argument (leaf index, number of children or slot)
+    per item. A gate shared by several parents is evaluated once and its value is kept in a slot.
+    The values of the leaves are copied when the tree is compiled, so the value of each metric is computed once.
+    """
+    __slots__ = ('ops', 'args', 'leaves', 'vals', 'slots', 'results')
+
+    def __init__(self, topGate):
+        self.ops = array('b')
+        self.args = array('i')
+        self.leaves = []
+        leafIndex = {}
+        #Slot of each gate with more than one parent
+        slotIndex = {}
+        seen = set([id(topGate)])
+        stack = [topGate]
+        while stack:
+            u = stack.pop()
+            for v in u.con:
+                if getattr(v, 't', None) in ['andGate', 'orGate']:
+                    if id(v) in seen:
+                        if id(v) not in slotIndex:
+                            slotIndex[id(v)] = len(slotIndex)
+                    else:
+                        seen.add(id(v))
+                        stack.append(v)
+        self.slots = len(slotIndex)
+
+        #Gates are emitted after their children
+        emitted = set()
+        stack = [(topGate, False)]
+        while stack:
+            u, expanded = stack.pop()
+            t = getattr(u, 't', None)
+            if t in ['andGate', 'orGate']:
+                if expanded:
+                    self.ops.append(AND if t == 'andGate' else OR)
+                    self.args.append(len(u.con))
+                    if id(u) in slotIndex:
+                        self.ops.append(STORE)
+                        self.args.append(slotIndex[id(u)])
+                        emitted.add(id(u))
+                elif id(u) in emitted:
+                    self.ops.append(LOAD)
+                    self.args.append(slotIndex[id(u)])
+                else:
+                    stack.append((u, True))
+                    for v in reversed(u.con):
+                        stack.append((v, False))
+            elif t == "node":
+                if id(u) not in leafIndex:
+                    leafIndex[id(u)] = len(self.leaves)
+                    self.leaves.append(u)
+                self.ops.append(LEAF)
+                self.args.append(leafIndex[id(u)])
+            else:
+                self.ops.append(OTHER)
+                self.args.append(0)
+        self.vals = [u.val for u in self.leaves]
+        #Value of each metric already evaluated
+        self.results = {}
+
+    #Value of a metric (a key of METRICS)
+    def value(self, metric):
+        if metric not in self.results:
+            self.results[metric] = self.evaluate(*METRICS[metric])
+        return self.results[metric]
+
+    #Values of several metrics in one pass over the tree: each stack item holds the values of all metrics
+    def values(self, metrics):
+        temp = [m for m in metrics if m not in self.results]
+        if len(temp) > 0:
+            funcs = [METRICS[m] for m in temp]
+            leaves = list(zip(*[self.vals if f[0] is None else [f[0](val) for val in self.vals] for f in funcs]))
+            other = tuple([f[3] for f in funcs])
+            andFuncs = [f[1] for f in funcs]
+            orFuncs = [f[2] for f in funcs]
+            stack = []
+            slots = [None] * self.slots
+            for op, arg in zip(self.ops, self.args):
+                if op == LEAF:
+                    stack.append(leaves[arg])
+                elif op == OTHER:
+                    stack.append(other)
+                elif op == STORE:
+                    slots[arg] = stack[-1]
+                elif op == LOAD:
+                    stack.append(slots[arg])
+                else:
+                    k = len(stack) - arg
+                    children = [list(c) for c in zip(*stack[k:])] if arg > 0 else [[] for f in funcs]
+                    del stack[k:]
+                    stack.append(tuple([f(c) for f, c in zip(andFuncs if op == AND else orFuncs, children)]))
+            for m, val in zip(temp, stack[-1]):
+                self.results[m] = val
+        return [self.results[m] for m in metrics]
+
+    def evaluate(self, leafValue, andValue, orValue, otherValue):
+        vals = self.vals
+        if leafValue is not None:
+            vals = [leafValue(val) for val in vals]
+        stack = []
+        slots = [None] * self.slots
+        for op, arg in zip(self.ops, self.args):
+            if op == LEAF:
+                stack.append(vals[arg])
+            elif op == OTHER:
+                stack.append(otherValue)
+            elif op == STORE:
+                slots[arg] = stack[-1]
+            elif op == LOAD:
+                stack.append(slots[arg])
+            else:
+                k = len(stack) - arg
+                temp = stack[k:]
+                del stack[k:]
+                stack.append(andValue(temp) if op == AND else orValue(temp))
+        return stack[-1]
 
      
 class at(object):
     """
     Create attack tree.
     """
-    def __init__(self, network, val, *arg):
+    def __init__(self, network, val, *arg, shared=False):
+        """
+        @param shared: build the tree as a graph where equal sub-trees are created once and shared
+        """
         self.nodes = []
         self.topGate = None
+        #Flattened tree used for the evaluation, built when first needed
+        self.compiled = None
+        self.shared = shared
         self.construct(network, val, *arg)
         self.isAG = 0
     
@@ -85,21 +279,24 @@ class at(object):
                     
                 nodes.append(tn)   
         
+        #Attack tree nodes of each network node
+        treeNodes = {}
+        for t in nodes:
+            treeNodes.setdefault(id(t.n), []).append(t)
+        
         #Initialize connections for attack tree node                         
         for u in nodes:
             for v in u.n.con:
                 #For upper layer
-                if len(arg) is 0:
-                    for t in nodes:
-                        if t.n is v:
-                            u.con.append(t)
+                if len(arg) == 0:
+                    for t in treeNodes.get(id(v), []):
+                        u.con.append(t)
                 #For lower layer
                 else:
                     # Privilege value is used here to decide what vulnerabilities an attacker can use for attack paths 
                     if v.privilege is not None and arg[0] >= v.privilege:
-                        for t in nodes:
-                            if t.n is v:
-                                u.con.append(t)      
+                        for t in treeNodes.get(id(v), []):
+                            u.con.append(t)      
         return None
     
     #Construct the attack tree
@@ -124,7 +321,10 @@ class at(object):
                 if u.n is network.s:
                     self.topGate.con.append(u)  
             
-            self.simplify(self.topGate, history, e)
+            if self.shared:
+                self.simplifyShared(self.topGate, e)
+            else:
+                self.simplify(self.topGate, history, e)
             self.targetOut(self.topGate, e)
             self.foldgate(self.topGate)
 
@@ -163,25 +363,104 @@ class at(object):
     
         return value
     
+    def simplifyShared(self, gate, target):
+        """
+        Same tree as simplify, built with shared sub-trees.
+        The sub-tree of a node only depends on the history nodes met by the search from the node, so it is
+        memoised on the node and these history nodes. Gates with the same type and children are created once.
+        Sets of nodes are kept as bit masks of the node numbers.
+        """
+        #Number the nodes reachable from the gate
+        nodes = [u for u in gate.con if u is not target]
+        number = dict([(id(u), i) for i, u in enumerate(nodes)])
+        for u in nodes:
+            for v in u.con:
+                if v is not target and id(v) not in number:
+                    number[id(v)] = len(nodes)
+                    nodes.append(v)
+        succ = [0] * len(nodes)
+        for i, u in enumerate(nodes):
+            for v in u.con:
+                if v is not target:
+                    succ[i] |= 1 << number[id(v)]
+
+        memo = {}
+        gates = {}
+
+        #Gate with the given children, shared with the gates having the same children
+        def makeGate(gateType, children):
+            key = (gateType, tuple([id(u) for u in children]))
+            if key not in gates:
+                gates[key] = gateType()
+                gates[key].con.extend(children)
+            return gates[key]
+
+        #History nodes which are successors of nodes reachable from i without going through the history
+        def boundary(i, history):
+            seen = 1 << i
+            stack = seen
+            temp = 0
+            while stack:
+                bit = stack & -stack
+                stack ^= bit
+                s = succ[bit.bit_length() - 1]
+                temp |= s & history
+                s &= ~(history | seen)
+                seen |= s
+                stack |= s
+            return temp
+
+        def build(i, history):
+            key = (i, boundary(i, history))
+            if key in memo:
+                return memo[key]
+            item = nodes[i]
+            targets = []
+            children = []
+            for u in item.con:
+                if u is target:
+                    targets.append(u)
+                elif not history >> number[id(u)] & 1:
+                    children.append(build(number[id(u)], history | 1 << i))
+            if len(targets) + len(children) == 0:
+                temp = item
+            else:
+                temp = makeGate(andGate, [item, makeGate(orGate, targets + children)])
+            memo[key] = temp
+            return temp
+
+        #Processed nodes are moved after the target, as in simplify
+        tGate = list(gate.con)
+        del gate.con[:]
+        gate.con.extend([item for item in tGate if item is target])
+        gate.con.extend([build(number[id(item)], 0) for item in tGate if item is not target])
+
     def targetOut(self, rootGate, target):
         self.targetOutRecursive(rootGate, target)
         for gate in rootGate.con:
             gate.con.append(target)
         self.deleteEmptyGates(rootGate)        
         
-    def deleteEmptyGates(self, gate):
+    #Shared gates (done) are only processed once
+    def deleteEmptyGates(self, gate, done=None):
+        if done is None:
+            done = set()
+        done.add(id(gate))
         removedGates = []
         for node in gate.con:
             if node.t in ['andGate', 'orGate']:
                 if (len(node.con) is 1) and (node.con[0] is "removed"):
                     removedGates.append(node)
-                else:
-                    self.deleteEmptyGates(node)
+                elif id(node) not in done:
+                    self.deleteEmptyGates(node, done)
                                 
         for node in removedGates:
             gate.con.remove(node)    
                 
-    def targetOutRecursive(self, gate, target):
+    def targetOutRecursive(self, gate, target, done=None):
+        if done is None:
+            done = set()
+        done.add(id(gate))
         toChange = []
         for node in gate.con:
             if node is target:
@@ -192,8 +471,8 @@ class at(object):
                 else:                    
                     toChange.append(node)                    
                     
-            elif node.t in ['andGate', 'orGate']:
-                self.targetOutRecursive(node, target)
+            elif node.t in ['andGate', 'orGate'] and id(node) not in done:
+                self.targetOutRecursive(node, target, done)
         for node in toChange:
             gate.con.remove(node)
             nothing = tNode('at-.')
@@ -201,11 +480,15 @@ class at(object):
             gate.con.append(nothing)
             
     #Fold gate with one child                
-    def foldgate(self, gate):
+    def foldgate(self, gate, done=None):
+        if done is None:
+            done = set()
+        done.add(id(gate))
         removedGates = []
         for node in gate.con:
             if node.t in ['andGate', 'orGate']:
-                self.foldgate(node)
+                if id(node) not in done:
+                    self.foldgate(node, done)
                 if len(node.con) == 1:
                     gate.con.extend(node.con)
                     removedGates.append(node)                
@@ -233,43 +516,72 @@ class at(object):
     #----------------------------------------------------------------------------------------------    
     #AT is upper layer
     #Assign child value to node value recursively
-    def getImpactValueRecursive(self, gate):
+    def getImpactValueRecursive(self, gate, done=None):
+        if done is None:
+            done = set()
+        done.add(id(gate))
         for u in gate.con:
             if u.t is "node": 
                 if u.child is not None:                
                     u.val = u.child.calcImpact()
-            else:
-                self.getImpactValueRecursive(u)
+            elif id(u) not in done:
+                self.getImpactValueRecursive(u, done)
       
     def getImpactValue(self):
         self.getImpactValueRecursive(self.topGate)
+        self.compiled = None
 
 
-    def getCostValueRecursive(self, gate):
+    def getCostValueRecursive(self, gate, done=None):
+        if done is None:
+            done = set()
+        done.add(id(gate))
         for u in gate.con:
             if u.t is "node": 
                 if u.child is not None:                
                     u.val = u.child.calcCost()
-            else:
-                self.getCostValueRecursive(u)
+            elif id(u) not in done:
+                self.getCostValueRecursive(u, done)
     
     def getCostValue(self):
         self.getCostValueRecursive(self.topGate)
+        self.compiled = None
 
-    def getProValueRecursive(self, gate):
+    def getProValueRecursive(self, gate, done=None):
+        if done is None:
+            done = set()
+        done.add(id(gate))
         for u in gate.con:
             if u.t is "node": 
                 if u.child is not None:                
                     u.val = u.child.calcPro()
-            else:
-                self.getProValueRecursive(u)
+            elif id(u) not in done:
+                self.getProValueRecursive(u, done)
     
     def getProValue(self):
         self.getProValueRecursive(self.topGate)
+        self.compiled = None
 
 
     #----------------------------------------------------------------------------------------------    
     #AT is lower layer
+
+    #Flatten the tree into postfix arrays, compile again after the values of the tree nodes change
+    def compile(self):
+        self.compiled = compiledTree(self.topGate)
+        return self.compiled
+
+    #Evaluate a metric (a key of METRICS) on the compiled tree
+    def evaluate(self, metric):
+        if self.compiled is None:
+            self.compile()
+        return self.compiled.value(metric)
+
+    #Evaluate several metrics in one pass over the compiled tree
+    def evaluateAll(self, metrics=NODE_METRICS):
+        if self.compiled is None:
+            self.compile()
+        return self.compiled.values(metrics)
    
     #Calculate the impact value for each node in the attack tree
     def calcImpactRecursive(self, s):    
@@ -292,7 +604,7 @@ class at(object):
     
     #Get the impact value of each node in the attack tree
     def calcImpact(self):
-        return self.calcImpactRecursive(self.topGate)
+        return self.evaluate("impact")
 
    
     #Calculate the attack cost value for each node in the attack tree
@@ -316,7 +628,7 @@ class at(object):
     
     #Get the attack cost value of each node in the attack tree
     def calcCost(self):
-        return self.calcCostRecursive(self.topGate)
+        return self.evaluate("cost")
 
 
     #Calculate the probability value for each node in the attack tree
@@ -330,7 +642,7 @@ class at(object):
             for u in s.con:
                 tval = self.calcProRecursive(u)
                 if tval > 0:
-                    val *= (1.0-self.calcProRecursive(u)) #probability
+                    val *= (1.0-tval) #probability
             val = 1.0-val
         elif s.t is "node" and s.val > 0:
             val = s.val
@@ -340,7 +652,7 @@ class at(object):
 
     #Get the probability value of each node in the attack tree
     def calcPro(self):
-        return self.calcProRecursive(self.topGate)
+        return self.evaluate("pro")
 
 
     #Calculate the risk value for each node in the attack tree
@@ -364,7 +676,7 @@ class at(object):
     
     #Get the risk value of each node in the attack tree
     def calcRisk(self):
-        return self.calcRiskRecursive(self.topGate)
+        return self.evaluate("risk")
 
 
     #Calculate the return on attack path value for each node in the attack tree
@@ -388,7 +700,7 @@ class at(object):
     
     #Get the return on attack path value of each node in the attack tree
     def calcReturnOnAttack(self):
-        return self.calcReturnOnAttackRecursive(self.topGate)
+        return self.evaluate("roa")
     
     
     #Calculate the mean-time-to-compromise value for each node in the attack tree
@@ -412,9 +724,12 @@ class at(object):
     
     #Get the mean-time-to-compromise value of each node in the attack tree
     def calcMTTC(self):
-        return self.calcMTTCRecursive(self.topGate)
+        return self.evaluate("mttc")
 
     #When only one node is in the attack tree, calculate the value for the node
+    def calcNodeValue(self):
+        return self.evaluate("node")
+
     def getNodeValue(self, s):    
         if s.t is "andGate":
             val = 0
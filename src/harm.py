@@ -6,6 +6,7 @@ This module constructs HARMs using AG, AT in both upper and lower layers.
 
 from attackGraph import *
 from attackTree import *
+from collections import OrderedDict
 
 class harm(object):
     """
@@ -14,39 +15,101 @@ class harm(object):
     def __init__(self):
         self.model = None
 
-    def constructHarm(self, net, up, valueUp, lo, valueLow, pri):
-        self.model = makeHARM(net, up, valueUp, lo, valueLow, pri)
+    def constructHarm(self, net, up, valueUp, lo, valueLow, pri, calcPaths=True, processes=None, maxLength=None, cache=None):
+        self.model = makeHARM(net, up, valueUp, lo, valueLow, pri, calcPaths, processes, maxLength, cache)
 
+
+
+class treeCache(object):
+    """
+    Lower layer attack trees shared by the nodes with the same vulnerability network, across HARM constructions.
+    The caller creates the cache and passes it to the constructions that may share trees; there is no default cache.
+    The trees are compiled and must be treated as read-only. When the cache is full, the least recently used tree
+    is dropped.
+    """
+    def __init__(self, size=1024):
+        self.size = size
+        self.trees = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    #Key of a vulnerability network: names, values, privileges and connections of the vulnerabilities
+    def signature(self, vulNet, val, pri):
+        table = [vulNet.s, vulNet.e] + list(vulNet.nodes)
+        position = {}
+        for i in range(0, len(table)):
+            if table[i] is not None:
+                position[id(table[i])] = i
+        temp = []
+        for v in table:
+            if v is None:
+                temp.append(None)
+            else:
+                temp.append((type(v).__name__, v.name, v.val, v.privilege, v.isStart,
+                             tuple([position.get(id(w), -1) for w in v.con])))
+        return (val, pri, tuple(temp))
+
+    def getTree(self, vulNet, val, pri):
+        key = self.signature(vulNet, val, pri)
+        tree = self.trees.get(key)
+        if tree is not None:
+            self.hits += 1
+            self.trees.move_to_end(key)
+            return tree
+        self.misses += 1
+        tree = at(vulNet, val, pri)
+        tree.compile()
+        self.trees[key] = tree
+        if len(self.trees) > self.size:
+            self.trees.popitem(last=False)
+        return tree
+
+    def clear(self):
+        self.trees.clear()
+        self.hits = 0
+        self.misses = 0
+
+#Lower layer attack tree of a node (shared through the cache unless cache is None)
+def makeTree(vulNet, val, pri, cache):
+    if cache is None:
+        return at(vulNet, val, pri)
+    return cache.getTree(vulNet, val, pri)
     
-def addToTreeRecursive(gate, childType, val, pri):
+def addToTreeRecursive(gate, childType, val, pri, cache=None, done=None):
+    #Gates shared by several parents are visited once
+    if done is None:
+        done = set()
+    done.add(id(gate))
     for u in gate.con:
         if u.t is "node":
-            if (u.n is not None) and (u.n.vul is not None):
+            #Start and end nodes have no vulnerabilities
+            if (u.n is not None) and (getattr(u.n, 'vul', None) is not None):
                 childType = childType.lower()
                 if childType.find("attacktree") >= 0:
-                    u.child = at(u.n.vul, val, pri)
+                    u.child = makeTree(u.n.vul, val, pri, cache)
                 elif childType.find("attackgraph") >= 0:
                     u.child = ag(u.n.vul, val, pri)
                 else:
                     print("Error")
-        else:
-            addToTreeRecursive(u, childType, val, pri)
+        elif id(u) not in done:
+            addToTreeRecursive(u, childType, val, pri, cache, done)
             
-def addToTree(aT, childType, val, pri):
-    addToTreeRecursive(aT.topGate, childType, val, pri)
+def addToTree(aT, childType, val, pri, cache=None):
+    addToTreeRecursive(aT.topGate, childType, val, pri, cache)
     
-def addToGraph(aG, childType, val, pri):
+def addToGraph(aG, childType, val, pri, cache=None):
     for u in aG.nodes:
         if (u.n is not None) and (u.n.vul is not None):
             childType = childType.lower()
             if childType.find("attacktree") >= 0:
-                u.child = at(u.n.vul, val, pri)
+                u.child = makeTree(u.n.vul, val, pri, cache)
             elif childType.find("attackgraph") >= 0:
                 u.child = ag(u.n.vul, val, pri)
             else:
                 print("Error")
+    aG.changed()
 
-def makeHARM(net, up, vu, lo, vl, pri):
+def makeHARM(net, up, vu, lo, vl, pri, calcPaths=True, processes=None, maxLength=None, cache=None, shared=False):
     """
     Construct HARM.
 
@@ -56,6 +119,11 @@ def makeHARM(net, up, vu, lo, vl, pri):
     :param lo: lower layer type
     :param vl: assign a default value to val parameter for vulnerability, no real meaning when initializing, changed and used in security analysis
     :param pri: assign a privilege value in construction of lower layer vulnerability connections
+    :param calcPaths: store all attack paths in allpath; when False, paths can be streamed with iterPaths
+    :param processes: number of worker processes used to enumerate attack paths (not allowed inside pool workers); one process by default
+    :param maxLength: maximum number of nodes between the attacker and the end point in attack paths; longer paths are not searched
+    :param cache: treeCache sharing lower layer attack trees between nodes with the same vulnerabilities; None builds a tree for each node
+    :param shared: build an upper layer attack tree with shared sub-trees (see at.simplifyShared)
     :returns: HARM: contains two layers, when using AGAT, \
                     the upper layer is attack graph listing nodes and attack paths \
                     each node has a lower layer which stored in child parameter, containing vulnerability tree
@@ -65,7 +133,7 @@ def makeHARM(net, up, vu, lo, vl, pri):
     
     #Construct upper layer  
     if up.find("attacktree") >= 0:
-        harm = at(net, vu)
+        harm = at(net, vu, shared=shared)
     elif up.find("attackgraph") >= 0:
         harm = ag(net, vu)
     else:
@@ -75,10 +143,12 @@ def makeHARM(net, up, vu, lo, vl, pri):
     #Add lower layer to upper layer
     if harm is not None:
         if type(harm) is ag:
-            addToGraph(harm, lo, vl, pri)
-            harm.calcPath() #Compute attack path
+            addToGraph(harm, lo, vl, pri, cache)
+            harm.buildReachIndex()
+            if calcPaths:
+                harm.calcPath(processes, maxLength) #Compute attack path
         else:
-            addToTree(harm, lo, vl, pri)
+            addToTree(harm, lo, vl, pri, cache)
 
             
     return harm
@@ -87,10 +157,13 @@ def removeAT(harm, list):
     """
     Remove attack trees of nodes in a list.
     """
-    for node in harm.model.nodes:
-        for comproNode in list:
-            if node.name == comproNode.name:
-                #print(node.name)
-                node.child = None
+    #Only the attack graph keeps a node list
+    if harm.model.isAG == 0:
+        return harm
+    for comproNode in list:
+        node = harm.model.getNode(comproNode.name)
+        if node is not None:
+            node.child = None
+    harm.model.changed()
     
     return harm
@@ -0,0 +1,269 @@
+'''
+This module tests the cached and incrementally updated structures used by the simulations against the same data
+computed from scratch. Run it with pytest from the src directory before the benchmarks.
+'''
+
+from Benchmarks import *
+import numpy as np
+from SecurityEvaluator import harmVectors, nodeVectors, computeMTTSFLoop, mttsfPathRows
+
+#=================================================================================================
+# Attack path store
+#=================================================================================================
+
+def test_pathStore(scale=5, maxPaths=100):
+    """
+    The trie holds the paths of the recursive enumeration: by iteration, by index and materialised, after a
+    shuffle (item assignment), after pickling and within a path budget.
+    """
+    model = constructHARM(createShuffledNet(scale)).model
+    model.travelAg()
+    paths = pathNames(model.allpath)
+    model.travelAgIterative()
+    store = model.allpath
+    assert pathNames(store) == paths
+    assert pathNames([store[i] for i in range(0, len(store))]) == paths
+
+    order = list(range(0, len(paths)))
+    with seeded():
+        shuffle(order)
+    with seeded():
+        shuffle(store)
+    paths = [paths[i] for i in order]
+    assert pathNames(store) == paths
+    assert pathNames(store.materialise()) == paths
+    assert pathNames([store[i] for i in range(0, len(store))]) == paths
+    assert pathNames(pickle.loads(pickle.dumps(store))) == paths
+
+    model.travelAgIterative()
+    paths = pathNames(model.allpath)
+    model.travelAgBudget(maxPaths=maxPaths)
+    assert pathNames(model.allpath) == paths[:maxPaths] and model.exact == False
+
+#=================================================================================================
+# Hop table
+#=================================================================================================
+
+def sameHops(table, nodes, servers):
+    """
+    Whether the hops in the table are the hops of a table computed from scratch and of the search from each node.
+    """
+    fresh = hopTable(nodes, servers, lambda v: v.con)
+    return all([table[v] == fresh[v] for v in nodes]) and \
+           all([table[v] == v.calcNodeHopsToTarget(0, 0) for v in nodes if v not in servers])
+
+def test_hopTable(scale=5, pro=0.9, out_degree=3, maxLength=4):
+    """
+    The hop table is the same as a table computed from scratch after connections are added and removed, and a
+    connection refused by addEdgeWithin leaves it unchanged.
+    """
+    net = createScaledNet(scale)
+    servers = [n for n in net.nodes if n.name.startswith("server")]
+    table = hopTable(net.nodes, servers, lambda v: v.con)
+    assert addRealConnections(net, table.__getitem__, table.addEdge, pro, out_degree, maxLength) > 0
+    assert sameHops(table, net.nodes, servers)
+
+    edges = [(u, v) for u in net.nodes for v in list(u.con) if u not in servers]
+    with seeded():
+        shuffle(edges)
+    for u, v in edges[:len(edges)//2]:
+        disconnectOneWay(u, v)
+        table.removeEdge(u, v)
+        assert sameHops(table, net.nodes, servers)
+
+    for u, v in edges[:len(edges)//2]:
+        hop = dict(table.hop)
+        connectOneWay(u, v)
+        if not table.addEdgeWithin(u, v, max(hop.values()) - 1):
+            disconnectOneWay(u, v)
+            assert table.hop == hop
+        assert sameHops(table, net.nodes, servers)
+
+#=================================================================================================
+# Caches invalidated by changes of the network or the HARM
+#=================================================================================================
+
+def test_nodeIndex(scale=2):
+    """
+    Node lookups by name and id agree with a linear scan after addNode and removeNode (with nodes sharing a name)
+    and after the node list is changed directly.
+    """
+    net = createNets(scale)[0]
+    def same():
+        for n in list(net.nodes) + [realNode("missing")]:
+            assert net.getNode(n.name) is next((u for u in net.nodes if u.name == n.name), None)
+            if n.id is not None:
+                assert net.getNodeById(n.id) is next((u for u in net.nodes if u.id == n.id), None)
+    same()
+    twin = realNode(net.nodes[0].name)
+    twin.id = net.nodes[1].id
+    net.addNode(twin)
+    net.removeNode(net.nodes[0])
+    same()
+    net.nodes[0], net.nodes[1] = net.nodes[1], net.nodes[0]
+    same()
+    net.nodes[2] = realNode("replaced")
+    same()
+    net.nodes = net.nodes[::-1]
+    same()
+    net.removeNode(net.nodes[-1])
+    same()
+
+def test_caches(scale=10):
+    """
+    Neighbor counts follow connection changes; node vectors and the reachability index follow changes of the
+    lower layer (removeAT).
+    """
+    net = createNets(scale)[0]
+    def counts():
+        temp = {}
+        neighbor_list = computeNeighbors(net)
+        for neighbor in neighbor_list:
+            temp["ag_"+neighbor.name] = temp.get("ag_"+neighbor.name, 0) + 1
+        return temp, len(neighbor_list)
+    assert neighborCounts(net) == counts()
+    critical = [u for u in net.nodes if u.critical == True][0]
+    source = [u for u in net.nodes if critical in u.con][0]
+    disconnectOneWay(source, critical, net)
+    assert neighborCounts(net) == counts()
+    connectOneWay(source, critical, net)
+    assert neighborCounts(net) == counts()
+    #adding an existing connection keeps the counts
+    cached = net.neighbors
+    connectOneWay(source, critical, net)
+    other = createNets(2)[0]
+    connectOneWay(other.nodes[0], other.nodes[1], other)
+    assert net.neighbors is cached and neighborCounts(net) == counts()
+
+    h = constructHARM(createShuffledNet(5))
+    harmVectors(h)
+    removeAT(h, [u for u in h.model.nodes if u.name.startswith("ag_server")])
+    vectors = harmVectors(h)
+    fresh = nodeVectors(h)
+    assert vectors.mttc == fresh.mttc and vectors.target == fresh.target
+    #Node properties changed directly are read again, without ag.changed
+    nodes = [u for u in h.model.table if u.child is not None]
+    nodes[4].child = None
+    nodes[4].val = 2.0
+    h.model.changed()
+    harmVectors(h)
+    nodes[0].prev_comp += 5.0
+    nodes[1].critical = not nodes[1].critical
+    nodes[2].type = 'emulated' if nodes[2].type == True else True
+    nodes[3].pro = 0.25
+    nodes[4].val = 4.0
+    vectors = harmVectors(h)
+    fresh = nodeVectors(h)
+    for name in ['mttc', 'target', 'real', 'decoy', 'critical', 'base', 'pro', 'prevComp']:
+        assert getattr(vectors, name) == getattr(fresh, name)
+    assert h.model.reach is None or h.model.reach == h.model.reachIndex()
+    h.model.travelAg()
+    paths = pathNames(h.model.allpath)
+    h.model.travelAgIterative()
+    assert pathNames(h.model.allpath) == paths
+
+#=================================================================================================
+# Topology snapshots
+#=================================================================================================
+
+def netStates(net):
+    return dict([(n.name, readNodeState(n)) for n in net.nodes])
+
+def test_snapshot(scale=5, shuffles=40, pro=0.5):
+    """
+    Each committed version materialises to the network it was committed from, also after rolling back and when
+    a materialised version is brought to another version; committing the changed nodes only is the same as
+    committing all nodes.
+    """
+    net = createDecoyNet(scale)
+    versions = [snapshot(net)]
+    states = [netStates(net)]
+    with seeded(), quiet():
+        for i in range(0, shuffles):
+            net = randomShuffling(net, pro)[0]
+            versions.append(versions[-1].commit(net))
+            states.append(netStates(net))
+            names = [name for name in states[-1] if states[-1][name] != states[-2].get(name)]
+            assert versions[-2].commit(net, names).states() == versions[-1].states()
+    last = versions[-1]
+    for steps in range(0, shuffles + 1):
+        assert netStates(last.rollback(steps).materialise()) == states[-1-steps]
+    temp = versions[1].materialise()
+    assert netStates(last.update(temp, versions[1])) == states[-1]
+
+
+def test_attackNet(scale=5, shuffles=20, pro=0.5):
+    """
+    The attack network brought to each version by updateAttackNet is the network that add_attacker makes from a
+    copy of the network shuffled in place, also when compromise states change.
+    """
+    net = copyNet(createDecoyNet(scale))
+    topology = snapshot(net)
+    attack_net = add_attacker(topology.materialise())
+    with seeded(), quiet():
+        for i in range(0, shuffles):
+            randomShuffling(net, pro, inplace=True)
+            n = net.nodes[(7 * i) % len(net.nodes)]
+            n.comp = True
+            n.prev_comp += 1.0
+            net.touch(n)
+            topology = updateAttackNet(attack_net, topology, net)
+            assert netStates(attack_net) == netStates(add_attacker(copyNet(net)))
+            assert [n.name for n in attack_net.s.con] == ["attacker"]
+
+def test_hopTableCycles(size=12, steps=300, randomSeed=3):
+    """
+    Random connections added, refused by addEdgeWithin and removed on a small graph with cycles keep the hop
+    table equal to a table computed from scratch.
+    """
+    adj = dict([(v, []) for v in range(0, size)])
+    targets = [0, 1]
+    table = hopTable(range(0, size), targets, adj.__getitem__)
+    with seeded(randomSeed):
+        for i in range(0, steps):
+            u = randint(0, size-1)
+            v = randint(0, size-1)
+            if u == v:
+                continue
+            #At most three successors, so that the cycles stay small enough to search
+            if v in adj[u] or len(adj[u]) == 3:
+                v = v if v in adj[u] else adj[u][0]
+                adj[u].remove(v)
+                table.removeEdge(u, v)
+            elif i % 3 == 0:
+                hop = dict(table.hop)
+                adj[u].append(v)
+                if not table.addEdgeWithin(u, v, 4):
+                    adj[u].remove(v)
+                    assert table.hop == hop
+            else:
+                adj[u].append(v)
+                table.addEdge(u, v)
+            assert table.hop == hopTable(range(0, size), targets, adj.__getitem__).hop
+    assert table.cyclic
+
+#=================================================================================================
+# Batched MTTSF for the GA
+#=================================================================================================
+
+def test_mttsfBatch(scale=5, sim_num=50):
+    """
+    The replications of computeMTTSFLoop leave the node states unchanged, and the batch reads the same attacked
+    nodes from a path store as from the list of its paths.
+    """
+    net = createShuffledNet(scale, 0.5)
+    h = constructHARM(net)
+    realNet = network()
+    realNet.nodes = [u for u in net.nodes if u.type == True]
+    comp = [u.comp for u in h.model.table]
+    with seeded(1):
+        computeMTTSFLoop(h, realNet, 1.0/3.0, sim_num)
+    assert [u.comp for u in h.model.table] == comp
+    target = np.asarray(harmVectors(h).target, dtype=bool)
+    pad = len(h.model.table)
+    index = np.arange(len(h.model.allpath)).reshape(-1, 1)[::-1]
+    def attacked(rows):
+        return [row[row != pad].tolist() for row in rows]
+    rows = attacked(mttsfPathRows(h, target, pad, index))
+    h.model.allpath = h.model.allpath.materialise()
+    assert attacked(mttsfPathRows(h, target, pad, index)) == rows